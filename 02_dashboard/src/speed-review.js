@@ -3014,15 +3014,17 @@ export async function initializePage() {
         // 1. Fetch all data sources. For the standard sample, canonical response
         // files live under data/responses, so read those paths before demo fallbacks
         // to avoid expected 404s in browser consoles.
-        const noStoreFetchOptions = { cache: 'no-store' };
-        const surveys = await fetch(resolveDashboardDataPath('core/surveys.json'), noStoreFetchOptions).then(res => res.json());
+        // Always revalidate instead of bypassing the HTTP cache: unchanged files come
+        // back as 304 against their ETag, edited ones are refetched.
+        const revalidateFetchOptions = { cache: 'no-cache' };
+        const surveys = await fetch(resolveDashboardDataPath('core/surveys.json'), revalidateFetchOptions).then(res => res.json());
 
         let answersData = [];
         let personalInfoData = [];
         let enqueteDetailsData = {};
 
         try {
-            const answersResponse = await fetch(resolveDashboardDataPath(`responses/answers/${surveyId}.json`), noStoreFetchOptions);
+            const answersResponse = await fetch(resolveDashboardDataPath(`responses/answers/${surveyId}.json`), revalidateFetchOptions);
             if (answersResponse.ok) {
                 const data = await answersResponse.json();
                 if (data && !Array.isArray(data) && Array.isArray(data.answers)) {
@@ -3036,12 +3038,12 @@ export async function initializePage() {
         }
 
         if (!Array.isArray(answersData) || answersData.length === 0) {
-            const demoAnswersResponse = await fetch(resolveDemoDataPath(`answers/${surveyId}.json`), noStoreFetchOptions);
+            const demoAnswersResponse = await fetch(resolveDemoDataPath(`answers/${surveyId}.json`), revalidateFetchOptions);
             answersData = demoAnswersResponse.ok ? await demoAnswersResponse.json() : [];
         }
 
         try {
-            const businessCardsResponse = await fetch(resolveDashboardDataPath(`responses/business-cards/${surveyId}.json`), noStoreFetchOptions);
+            const businessCardsResponse = await fetch(resolveDashboardDataPath(`responses/business-cards/${surveyId}.json`), revalidateFetchOptions);
             if (businessCardsResponse.ok) {
                 personalInfoData = await businessCardsResponse.json();
             }
@@ -3050,24 +3052,24 @@ export async function initializePage() {
         }
 
         if (!Array.isArray(personalInfoData) || personalInfoData.length === 0) {
-            const demoBusinessCardsResponse = await fetch(resolveDemoDataPath(`business-cards/${surveyId}.json`), noStoreFetchOptions);
+            const demoBusinessCardsResponse = await fetch(resolveDemoDataPath(`business-cards/${surveyId}.json`), revalidateFetchOptions);
             personalInfoData = demoBusinessCardsResponse.ok ? await demoBusinessCardsResponse.json() : [];
         }
 
         try {
-            const surveyDetailsResponse = await fetch(resolveDashboardDataPath(`surveys/${surveyId}.json`), noStoreFetchOptions);
+            const surveyDetailsResponse = await fetch(resolveDashboardDataPath(`surveys/${surveyId}.json`), revalidateFetchOptions);
             enqueteDetailsData = surveyDetailsResponse.ok ? await surveyDetailsResponse.json() : {};
         } catch (error) {
             console.warn('アンケート詳細データの読み込みに失敗しました', error);
         }
 
         if (!enqueteDetailsData || !enqueteDetailsData.details) {
-            const demoSurveyResponse = await fetch(resolveDemoDataPath(`surveys/${surveyId}.json`), noStoreFetchOptions);
+            const demoSurveyResponse = await fetch(resolveDemoDataPath(`surveys/${surveyId}.json`), revalidateFetchOptions);
             enqueteDetailsData = demoSurveyResponse.ok ? await demoSurveyResponse.json() : {};
         }
 
         if (!enqueteDetailsData || !enqueteDetailsData.details) {
-            const enqueteResponse = await fetch(resolveDashboardDataPath(`surveys/enquete/${surveyId}.json`), noStoreFetchOptions);
+            const enqueteResponse = await fetch(resolveDashboardDataPath(`surveys/enquete/${surveyId}.json`), revalidateFetchOptions);
             enqueteDetailsData = enqueteResponse.ok ? await enqueteResponse.json() : {};
         }
 
@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""Replay page loads against a running dev server and report the numbers.
+
+Each page load is the HTML file followed by every ``<script src>`` and
+``<link href>`` it references, which is what the browser asks for before
+the page renders. The page sets are derived from the 18 admin screens in
+``docs/architecture/check_refs.py`` (``SCREENS``) and the top-level
+``02_dashboard/*.html`` pages, so they follow the markup as it changes.
+
+    python scripts/dev-server.py 8765 &
+    python scripts/dev-server-bench.py --concurrency 8 --duration 20 -o before.json
+
+``--concurrency`` workers each hold one keep-alive connection and take page
+loads from a shared round-robin; a warm-up pass over every page runs first
+and is not counted. The JSON report (requests/sec, latency percentiles,
+status counts, error rate, per-page load times) is written to stdout and,
+with ``-o``, to a file so runs can be diffed between commits.
+
+Standard library only.
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime
+import http.client
+import importlib.util
+import itertools
+import json
+import re
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urljoin, urlsplit
+
+ROOT = Path(__file__).resolve().parents[1]
+CHECK_REFS = ROOT / "docs" / "architecture" / "check_refs.py"
+DEFAULT_URL = "http://127.0.0.1:8765"
+SETS = ("admin", "dashboard", "all")
+PERCENTILES = (50, 90, 95, 99)
+# Per-request socket timeout; a request slower than this counts as an error.
+REQUEST_TIMEOUT = 30.0
+
+
+def load_check_refs():
+    """Import ``check_refs.py`` by path (``docs/`` is not a package)."""
+    spec = importlib.util.spec_from_file_location("check_refs", CHECK_REFS)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def page_assets(html: str, page: str, pattern: re.Pattern) -> list[str]:
+    """Local asset URLs referenced by ``html``, resolved against ``page``."""
+    assets = []
+    for ref in pattern.findall(html):
+        if ref.startswith(("http:", "https:", "//", "data:", "#")):
+            continue
+        url = urljoin(page, ref).split("#", 1)[0]
+        if url not in assets:
+            assets.append(url)
+    return assets
+
+
+def build_pages(which: str) -> dict[str, list[str]]:
+    """``{page_url: [page_url, asset_url, ...]}`` for the chosen page set."""
+    refs = load_check_refs()
+    files = []
+    if which in ("admin", "all"):
+        files += [ROOT / "03_admin" / rel for rel in refs.SCREENS]
+    if which in ("dashboard", "all"):
+        files += sorted((ROOT / "02_dashboard").glob("*.html"))
+    pages = {}
+    for path in files:
+        if not path.is_file():
+            print(f"skipping missing page {path.relative_to(ROOT)}", file=sys.stderr)
+            continue
+        url = "/" + path.relative_to(ROOT).as_posix()
+        html = path.read_text(encoding="utf-8", errors="replace")
+        pages[url] = [url] + page_assets(html, url, refs.ASSET)
+    return pages
+
+
+class Recorder:
+    """Thread-safe collection of request and page-load samples."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies: list[float] = []
+        self.status: dict[str, int] = {}
+        self.errors = 0
+        self.bytes = 0
+        self.page_times: dict[str, list[float]] = {}
+
+    def request(self, status: int | None, seconds: float, size: int) -> None:
+        key = str(status) if status is not None else "error"
+        with self.lock:
+            self.latencies.append(seconds)
+            self.status[key] = self.status.get(key, 0) + 1
+            self.bytes += size
+            if status is None or status >= 400:
+                self.errors += 1
+
+    def page(self, url: str, seconds: float) -> None:
+        with self.lock:
+            self.page_times.setdefault(url, []).append(seconds)
+
+
+class FinalResponse(http.client.HTTPResponse):
+    """``HTTPResponse`` that skips interim 1xx replies such as ``103 Early Hints``.
+
+    ``http.client`` only skips ``100 Continue`` and would otherwise report
+    the 103 as the final status.
+    """
+
+    def _read_status(self):
+        while True:
+            version, status, reason = super()._read_status()
+            if not 100 < status < 200 or status == 101:
+                return version, status, reason
+            while self.fp.readline(http.client._MAXLINE + 1) not in (b"\r\n", b"\n", b""):
+                pass
+
+
+class Client:
+    """One keep-alive connection; reconnects when the server closes it."""
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.conn = None
+
+    def get(self, url: str) -> tuple[int | None, int]:
+        """GET ``url`` and read the whole body. Returns ``(status, bytes)``."""
+        for attempt in (0, 1):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port,
+                                                       timeout=REQUEST_TIMEOUT)
+                self.conn.response_class = FinalResponse
+            try:
+                self.conn.request("GET", url, headers={"Accept-Encoding": "gzip"})
+                response = self.conn.getresponse()
+                body = response.read()
+                if response.will_close:
+                    self.close()
+                return response.status, len(body)
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                # A kept-alive socket the server already dropped: retry once fresh.
+                self.close()
+                if attempt:
+                    return None, 0
+            except (OSError, http.client.HTTPException):
+                self.close()
+                return None, 0
+        return None, 0
+
+    def close(self) -> None:
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+def load_page(client: Client, url: str, requests: list[str], recorder: Recorder | None) -> None:
+    page_started = time.perf_counter()
+    for target in requests:
+        started = time.perf_counter()
+        status, size = client.get(target)
+        if recorder is not None:
+            recorder.request(status, time.perf_counter() - started, size)
+    if recorder is not None:
+        recorder.page(url, time.perf_counter() - page_started)
+
+
+def run(host: str, port: int, pages: dict[str, list[str]], concurrency: int,
+        duration: float, iterations: int) -> tuple[Recorder, float]:
+    """Drive ``concurrency`` workers until ``duration`` or ``iterations`` runs out."""
+    recorder = Recorder()
+    order = itertools.cycle(list(pages))
+    order_lock = threading.Lock()
+    remaining = [iterations]
+    deadline = time.monotonic() + duration if duration else None
+
+    def next_page() -> str | None:
+        with order_lock:
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+            if iterations:
+                if remaining[0] <= 0:
+                    return None
+                remaining[0] -= 1
+            return next(order)
+
+    def worker() -> None:
+        client = Client(host, port)
+        try:
+            while (url := next_page()) is not None:
+                load_page(client, url, pages[url], recorder)
+        finally:
+            client.close()
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return recorder, time.perf_counter() - started
+
+
+def percentile(ordered: list[float], p: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return 0.0
+    rank = max(1, -(-len(ordered) * p // 100))
+    return ordered[int(rank) - 1]
+
+
+def summarize(samples: list[float]) -> dict:
+    ordered = sorted(samples)
+    summary = {f"p{p}": round(percentile(ordered, p) * 1000, 3) for p in PERCENTILES}
+    summary["max"] = round(ordered[-1] * 1000, 3) if ordered else 0.0
+    summary["mean"] = round(sum(ordered) / len(ordered) * 1000, 3) if ordered else 0.0
+    return summary
+
+
+def git_commit() -> str | None:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                             capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def report(args: argparse.Namespace, pages: dict[str, list[str]],
+           recorder: Recorder, elapsed: float) -> dict:
+    total = len(recorder.latencies)
+    return {
+        "label": args.label,
+        "commit": git_commit(),
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "config": {
+            "url": args.url,
+            "set": args.set,
+            "pages": len(pages),
+            "requests_per_round": sum(len(v) for v in pages.values()),
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "iterations": args.iterations,
+            "warmup_rounds": args.warmup_rounds,
+        },
+        "elapsed_s": round(elapsed, 3),
+        "requests": total,
+        "page_loads": sum(len(v) for v in recorder.page_times.values()),
+        "requests_per_sec": round(total / elapsed, 2) if elapsed else 0.0,
+        "bytes": recorder.bytes,
+        "errors": recorder.errors,
+        "error_rate": round(recorder.errors / total, 4) if total else 0.0,
+        "status": dict(sorted(recorder.status.items())),
+        "latency_ms": summarize(recorder.latencies),
+        "page_load_ms": {url: summarize(times)
+                         for url, times in sorted(recorder.page_times.items())},
+    }
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Load generator for scripts/dev-server.py (stdlib only).")
+    parser.add_argument("--url", default=DEFAULT_URL,
+                        help=f"server to measure (default {DEFAULT_URL})")
+    parser.add_argument("--set", choices=SETS, default="all",
+                        help="which pages to replay (default all)")
+    parser.add_argument("-c", "--concurrency", type=int, default=4,
+                        help="parallel keep-alive clients (default 4)")
+    parser.add_argument("-d", "--duration", type=float, default=10.0,
+                        help="seconds to measure for; 0 = until --iterations (default 10)")
+    parser.add_argument("-n", "--iterations", type=int, default=0,
+                        help="stop after this many page loads (default: no limit)")
+    parser.add_argument("--warmup-rounds", type=int, default=1,
+                        help="uncounted passes over every page first (default 1)")
+    parser.add_argument("--label", default=None, help="free-form tag stored in the report")
+    parser.add_argument("-o", "--output", type=Path, help="also write the JSON report here")
+    args = parser.parse_args(argv[1:])
+    if not args.duration and not args.iterations:
+        parser.error("give --duration or --iterations")
+    if args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+    return args
+
+
+def main(argv: list[str]) -> int:
+    args = parse_args(argv)
+    target = urlsplit(args.url)
+    host, port = target.hostname or "127.0.0.1", target.port or 80
+    pages = build_pages(args.set)
+    if not pages:
+        print("no pages to replay", file=sys.stderr)
+        return 1
+
+    warmup = Client(host, port)
+    for _ in range(args.warmup_rounds):
+        for url, requests in pages.items():
+            load_page(warmup, url, requests, None)
+    warmup.close()
+
+    recorder, elapsed = run(host, port, pages, args.concurrency,
+                            args.duration, args.iterations)
+    result = report(args, pages, recorder, elapsed)
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    print(text)
+    if args.output:
+        args.output.write_text(text + "\n", encoding="utf-8")
+    return 0 if recorder.latencies else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
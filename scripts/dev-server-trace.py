@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""Summarize a ``scripts/dev-server.py --trace`` file.
+
+    python scripts/dev-server.py 8765 --trace /tmp/e2e.trace &
+    npx playwright test --project=local
+    python scripts/dev-server-trace.py /tmp/e2e.trace --pages 5
+
+Reports, in order:
+
+* the assets with the most total bytes and the most total time served;
+* page loads, reconstructed from ``Referer``: a request belongs to the page
+  named in its Referer, or, when the Referer is itself an asset (a module
+  imported by another module, a font pulled in by a stylesheet), to the
+  page that asset was loaded for;
+* assets fetched more than once within one page load, such as a JSON file
+  requested by two services on the same screen;
+* a waterfall of the slowest load of each page (offsets from the document
+  request, durations and sizes).
+
+``--json`` prints the same data as one JSON document. Standard library only.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from dataclasses import dataclass, field
+from urllib.parse import urlsplit
+
+TRACE_MAGIC = "# dev-server trace v1"
+# Width of the waterfall bars in characters.
+BAR_WIDTH = 40
+DOCUMENT_SUFFIXES = (".html", ".htm", "/")
+
+
+@dataclass
+class Record:
+    ts: float
+    client: str
+    method: str
+    target: str
+    rewritten: str
+    status: int
+    bytes: int
+    ms: float
+    referer: str
+
+    @property
+    def path(self) -> str:
+        return urlsplit(self.target).path
+
+    @property
+    def end(self) -> float:
+        return self.ts + self.ms / 1000
+
+
+@dataclass
+class PageLoad:
+    page: str
+    client: str
+    start: float
+    records: list[Record] = field(default_factory=list)
+
+    @property
+    def span_ms(self) -> float:
+        if not self.records:
+            return 0.0
+        return (max(r.end for r in self.records) - self.start) * 1000
+
+    def duplicates(self) -> dict[str, int]:
+        counts: dict[str, int] = {}
+        for r in self.records:
+            if r.method == "GET" and r.path != self.page:
+                counts[r.path] = counts.get(r.path, 0) + 1
+        return {path: n for path, n in counts.items() if n > 1}
+
+
+def read_trace(path: str) -> list[Record]:
+    records = []
+    with open(path, encoding="utf-8", errors="replace") as f:
+        first = f.readline()
+        if not first.startswith(TRACE_MAGIC):
+            raise SystemExit(f"{path}: not a dev-server trace (missing '{TRACE_MAGIC}')")
+        for lineno, line in enumerate(f, 2):
+            if not line.strip() or line.startswith("#"):
+                continue
+            fields = line.rstrip("\n").split("\t")
+            if len(fields) != 9:
+                print(f"{path}:{lineno}: skipping malformed line", file=sys.stderr)
+                continue
+            ts, client, method, target, rewritten, status, size, ms, referer = fields
+            records.append(Record(float(ts), client, method, target, rewritten,
+                                  int(status), int(size), float(ms), referer))
+    records.sort(key=lambda r: r.ts)
+    return records
+
+
+def is_document(path: str) -> bool:
+    return path.endswith(DOCUMENT_SUFFIXES)
+
+
+def group_page_loads(records: list[Record]) -> list[PageLoad]:
+    """Split ``records`` into page loads by following Referer chains."""
+    loads: list[PageLoad] = []
+    current: dict[tuple[str, str], PageLoad] = {}   # (client, page) -> open load
+    owner: dict[tuple[str, str], PageLoad] = {}     # (client, asset) -> its load
+    for r in records:
+        if is_document(r.path) and r.method == "GET":
+            load = PageLoad(r.path, r.client, r.ts, [r])
+            loads.append(load)
+            current[(r.client, r.path)] = load
+            continue
+        if r.referer == "-":
+            continue
+        source = urlsplit(r.referer).path
+        load = current.get((r.client, source)) if is_document(source) else None
+        if load is None:
+            load = owner.get((r.client, source))
+        if load is None and is_document(source):
+            # Tracing started after the document was served.
+            load = PageLoad(source, r.client, r.ts)
+            loads.append(load)
+            current[(r.client, source)] = load
+        if load is None:
+            continue
+        load.records.append(r)
+        owner[(r.client, r.path)] = load
+    return loads
+
+
+def percentile(values: list[float], p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+def rank_assets(records: list[Record]) -> list[dict]:
+    assets: dict[str, list[Record]] = {}
+    for r in records:
+        assets.setdefault(r.path, []).append(r)
+    ranked = []
+    for path, rs in assets.items():
+        times = [r.ms for r in rs]
+        ranked.append({
+            "path": path,
+            "requests": len(rs),
+            "bytes": sum(r.bytes for r in rs),
+            "total_ms": round(sum(times), 3),
+            "p50_ms": round(percentile(times, 50), 3),
+            "p95_ms": round(percentile(times, 95), 3),
+            "errors": sum(1 for r in rs if r.status >= 400),
+        })
+    return ranked
+
+
+def summarize_pages(loads: list[PageLoad]) -> list[dict]:
+    pages: dict[str, list[PageLoad]] = {}
+    for load in loads:
+        pages.setdefault(load.page, []).append(load)
+    summary = []
+    for page, page_loads in pages.items():
+        spans = [load.span_ms for load in page_loads]
+        slowest = max(page_loads, key=lambda load: load.span_ms)
+        duplicates: dict[str, int] = {}
+        for load in page_loads:
+            for path, n in load.duplicates().items():
+                duplicates[path] = max(duplicates.get(path, 0), n)
+        summary.append({
+            "page": page,
+            "loads": len(page_loads),
+            "p50_span_ms": round(percentile(spans, 50), 3),
+            "max_span_ms": round(max(spans), 3),
+            "requests_per_load": round(sum(len(l.records) for l in page_loads)
+                                       / len(page_loads), 1),
+            "bytes_per_load": sum(r.bytes for l in page_loads for r in l.records)
+                              // len(page_loads),
+            "duplicates": dict(sorted(duplicates.items(), key=lambda kv: (-kv[1], kv[0]))),
+            "waterfall": [{
+                "path": r.path,
+                "offset_ms": round((r.ts - slowest.start) * 1000, 3),
+                "ms": r.ms,
+                "bytes": r.bytes,
+                "status": r.status,
+            } for r in sorted(slowest.records, key=lambda r: r.ts)],
+        })
+    summary.sort(key=lambda p: -p["max_span_ms"])
+    return summary
+
+
+def human_bytes(n: int) -> str:
+    for unit in ("B", "KB", "MB"):
+        if n < 1024 or unit == "MB":
+            return f"{n:.0f}{unit}" if unit == "B" else f"{n:.1f}{unit}"
+        n /= 1024
+    return f"{n}B"
+
+
+def print_report(records: list[Record], assets: list[dict], pages: list[dict],
+                 top: int, max_pages: int) -> None:
+    total_bytes = sum(r.bytes for r in records)
+    print(f"{len(records)} requests, {human_bytes(total_bytes)}, "
+          f"{len(pages)} pages, {sum(p['loads'] for p in pages)} page loads")
+
+    for title, key in (("Top assets by bytes", "bytes"), ("Top assets by time", "total_ms")):
+        print(f"\n{title}")
+        for a in sorted(assets, key=lambda a: -a[key])[:top]:
+            print(f"  {human_bytes(a['bytes']):>9} {a['total_ms']:>10.1f}ms "
+                  f"x{a['requests']:<5} p95 {a['p95_ms']:>8.1f}ms  {a['path']}")
+
+    flagged = [(p["page"], path, n) for p in pages for path, n in p["duplicates"].items()]
+    print("\nFetched more than once in one page load")
+    if not flagged:
+        print("  (none)")
+    for page, path, n in flagged:
+        print(f"  {n}x {path}  <- {page}")
+
+    for p in pages[:max_pages]:
+        print(f"\n{p['page']}: {p['loads']} loads, p50 {p['p50_span_ms']:.1f}ms, "
+              f"max {p['max_span_ms']:.1f}ms, {p['requests_per_load']} requests, "
+              f"{human_bytes(p['bytes_per_load'])} per load")
+        scale = BAR_WIDTH / max(p["max_span_ms"], 1e-6)
+        for w in p["waterfall"]:
+            lead = int(w["offset_ms"] * scale)
+            bar = "#" * max(1, int(w["ms"] * scale))
+            print(f"  {w['offset_ms']:>8.1f} {w['ms']:>8.1f}ms {human_bytes(w['bytes']):>8} "
+                  f"{w['status']}  {' ' * lead}{bar:<{BAR_WIDTH - lead}}  {w['path']}")
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(description="Analyze a dev-server --trace file.")
+    parser.add_argument("trace", help="file written by dev-server.py --trace")
+    parser.add_argument("--top", type=int, default=15, help="assets per ranking (default 15)")
+    parser.add_argument("--pages", type=int, default=10,
+                        help="waterfalls to print, slowest first (default 10)")
+    parser.add_argument("--json", action="store_true", help="print JSON instead of text")
+    args = parser.parse_args(argv[1:])
+
+    records = read_trace(args.trace)
+    assets = rank_assets(records)
+    pages = summarize_pages(group_page_loads(records))
+    if args.json:
+        print(json.dumps({
+            "requests": len(records),
+            "bytes": sum(r.bytes for r in records),
+            "assets": sorted(assets, key=lambda a: -a["bytes"]),
+            "pages": pages,
+        }, ensure_ascii=False, indent=2))
+    else:
+        print_report(records, assets, pages, args.top, args.pages)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -11,6 +11,92 @@ This wrapper rewrites a small set of top-level paths to their
 ``/05_support/...`` equivalents so support pages render correctly during local
 development.
 
+Two serving engines are available::
+
+    python scripts/dev-server.py 8765                    # threading (default)
+    python scripts/dev-server.py 8765 --engine asyncio   # HTTP/1.1 keep-alive
+
+``threading`` is the stdlib ``ThreadingHTTPServer`` (one thread per
+connection, HTTP/1.0). ``asyncio`` runs every connection on one event loop and
+keeps HTTP/1.1 connections open between requests, so a page that pulls dozens
+of fragments, scripts and JSON files reuses a handful of sockets. Both engines
+answer through :class:`Site`, so the ``REWRITE_PREFIXES`` behaviour is identical.
+
+Files up to 4 MiB are kept in an in-memory LRU (``--cache-mb``, default 64)
+that revalidates against mtime/size on every request. ``/__cache`` reports
+hit/miss counters for sizing it.
+
+Text, JSON, JS and SVG bodies are gzipped for clients that send
+``Accept-Encoding: gzip``. The compressed bytes are written once per content
+hash to ``.dev-server-cache/gzip/`` and reused on later runs (``--no-gzip``
+turns this off, ``--cache-dir`` moves it).
+
+Every file carries a strong ``ETag`` derived from that same content hash
+(computed once per path/mtime/size) and ``Cache-Control: no-cache``, so the
+browser revalidates on each load and an unchanged file costs a header-only
+``304 Not Modified``.
+
+``Range`` requests (single and multiple ranges, ``If-Range``) get ``206
+Partial Content`` so videos under ``media/`` can be seeked. File bodies leave
+through ``os.sendfile`` (mmap slices where it is unavailable); under the
+asyncio engine that is ``loop.sendfile``, so a slow client never ties up a
+thread for the length of a large file.
+
+``/__metrics`` reports per-prefix latency (p50/p95/p99), bytes sent, 404s,
+rewrite hits per ``REWRITE_PREFIXES`` entry and in-flight requests, as JSON
+or as Prometheus text (``?format=prometheus``).
+
+``/api/answers?survey=<id>`` pages through one survey's answers (``offset``,
+``limit``, ``from``/``to`` on ``answeredAt``, ``types`` projection over
+``details[].type``, ``cards=1`` to join business cards by ``answerId``)
+from an index that is rebuilt only when the file changes.
+
+Raster images accept ``?w=``/``?h=`` (fit inside, never upscaled) and
+``?fmt=webp|jpeg|png``. Derivatives are rendered with Pillow once per source
+hash and parameters, kept under ``.dev-server-cache/images/`` within
+``--image-cache-mb`` (least recently served evicted first) and served with
+their own ETag. Without Pillow the original image is served.
+
+HTML pages carry ``Link: <...>; rel=preload`` for the stylesheets and
+scripts they load, parsed once per path/mtime/size, so the browser starts
+fetching the shell assets while the HTML body is still arriving
+(``--no-preload`` turns this off). With ``--early-hints`` the asyncio engine
+also sends them ahead of the response as ``103 Early Hints``.
+
+``--profile 3g|fast3g|lossy`` emulates a slow link: each response waits for
+the profile's latency and its body is paced through a per-connection token
+bucket (``lossy`` adds retransmit-like stalls). ``--throttle /data/=3g``
+applies a profile to one path prefix only; ``/__cache`` and ``/__metrics``
+are never throttled.
+
+``--pool N`` replaces the threading engine's thread-per-connection with N
+worker threads behind a queue. At most ``--max-connections`` (default 4N)
+connections are admitted; the rest are answered ``503`` with
+``Retry-After`` straight from the accept loop. Queue depth, wait time and
+rejections appear in ``/__metrics``.
+
+A watcher (inotify through ctypes on Linux, a periodic mtime scan
+elsewhere; ``--no-watch`` turns it off) drops the cached bytes, content
+hash and preload list of each edited file as soon as it changes, and
+publishes the batch on ``/__events`` (Server-Sent Events). Pages opt into
+live reload by loading ``/__livereload.js``; ``--live-reload`` injects that
+script into every HTML page. Stylesheet-only edits are swapped in place.
+
+With inotify active, a background thread also indexes every file and
+directory at startup and the watcher keeps that index current, so
+directory probing, ``index.html`` resolution and 404s are dictionary
+lookups instead of ``stat`` calls. Paths the index cannot vouch for
+(symlinks, ignored directories, anything before the build finishes) still
+go to the filesystem. The build time is printed once it is ready.
+
+``--trace FILE`` appends one tab-separated line per request (time, client,
+method, target, rewritten path, status, bytes, duration, Referer) for
+``scripts/dev-server-trace.py`` to turn into per-page waterfalls.
+
+``--workers N`` pre-forks N processes that each bind the port with
+``SO_REUSEPORT``; the parent merges their access logs (prefixed ``[wN]``)
+and stops them all on Ctrl+C.
+
 WARNING: This script is for local development only. Do NOT use it in
 production -- production hosting must provide the real subdomain document
 root.
@@ -18,13 +104,164 @@ root.
 
 from __future__ import annotations
 
+import argparse
+import asyncio
+import bisect
+import ctypes
+import ctypes.util
+import datetime
+import errno
+import email.parser
+import email.utils
+import gzip
+import hashlib
+import html
+import http.client
+import io
+import json
+import mmap
+import os
+import posixpath
+import re
+import secrets
+import select
+import signal
+import socket
+import stat
+import struct
 import sys
 import mimetypes
-from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+import multiprocessing
+import queue
+import random
+import threading
+import time
+import urllib.parse
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
+from http import HTTPStatus
+from http.server import (
+    BaseHTTPRequestHandler,
+    SimpleHTTPRequestHandler,
+    ThreadingHTTPServer,
+)
 from urllib.parse import urlsplit
 
+try:
+    from PIL import Image
+except ImportError:  # optional: only ?w=/?h=/?fmt= image resizing needs Pillow
+    Image = None
+
+PROCESS_STARTED = time.perf_counter()
 DEFAULT_PORT = 8765
 BIND_HOST = "127.0.0.1"
+ENGINES = ("threading", "asyncio")
+
+# --pool: admitted connections (queued + in service) default to this many
+# per worker thread; beyond that new connections get 503 + Retry-After.
+POOL_BACKLOG_FACTOR = 4
+RETRY_AFTER = 1
+# How long a rejected connection may take to deliver its request before the
+# 503 goes out; reading it first keeps the close from turning into a reset.
+# The drain runs on a short-lived thread, never on the accept loop.
+REJECT_DRAIN_TIMEOUT = 0.05
+# File watching: edits closer together than WATCH_DEBOUNCE seconds are
+# published as one batch; the scan fallback walks the tree every
+# WATCH_SCAN_INTERVAL seconds. /__events sends a comment line every
+# SSE_HEARTBEAT seconds so proxies and the threaded engine notice a gone client.
+WATCH_DEBOUNCE = 0.1
+WATCH_SCAN_INTERVAL = 1.0
+SSE_HEARTBEAT = 15.0
+# Directories and editor droppings that never trigger a reload (the
+# --cache-dir and --trace paths are ignored as well).
+WATCH_IGNORED_DIRS = {".git", "node_modules", "__pycache__", "test-results",
+                      "playwright-report"}
+WATCH_IGNORED_SUFFIXES = ("~", ".swp", ".swx", ".tmp", ".part", ".crdownload")
+LIVERELOAD_SCRIPT = b"""(() => {
+  const source = new EventSource('/__events');
+  source.addEventListener('change', (event) => {
+    const { paths } = JSON.parse(event.data);
+    if (!paths.every((path) => path.endsWith('.css'))) {
+      location.reload();
+      return;
+    }
+    document.querySelectorAll('link[rel="stylesheet"]').forEach((link) => {
+      const url = new URL(link.href);
+      url.searchParams.set('__reload', Date.now());
+      link.href = url.href;
+    });
+  });
+})();
+"""
+LIVERELOAD_TAG = b'<script src="/__livereload.js"></script>'
+# First line of a --trace file; scripts/dev-server-trace.py checks it.
+TRACE_HEADER = "# dev-server trace v1\tts\tclient\tmethod\ttarget\trewritten\tstatus\tbytes\tms\treferer\n"
+# Seconds a --workers child gets to finish after SIGTERM before it is killed.
+WORKER_STOP_TIMEOUT = 5.0
+# Idle time after which the asyncio engine closes a kept-alive connection.
+KEEPALIVE_TIMEOUT = 15.0
+# Same limits the stdlib handler applies to the request line and headers.
+MAX_LINE = 65536
+MAX_HEADERS = 100
+# Only GET and HEAD are served, so a request body is read just to discard it;
+# anything larger is refused rather than buffered.
+MAX_BODY = 65536
+# In-memory file cache budget. Entries above the per-file cap (the 148 MB
+# media tree, mostly) are streamed from disk instead.
+DEFAULT_CACHE_BYTES = 64 * 1024 * 1024
+DEFAULT_CACHE_ENTRY = 4 * 1024 * 1024
+# Compressed artifacts survive restarts here (relative to the served root).
+DEFAULT_CACHE_DIR = ".dev-server-cache"
+# Bodies smaller than this gain nothing from gzip once headers are counted.
+GZIP_MIN_SIZE = 1024
+# /api/answers paging. Survey ids double as file names, so they are checked
+# against SURVEY_ID before touching the filesystem.
+API_DEFAULT_LIMIT = 50
+API_MAX_LIMIT = 1000
+SURVEY_ID = re.compile(r"[A-Za-z0-9_-]+")
+# Upper bounds (seconds) of the /__metrics latency histogram buckets.
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Byte-range handling: more ranges than this in one request are ignored (200),
+# and file bodies are handed to sendfile in chunks of this size.
+MAX_RANGES = 32
+SENDFILE_CHUNK = 8 * 1024 * 1024
+SENDFILE_UNSUPPORTED = {errno.EINVAL, errno.ENOSYS, errno.ENOTSOCK, errno.EOPNOTSUPP}
+# ?w=/?h=/?fmt= image derivatives: largest edge accepted, on-disk budget
+# (least recently served derivatives go first), and encoder settings.
+MAX_IMAGE_DIM = 4096
+DEFAULT_IMAGE_CACHE_BYTES = 256 * 1024 * 1024
+IMAGE_FORMATS = {
+    "webp": ("WEBP", "image/webp", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", "image/jpeg", {"quality": 82, "optimize": True}),
+    "png": ("PNG", "image/png", {"optimize": True}),
+}
+# Raster types Pillow can resize, and the format a derivative keeps by default.
+RESIZABLE_TYPES = {
+    "image/png": "png",
+    "image/jpeg": "jpeg",
+    "image/webp": "webp",
+    "image/gif": "png",
+    "image/bmp": "png",
+}
+# HTML responses advertise at most this many Link: rel=preload entries.
+MAX_PRELOADS = 32
+# <script>/<link> tags in HTML, the same shape check_refs.py's ASSET matches,
+# but keeping every attribute so rel/type/async can be read back.
+ASSET_TAG = re.compile(r"<(script|link)\b([^>]*)>", re.IGNORECASE)
+TAG_ATTR = re.compile(r"""([\w:-]+)(?:\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'>]+)))?""")
+HTML_COMMENT = re.compile(r"<!--.*?-->", re.DOTALL)
+# Characters left unescaped when a resolved asset URL goes into a header.
+LINK_URL_SAFE = "/%?=&:;+,~@!$'()*"
+# Throttled bodies leave in pieces of this size, which is also the burst a
+# connection's token bucket may accumulate while idle.
+THROTTLE_CHUNK = 16 * 1024
+COMPRESSIBLE_TYPES = {
+    "application/javascript",
+    "application/json",
+    "application/xml",
+    "image/svg+xml",
+}
 
 mimetypes.add_type("font/woff2", ".woff2")
 
@@ -42,59 +279,2631 @@ REWRITE_PREFIXES = (
 )
 
 
+def rewrite_path(path: str) -> str:
+    """Rewrite ``/<prefix>/...`` to ``/05_support/<prefix>/...``.
+
+    Query string and fragment are stripped before matching so that paths
+    like ``/assets/css/style.css?v=1`` are still detected. Paths that
+    already start with ``/05_support/`` are left untouched to avoid double
+    rewriting. Paths that do not match are returned unchanged.
+    """
+    # Strip query/fragment for prefix detection.
+    path_only = urlsplit(path).path
+
+    if not path_only.startswith("/05_support/"):
+        stripped = path_only.lstrip("/")
+        head = stripped.split("/", 1)[0] if stripped else ""
+        if head in REWRITE_PREFIXES:
+            return "/05_support/" + stripped
+    return path
+
+
+def translate_path(path: str, directory: str) -> str:
+    """Map a request path to a filesystem path below ``directory``.
+
+    Applies :func:`rewrite_path` and then follows
+    ``SimpleHTTPRequestHandler.translate_path`` step for step, so engines
+    that do not go through the stdlib handler resolve exactly the same file.
+    """
+    path = rewrite_path(path)
+    path = path.split("?", 1)[0]
+    path = path.split("#", 1)[0]
+    trailing_slash = path.rstrip().endswith("/")
+    try:
+        path = urllib.parse.unquote(path, errors="surrogatepass")
+    except UnicodeDecodeError:
+        path = urllib.parse.unquote(path)
+    path = posixpath.normpath(path)
+    resolved = directory
+    for word in filter(None, path.split("/")):
+        if os.path.dirname(word) or word in (os.curdir, os.pardir):
+            continue
+        resolved = os.path.join(resolved, word)
+    if trailing_slash:
+        resolved += "/"
+    return resolved
+
+
 class SupportRewriteHandler(SimpleHTTPRequestHandler):
     """SimpleHTTPRequestHandler that rewrites support subdomain paths."""
 
     def translate_path(self, path: str) -> str:
         """Rewrite ``/<prefix>/...`` to ``/05_support/<prefix>/...`` then delegate.
 
-        Query string and fragment are stripped before matching so that paths
-        like ``/assets/css/style.css?v=1`` are still detected. Paths that
-        already start with ``/05_support/`` are left untouched to avoid double
-        rewriting.
+        See :func:`rewrite_path` for the matching rules.
+        """
+        return super().translate_path(rewrite_path(path))
+
+    def setup(self) -> None:
+        super().setup()
+        # Only DevServer constructs this handler; it attaches the Site once.
+        self.site: Site = self.server.site
+        self.link = ThrottledLink(self.site.throttle) if self.site.throttle else None
+
+    def do_GET(self) -> None:
+        self.send_site_response(send_body=True)
+
+    def do_HEAD(self) -> None:
+        self.send_site_response(send_body=False)
+
+    def send_site_response(self, send_body: bool) -> None:
+        """Answer through the shared :class:`Site` instead of ``send_head``."""
+        site = self.site
+        started = site.metrics.begin()
+        status, sent = HTTPStatus.INTERNAL_SERVER_ERROR, 0
+        try:
+            response = site.respond(self.path, self.headers)
+            status = response.status
+            profile = self.link.profile_for(self.path) if self.link else None
+            if profile:
+                time.sleep(profile.latency)
+            self.send_response(response.status)
+            for name, value in response.headers:
+                self.send_header(name, value)
+            self.end_headers()
+            if response.events is not None:
+                if send_body:
+                    self.stream_events(response.events)
+            elif send_body:
+                if profile:
+                    self.write_paced(self.link.pace(profile, response))
+                else:
+                    self.write_body(response)
+                sent = response.content_length
+        finally:
+            site.metrics.finish(self.path, status, sent, started)
+            if site.trace is not None:
+                site.trace.record(self.client_address[0], self.command, self.path, status,
+                                  sent, started, self.headers.get("Referer"))
+
+    def write_body(self, response: Response) -> None:
+        if response.body:
+            self.wfile.write(response.body)
+        if response.file:
+            with open(response.file, "rb") as f:
+                for prefix, offset, length in response.spans():
+                    if prefix:
+                        self.wfile.write(prefix)
+                    send_file_range(self.connection, f, offset, length)
+            if response.trailer:
+                self.wfile.write(response.trailer)
+
+    def stream_events(self, hub: ReloadHub) -> None:
+        """Hold the connection open and relay ``hub`` batches until the client goes.
+
+        Under ``--pool`` the stream would pin a worker for as long as the tab
+        stays open, so the socket is detached from the pool and relayed on a
+        thread of its own; the worker returns to the queue at once.
+        """
+        self.close_connection = True
+        server = self.server
+        if getattr(server, "pool", None) is None:
+            relay_events(self.wfile.write, hub)
+            return
+        request = self.request
+        server.detach(request)
+
+        def run() -> None:
+            try:
+                relay_events(request.sendall, hub)
+            except OSError:
+                pass
+            finally:
+                server.shutdown_request(request)
+
+        threading.Thread(target=run, name="sse", daemon=True).start()
+
+    def write_paced(self, paced) -> None:
+        for chunk, delay in paced:
+            if delay:
+                time.sleep(delay)
+            self.wfile.write(chunk)
+
+
+def relay_events(write, hub: ReloadHub) -> None:
+    """Write ``hub`` batches (or a heartbeat) through ``write`` until the client goes."""
+    events = hub.subscribe()
+    try:
+        write(b": connected\n\n")
+        while True:
+            try:
+                message = events.get(timeout=SSE_HEARTBEAT)
+            except queue.Empty:
+                message = b": ping\n\n"
+            write(message)
+    except (BrokenPipeError, ConnectionResetError):
+        pass
+    finally:
+        hub.unsubscribe(events)
+
+
+class WorkerPool:
+    """Fixed worker threads draining a queue of admitted connections.
+
+    ``submit`` refuses work once ``max_connections`` are queued or in
+    service, so overload turns into fast rejections instead of a pile of
+    threads contending for the GIL and the disk.
+    """
+
+    def __init__(self, workers: int, max_connections: int, handle):
+        self.workers = workers
+        self.max_connections = max(max_connections, workers)
+        self.handle = handle
+        self.queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._threads: list[threading.Thread] = []
+        self.admitted = 0
+        self.active = 0
+        self.max_queued = 0
+        self.served = 0
+        self.rejected = 0
+        self.wait = Histogram()
+
+    def start(self) -> None:
+        for n in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"pool-{n}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, item: tuple) -> bool:
+        """Queue ``item`` for :attr:`handle`; ``False`` when saturated."""
+        with self._lock:
+            if self.admitted >= self.max_connections:
+                self.rejected += 1
+                return False
+            self.admitted += 1
+            self.max_queued = max(self.max_queued, self.admitted - self.active)
+        self.queue.put((item, time.perf_counter()))
+        return True
+
+    def stop(self) -> None:
+        for _ in self._threads:
+            self.queue.put((None, 0.0))
+        deadline = time.monotonic() + WORKER_STOP_TIMEOUT
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        self._threads.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            wait = self.wait
+            return {
+                "workers": self.workers,
+                "max_connections": self.max_connections,
+                "active": self.active,
+                "queued": self.admitted - self.active,
+                "max_queued": self.max_queued,
+                "served": self.served,
+                "rejected": self.rejected,
+                "wait_mean_ms": round(wait.total / wait.count * 1000, 3) if wait.count else 0.0,
+                "wait_p50_ms": round(wait.quantile(0.50) * 1000, 3),
+                "wait_p95_ms": round(wait.quantile(0.95) * 1000, 3),
+                "wait_p99_ms": round(wait.quantile(0.99) * 1000, 3),
+            }
+
+    def _run(self) -> None:
+        while True:
+            item, queued = self.queue.get()
+            if item is None:
+                return
+            with self._lock:
+                self.active += 1
+                self.wait.observe(time.perf_counter() - queued)
+            try:
+                self.handle(*item)
+            finally:
+                with self._lock:
+                    self.active -= 1
+                    self.admitted -= 1
+                    self.served += 1
+
+
+class DevServer(ThreadingHTTPServer):
+    """``ThreadingHTTPServer`` that carries the :class:`Site` its handlers use.
+
+    With ``pool_size`` set, connections go to a :class:`WorkerPool` instead
+    of a new thread each.
+    """
+
+    def __init__(self, server_address, handler_class, site: Site, reuse_port: bool = False,
+                 pool_size: int = 0, max_connections: int = 0):
+        self.site = site
+        self.allow_reuse_port = reuse_port
+        self.pool = None
+        self.detached: set = set()
+        if pool_size > 0:
+            self.pool = WorkerPool(pool_size, max_connections or pool_size * POOL_BACKLOG_FACTOR,
+                                   self.process_pooled)
+        site.pool = self.pool
+        super().__init__(server_address, handler_class)
+        if self.pool is not None:
+            self.pool.start()
+
+    def process_request(self, request, client_address) -> None:
+        if self.pool is None:
+            super().process_request(request, client_address)
+        elif not self.pool.submit((request, client_address)):
+            # Draining the request may block for REJECT_DRAIN_TIMEOUT; keep that
+            # off the accept loop so a saturated pool still accepts at full speed.
+            threading.Thread(target=self.reject, args=(request, client_address),
+                             name="reject", daemon=True).start()
+
+    def process_pooled(self, request, client_address) -> None:
+        """Pool-thread counterpart of ``ThreadingMixIn.process_request_thread``."""
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            if request in self.detached:
+                self.detached.discard(request)
+            else:
+                self.shutdown_request(request)
+
+    def detach(self, request) -> None:
+        """Take ``request`` away from its pool worker; the caller now closes it."""
+        self.detached.add(request)
+
+    def reject(self, request, client_address) -> None:
+        """Answer ``503`` with ``Retry-After`` without involving a worker.
+
+        Runs on its own short-lived thread (see :meth:`process_request`).
         """
-        # Strip query/fragment for prefix detection.
-        path_only = urlsplit(path).path
+        response = error_response(HTTPStatus.SERVICE_UNAVAILABLE,
+                                  "Server busy, retry shortly")
+        head = [f"HTTP/1.0 {int(response.status)} Service Unavailable",
+                f"Retry-After: {RETRY_AFTER}"]
+        head += [f"{name}: {value}" for name, value in response.headers]
+        try:
+            request.settimeout(REJECT_DRAIN_TIMEOUT)
+            try:
+                request.recv(MAX_LINE)
+            except OSError:
+                pass
+            request.sendall(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + response.body)
+        except OSError:
+            pass
+        finally:
+            self.shutdown_request(request)
+        log_access(client_address[0], "-", response.status, len(response.body))
+
+    def server_close(self) -> None:
+        super().server_close()
+        if self.pool is not None:
+            self.pool.stop()
+
+
+# ---------------------------------------------------------------------------
+# Engine-neutral response building
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class Response:
+    """A fully described reply.
+
+    When ``file`` is set, its bytes follow ``body``: either the single span
+    ``offset``/``length``, or each ``parts`` entry (a multipart header followed
+    by a file span) and then ``trailer``. When ``events`` is set the body is
+    an open-ended Server-Sent Events stream fed by that hub.
+    """
+
+    status: int
+    headers: list[tuple[str, str]] = field(default_factory=list)
+    body: bytes = b""
+    file: str | None = None
+    offset: int = 0
+    length: int = 0
+    parts: list[tuple[bytes, int, int]] = field(default_factory=list)
+    trailer: bytes = b""
+    events: ReloadHub | None = None
+
+    def spans(self) -> list[tuple[bytes, int, int]]:
+        """``(prefix, offset, length)`` triples to send from ``file``."""
+        return self.parts or [(b"", self.offset, self.length)]
+
+    @property
+    def content_length(self) -> int:
+        if not self.file:
+            return len(self.body)
+        return (len(self.body) + len(self.trailer)
+                + sum(len(prefix) + length for prefix, _, length in self.spans()))
+
+
+def send_file_range(sock: socket.socket, f, offset: int, length: int) -> int:
+    """Copy ``length`` bytes of ``f`` from ``offset`` to a blocking ``sock``.
+
+    Uses ``os.sendfile`` so the kernel moves the bytes without a userspace
+    copy; where that is unavailable it sends memoryview slices of an mmap,
+    which still avoids the read-into-bytes copy of ``shutil.copyfileobj``.
+    """
+    if length <= 0:
+        return 0
+    sent = 0
+    if hasattr(os, "sendfile"):
+        try:
+            while sent < length:
+                n = os.sendfile(sock.fileno(), f.fileno(), offset + sent,
+                                min(length - sent, SENDFILE_CHUNK))
+                if n == 0:
+                    break
+                sent += n
+            return sent
+        except OSError as exc:
+            if sent or exc.errno not in SENDFILE_UNSUPPORTED:
+                raise
+    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+        end = offset + length
+        for start in range(offset, end, SENDFILE_CHUNK):
+            sock.sendall(view[start:min(start + SENDFILE_CHUNK, end)])
+    return length
+
+
+def read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def guess_type(path: str) -> str:
+    """Return the Content-Type ``SimpleHTTPRequestHandler`` would send."""
+    extensions_map = SupportRewriteHandler.extensions_map
+    ext = posixpath.splitext(path)[1]
+    if ext in extensions_map:
+        return extensions_map[ext]
+    ext = ext.lower()
+    if ext in extensions_map:
+        return extensions_map[ext]
+    guess, _ = mimetypes.guess_type(path)
+    return guess or "application/octet-stream"
+
+
+def error_response(status: int, message: str | None = None) -> Response:
+    """Build the same HTML error page ``BaseHTTPRequestHandler.send_error`` does."""
+    short, explain = BaseHTTPRequestHandler.responses.get(status, ("???", "???"))
+    content = BaseHTTPRequestHandler.error_message_format % {
+        "code": status,
+        "message": html.escape(message or short, quote=False),
+        "explain": html.escape(explain, quote=False),
+    }
+    body = content.encode("UTF-8", "replace")
+    return Response(status, [
+        ("Connection", "close"),
+        ("Content-Type", BaseHTTPRequestHandler.error_content_type),
+        ("Content-Length", str(len(body))),
+    ], body)
+
+
+def directory_listing(path: str, target: str) -> Response:
+    """Render the stdlib-style index page for a directory without index.html."""
+    try:
+        names = os.listdir(path)
+    except OSError:
+        return error_response(HTTPStatus.NOT_FOUND, "No permission to list directory")
+    names.sort(key=lambda a: a.lower())
+    try:
+        display = urllib.parse.unquote(target, errors="surrogatepass")
+    except UnicodeDecodeError:
+        display = urllib.parse.unquote(target)
+    title = f"Directory listing for {html.escape(display, quote=False)}"
+    enc = sys.getfilesystemencoding()
+    lines = ["<!DOCTYPE HTML>", '<html lang="en">', "<head>",
+             f'<meta charset="{enc}">', f"<title>{title}</title>\n</head>",
+             f"<body>\n<h1>{title}</h1>", "<hr>\n<ul>"]
+    for name in names:
+        full = os.path.join(path, name)
+        display_name = link = name
+        if os.path.isdir(full):
+            display_name = link = name + "/"
+        if os.path.islink(full):
+            display_name = name + "@"
+        lines.append('<li><a href="%s">%s</a></li>' % (
+            urllib.parse.quote(link, errors="surrogatepass"),
+            html.escape(display_name, quote=False)))
+    lines.append("</ul>\n<hr>\n</body>\n</html>\n")
+    body = "\n".join(lines).encode(enc, "surrogateescape")
+    return Response(HTTPStatus.OK, [
+        ("Content-Type", f"text/html; charset={enc}"),
+        ("Content-Length", str(len(body))),
+    ], body)
+
+
+def json_response(payload, status: int = HTTPStatus.OK, indent: int | None = 1) -> Response:
+    """Serialize ``payload`` as an uncacheable JSON reply."""
+    body = json.dumps(payload, ensure_ascii=False, indent=indent).encode("utf-8")
+    return Response(status, [
+        ("Content-Type", "application/json; charset=utf-8"),
+        ("Cache-Control", "no-store"),
+        ("Content-Length", str(len(body))),
+    ], body)
+
+
+def make_etag(digest: str, coding: str = "") -> str:
+    """Strong ETag for a content hash; each content-coding gets its own tag."""
+    return f'"{digest[:32]}-{coding}"' if coding else f'"{digest[:32]}"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """``If-None-Match`` uses the weak comparison of RFC 9110 section 13.1.2."""
+    if if_none_match.strip() == "*":
+        return True
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def parse_ranges(header: str, size: int) -> list[tuple[int, int]] | None:
+    """Parse a ``Range`` header into sorted, merged ``(start, end)`` pairs.
+
+    Returns ``None`` when the header should be ignored (not ``bytes=``,
+    malformed, or too many ranges) and ``[]`` when nothing is satisfiable.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or not spec.strip():
+        return None
+    items = spec.split(",")
+    if len(items) > MAX_RANGES:
+        return None
+    ranges = []
+    for item in items:
+        first, dash, last = item.strip().partition("-")
+        if not dash:
+            return None
+        try:
+            if first:
+                start = int(first)
+                end = int(last) if last else max(start, size - 1)
+                if start > end:
+                    return None
+            else:
+                suffix = int(last)
+                start, end = max(size - suffix, 0), size - 1
+                if suffix == 0:
+                    continue
+        except ValueError:
+            return None
+        if start < size:
+            ranges.append((start, min(end, size - 1)))
+    ranges.sort()
+    merged: list[tuple[int, int]] = []
+    for start, end in ranges:
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
 
-        if not path_only.startswith("/05_support/"):
-            stripped = path_only.lstrip("/")
-            head = stripped.split("/", 1)[0] if stripped else ""
-            if head in REWRITE_PREFIXES:
-                rewritten = "/05_support/" + stripped
-                # Preserve any query/fragment that the base class might
-                # otherwise re-parse from the original ``path``.
-                path = rewritten
+def if_range_allows(if_range: str | None, etag: str, last_modified: str) -> bool:
+    """``If-Range`` needs a strong ETag match or the exact Last-Modified date."""
+    if if_range is None:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith(("\"", "W/")):
+        return if_range == etag
+    return if_range == last_modified
 
-        return super().translate_path(path)
+
+def not_modified_since(headers, mtime: float) -> bool:
+    """Apply the stdlib's If-Modified-Since rule (ignored when If-None-Match is set)."""
+    if "If-Modified-Since" not in headers or "If-None-Match" in headers:
+        return False
+    try:
+        ims = email.utils.parsedate_to_datetime(headers["If-Modified-Since"])
+    except (TypeError, IndexError, OverflowError, ValueError):
+        return False
+    if ims.tzinfo is None:
+        ims = ims.replace(tzinfo=datetime.timezone.utc)
+    if ims.tzinfo is not datetime.timezone.utc:
+        return False
+    last_modified = datetime.datetime.fromtimestamp(mtime, datetime.timezone.utc)
+    return last_modified.replace(microsecond=0) <= ims
+
+
+class _Flight:
+    """One in-progress disk read that concurrent callers wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.entry: CachedFile | None = None
+        self.error: OSError | None = None
+
+
+@dataclass
+class CachedFile:
+    """File bytes plus the ``stat`` identity they were read under."""
+
+    data: bytes
+    mtime_ns: int
+    size: int
+
+    @property
+    def mtime(self) -> float:
+        return self.mtime_ns / 1e9
+
+
+def paths_under(keys, path: str) -> list[str]:
+    """The keys that are ``path`` itself or lie inside it as a directory."""
+    prefix = path.rstrip(os.sep) + os.sep
+    return [key for key in keys if key == path or key.startswith(prefix)]
+
+
+class FileCache:
+    """Bounded LRU of file bytes keyed by resolved path, revalidated by mtime/size.
+
+    Callers pass the ``os.stat`` result they already have; an entry whose
+    ``(st_mtime_ns, st_size)`` no longer matches is reloaded. Concurrent misses
+    on the same path share one read (single flight). Files larger than
+    ``max_entry`` are not cached and :meth:`get` returns ``None`` for them.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_CACHE_BYTES,
+                 max_entry: int = DEFAULT_CACHE_ENTRY):
+        self.max_bytes = max_bytes
+        self.max_entry = min(max_entry, max_bytes)
+        self._entries: OrderedDict[str, CachedFile] = OrderedDict()
+        self._flights: dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.shared = 0
+        self.evictions = 0
+        self.bypassed = 0
+
+    def get(self, path: str, st: os.stat_result) -> CachedFile | None:
+        """Return the cached bytes of ``path``, reading the file at most once."""
+        if st.st_size > self.max_entry:
+            with self._lock:
+                self.bypassed += 1
+            return None
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None:
+                if (entry.mtime_ns, entry.size) == (st.st_mtime_ns, st.st_size):
+                    self._entries.move_to_end(path)
+                    self.hits += 1
+                    return entry
+                self._drop(path)
+                self.stale += 1
+            flight = self._flights.get(path)
+            if flight is not None:
+                self.shared += 1
+                leader = False
+            else:
+                flight = self._flights[path] = _Flight()
+                self.misses += 1
+                leader = True
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.entry
+        try:
+            flight.entry = self._load(path)
+        except OSError as exc:
+            flight.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._flights[path]
+                if flight.entry is not None and flight.entry.size <= self.max_entry:
+                    self._store(path, flight.entry)
+            flight.done.set()
+        return flight.entry
+
+    def invalidate(self, path: str) -> None:
+        """Forget ``path`` (or everything under it) so the next request rereads it."""
+        with self._lock:
+            for key in paths_under(self._entries, path):
+                self._drop(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses + self.stale + self.shared
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "max_entry": self.max_entry,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "shared_loads": self.shared,
+                "evictions": self.evictions,
+                "bypassed": self.bypassed,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+    @staticmethod
+    def _load(path: str) -> CachedFile:
+        with open(path, "rb") as f:
+            st = os.fstat(f.fileno())
+            data = f.read()
+        return CachedFile(data, st.st_mtime_ns, len(data))
+
+    def _store(self, path: str, entry: CachedFile) -> None:
+        self._drop(path)
+        self._entries[path] = entry
+        self.current_bytes += entry.size
+        while self.current_bytes > self.max_bytes:
+            _, old = self._entries.popitem(last=False)
+            self.current_bytes -= old.size
+            self.evictions += 1
+
+    def _drop(self, path: str) -> None:
+        old = self._entries.pop(path, None)
+        if old is not None:
+            self.current_bytes -= old.size
+
+
+class ContentHashes:
+    """SHA-256 of file contents, memoized per ``(path, mtime_ns, size)``."""
+
+    def __init__(self):
+        self._digests: dict[str, tuple[int, int, str]] = {}
+        self._lock = threading.Lock()
+
+    def digest(self, path: str, mtime_ns: int, size: int, data: bytes | None = None) -> str:
+        """Return the hex digest, hashing ``data`` (or the file) only on a miss."""
+        with self._lock:
+            known = self._digests.get(path)
+        if known is not None and known[:2] == (mtime_ns, size):
+            return known[2]
+        if data is None:
+            sha = hashlib.sha256()
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    sha.update(chunk)
+        else:
+            sha = hashlib.sha256(data)
+        digest = sha.hexdigest()
+        with self._lock:
+            self._digests[path] = (mtime_ns, size, digest)
+        return digest
+
+    def invalidate(self, path: str) -> None:
+        with self._lock:
+            for key in paths_under(self._digests, path):
+                del self._digests[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._digests.clear()
+
+
+def preload_hints(html: str) -> list[tuple[str, str]]:
+    """``(ref, link params)`` for the stylesheets and scripts ``html`` loads, in order.
+
+    ``async`` scripts and non-stylesheet ``<link>`` elements (icons,
+    preconnect) are left out; module scripts become ``rel=modulepreload``.
+    """
+    hints = []
+    for tag, raw in ASSET_TAG.findall(HTML_COMMENT.sub("", html)):
+        attrs = {m.group(1).lower(): m.group(2) or m.group(3) or m.group(4) or ""
+                 for m in TAG_ATTR.finditer(raw)}
+        if tag.lower() == "script":
+            ref = attrs.get("src")
+            if not ref or "async" in attrs:
+                continue
+            params = ("rel=modulepreload" if attrs.get("type", "").lower() == "module"
+                      else "rel=preload; as=script")
+        else:
+            ref = attrs.get("href")
+            if not ref or "stylesheet" not in attrs.get("rel", "").lower().split():
+                continue
+            params = "rel=preload; as=style"
+        if (ref, params) not in hints:
+            hints.append((ref, params))
+    return hints
+
+
+def link_header(hints: list[tuple[str, str]], base: str) -> str:
+    """Render ``hints`` as one ``Link`` value, resolving refs against ``base``.
+
+    Other-origin URLs are skipped: preloading them would need ``crossorigin``
+    to match the eventual request.
+    """
+    links = []
+    for ref, params in hints:
+        url = urllib.parse.urljoin(base, ref)
+        if urlsplit(url).netloc or ref.startswith(("data:", "blob:")):
+            continue
+        links.append(f"<{urllib.parse.quote(url, safe=LINK_URL_SAFE)}>; {params}")
+        if len(links) == MAX_PRELOADS:
+            break
+    return ", ".join(links)
+
+
+class AssetLinks:
+    """Preload hints of HTML files, parsed once per ``(path, mtime_ns, size)``."""
+
+    def __init__(self):
+        self._hints: dict[str, tuple[int, int, list[tuple[str, str]]]] = {}
+        self._lock = threading.Lock()
+
+    def hints(self, path: str, mtime_ns: int, size: int,
+              data: bytes | None = None) -> list[tuple[str, str]]:
+        with self._lock:
+            known = self._hints.get(path)
+        if known is not None and known[:2] == (mtime_ns, size):
+            return known[2]
+        if data is None:
+            data = read_file(path)
+        hints = preload_hints(data.decode("utf-8", "replace"))
+        with self._lock:
+            self._hints[path] = (mtime_ns, size, hints)
+        return hints
+
+    def invalidate(self, path: str) -> None:
+        with self._lock:
+            for key in paths_under(self._hints, path):
+                del self._hints[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._hints.clear()
+
+
+def is_compressible(content_type: str, size: int) -> bool:
+    """Whether a body of this type and size is worth gzipping."""
+    if size < GZIP_MIN_SIZE:
+        return False
+    base = content_type.split(";", 1)[0].strip().lower()
+    return base.startswith("text/") or base in COMPRESSIBLE_TYPES
+
+
+def accepts_gzip(accept_encoding: str | None) -> bool:
+    """Parse ``Accept-Encoding`` and report whether ``gzip`` has a non-zero q."""
+    for item in (accept_encoding or "").split(","):
+        coding, _, params = item.strip().partition(";")
+        if coding.strip().lower() not in ("gzip", "*"):
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        return q > 0
+    return False
+
+
+class GzipStore:
+    """Gzip variants on disk under ``<cache_dir>/gzip``, named by content hash.
+
+    Artifacts are built the first time a client asks for a given content and
+    reused by every later request and every later server run. Because the
+    name is the hash of the uncompressed bytes, an edited file simply gets a
+    new artifact; nothing has to be invalidated.
+    """
+
+    def __init__(self, cache_dir: str):
+        self.root = os.path.join(cache_dir, "gzip")
+        self._locks: dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self.built = 0
+        self.reused = 0
+
+    def path_for(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest + ".gz")
+
+    def variant(self, digest: str, load) -> str:
+        """Return the artifact path for ``digest``, compressing ``load()`` if absent."""
+        target = self.path_for(digest)
+        if os.path.exists(target):
+            self.reused += 1
+            return target
+        with self._lock:
+            lock = self._locks.setdefault(digest, threading.Lock())
+        with lock:
+            if not os.path.exists(target):
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                # mtime=0 keeps the artifact byte-identical across rebuilds.
+                packed = gzip.compress(load(), compresslevel=9, mtime=0)
+                tmp = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(tmp, "wb") as f:
+                    f.write(packed)
+                os.replace(tmp, target)
+                self.built += 1
+            else:
+                self.reused += 1
+        with self._lock:
+            self._locks.pop(digest, None)
+        return target
+
+    def stats(self) -> dict:
+        return {"dir": self.root, "built": self.built, "reused": self.reused}
+
+
+@dataclass(frozen=True)
+class ImageSpec:
+    """Requested derivative: bounding box (0 = unconstrained) and output format."""
+
+    width: int
+    height: int
+    fmt: str | None
+
+    def key(self, digest: str, fmt: str) -> str:
+        return hashlib.sha256(f"{digest}:{self.width}x{self.height}:{fmt}".encode()).hexdigest()
+
+
+def parse_image_query(query: str) -> ImageSpec | None:
+    """``ImageSpec`` for ``?w=``/``?h=``/``?fmt=``; ``None`` when none are given.
+
+    Raises ``ValueError`` for out-of-range sizes or unknown formats.
+    """
+    params = urllib.parse.parse_qs(query)
+    if not any(name in params for name in ("w", "h", "fmt")):
+        return None
+    sizes = []
+    for name in ("w", "h"):
+        raw = params.get(name, ["0"])[-1] or "0"
+        if not raw.isdigit() or int(raw) > MAX_IMAGE_DIM:
+            raise ValueError(f"{name} must be a whole number of pixels up to {MAX_IMAGE_DIM}")
+        sizes.append(int(raw))
+    fmt = params.get("fmt", [None])[-1]
+    if fmt == "jpg":
+        fmt = "jpeg"
+    if fmt is not None and fmt not in IMAGE_FORMATS:
+        raise ValueError(f"fmt must be one of {', '.join(IMAGE_FORMATS)}")
+    return ImageSpec(sizes[0], sizes[1], fmt)
+
+
+def render_image(data: bytes, spec: ImageSpec, fmt: str) -> bytes:
+    """Fit ``data`` inside ``spec``'s box and encode it as ``fmt``."""
+    pil_format, _, options = IMAGE_FORMATS[fmt]
+    with Image.open(io.BytesIO(data)) as im:
+        box = (spec.width or im.width, spec.height or im.height)
+        # JPEG can decode straight at a reduced scale, which is most of the win.
+        im.draft("RGB", box)
+        im.thumbnail(box, Image.LANCZOS)
+        if fmt == "jpeg" and im.mode not in ("RGB", "L"):
+            im = im.convert("RGB")
+        elif im.mode == "P":
+            im = im.convert("RGBA")
+        out = io.BytesIO()
+        im.save(out, pil_format, **options)
+    return out.getvalue()
+
+
+class ImageStore:
+    """Resized images under ``<cache_dir>/images``, named by source hash and spec.
+
+    Like :class:`GzipStore` nothing is ever invalidated: an edited source has
+    a new hash and therefore new names. The directory is kept under
+    ``max_bytes`` by deleting the least recently served derivatives; recency
+    is the file mtime, so it survives restarts.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = DEFAULT_IMAGE_CACHE_BYTES):
+        self.root = os.path.join(cache_dir, "images")
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[str, int] | None = None
+        self._bytes = 0
+        self._locks: dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self.built = 0
+        self.reused = 0
+        self.evicted = 0
+
+    def path_for(self, key: str, fmt: str) -> str:
+        return os.path.join(self.root, key[:2], f"{key}.{fmt}")
+
+    def derivative(self, digest: str, spec: ImageSpec, fmt: str, load) -> str:
+        """Return the derivative path, rendering ``load()`` if it is not on disk."""
+        key = spec.key(digest, fmt)
+        target = self.path_for(key, fmt)
+        if self._touch(target):
+            return target
+        with self._lock:
+            lock = self._locks.setdefault(key, threading.Lock())
+        with lock:
+            if not self._touch(target):
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                rendered = render_image(load(), spec, fmt)
+                tmp = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(tmp, "wb") as f:
+                    f.write(rendered)
+                os.replace(tmp, target)
+                self._add(target, len(rendered))
+        with self._lock:
+            self._locks.pop(key, None)
+        return target
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"dir": self.root, "enabled": True, "built": self.built,
+                    "reused": self.reused, "evicted": self.evicted,
+                    "entries": len(self._entries or ()), "bytes": self._bytes,
+                    "max_bytes": self.max_bytes}
+
+    def _scan(self) -> None:
+        """Load what earlier runs left on disk, oldest first. Caller holds the lock."""
+        found = []
+        for dirpath, _, names in os.walk(self.root):
+            for name in names:
+                if name.endswith(".tmp"):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                found.append((st.st_mtime_ns, path, st.st_size))
+        self._entries = OrderedDict((path, size) for _, path, size in sorted(found))
+        self._bytes = sum(self._entries.values())
+
+    def _touch(self, path: str) -> bool:
+        with self._lock:
+            if self._entries is None:
+                self._scan()
+            if path not in self._entries:
+                return False
+            self._entries.move_to_end(path)
+            self.reused += 1
+        try:
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self._bytes -= self._entries.pop(path, 0)
+            return False
+        return True
+
+    def _add(self, path: str, size: int) -> None:
+        with self._lock:
+            self._entries[path] = size
+            self._bytes += size
+            self.built += 1
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                victim, victim_size = self._entries.popitem(last=False)
+                self._bytes -= victim_size
+                self.evicted += 1
+                try:
+                    os.remove(victim)
+                except OSError:
+                    pass
+
+
+class Histogram:
+    """Cumulative latency buckets (seconds) with Prometheus-style quantiles."""
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Interpolate within the bucket holding rank ``q`` (``histogram_quantile``)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                if i == len(LATENCY_BUCKETS):
+                    return LATENCY_BUCKETS[-1]
+                lower = LATENCY_BUCKETS[i - 1] if i else 0.0
+                return lower + (LATENCY_BUCKETS[i] - lower) * (rank - seen) / n
+            seen += n
+        return LATENCY_BUCKETS[-1]
+
+
+class Metrics:
+    """Request counters shared by both engines, served at ``/__metrics``.
+
+    Requests are grouped by the first path segment. Segments that are not a
+    top-level entry of the served directory, a rewrite prefix or a reserved
+    ``/__*`` path are folded into ``(other)`` so 404 probes cannot grow the
+    label set without bound.
+    """
+
+    def __init__(self, directory: str):
+        self.started = time.time()
+        self.top_level = set(os.listdir(directory))
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.latency: dict[str, Histogram] = {}
+        self.bytes_sent: Counter[str] = Counter()
+        self.not_found: Counter[str] = Counter()
+        self.statuses: Counter[int] = Counter()
+        self.rewrites: Counter[str] = Counter({prefix: 0 for prefix in REWRITE_PREFIXES})
+
+    def label(self, target: str) -> str:
+        head = urllib.parse.unquote(urlsplit(target).path).lstrip("/").split("/", 1)[0]
+        if not head:
+            return "/"
+        if head in self.top_level or head in REWRITE_PREFIXES or head.startswith("__"):
+            return head
+        return "(other)"
+
+    def begin(self) -> float:
+        with self._lock:
+            self.in_flight += 1
+        return time.perf_counter()
+
+    def finish(self, target: str, status: int, sent: int, started: float) -> None:
+        elapsed = time.perf_counter() - started
+        label = self.label(target)
+        rewritten = rewrite_path(target) != target
+        with self._lock:
+            self.in_flight -= 1
+            self.latency.setdefault(label, Histogram()).observe(elapsed)
+            self.bytes_sent[label] += sent
+            self.statuses[int(status)] += 1
+            if status == HTTPStatus.NOT_FOUND:
+                self.not_found[label] += 1
+            if rewritten:
+                self.rewrites[label] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            prefixes = {}
+            for label, hist in sorted(self.latency.items()):
+                prefixes[label] = {
+                    "requests": hist.count,
+                    "bytes": self.bytes_sent[label],
+                    "not_found": self.not_found[label],
+                    "mean_ms": round(hist.total / hist.count * 1000, 3),
+                    "p50_ms": round(hist.quantile(0.50) * 1000, 3),
+                    "p95_ms": round(hist.quantile(0.95) * 1000, 3),
+                    "p99_ms": round(hist.quantile(0.99) * 1000, 3),
+                }
+            return {
+                "uptime_s": round(time.time() - self.started, 1),
+                "in_flight": self.in_flight,
+                "requests": sum(self.statuses.values()),
+                "bytes": sum(self.bytes_sent.values()),
+                "not_found": sum(self.not_found.values()),
+                "status": {str(code): n for code, n in sorted(self.statuses.items())},
+                "rewrites": dict(self.rewrites),
+                "prefixes": prefixes,
+            }
+
+    def prometheus(self, extra: dict[str, dict]) -> str:
+        """Render the Prometheus text exposition format (version 0.0.4)."""
+        out = []
+
+        def series(name, labels, value):
+            rendered = ",".join('%s="%s"' % (k, v.replace("\\", "\\\\").replace('"', '\\"'))
+                                for k, v in labels)
+            out.append(f"devserver_{name}{{{rendered}}} {value}" if rendered
+                       else f"devserver_{name} {value}")
+
+        def metric(name, kind, help_text, samples):
+            out.append(f"# HELP devserver_{name} {help_text}")
+            out.append(f"# TYPE devserver_{name} {kind}")
+            for labels, value in samples:
+                series(name, labels, value)
+
+        with self._lock:
+            metric("requests_in_flight", "gauge", "Requests currently being served.",
+                   [((), self.in_flight)])
+            out.append("# HELP devserver_request_duration_seconds "
+                       "Time from parsed request to last byte sent.")
+            out.append("# TYPE devserver_request_duration_seconds histogram")
+            for label, hist in sorted(self.latency.items()):
+                cumulative = 0
+                for bound, n in zip(LATENCY_BUCKETS + (None,), hist.counts):
+                    cumulative += n
+                    le = "+Inf" if bound is None else repr(bound)
+                    series("request_duration_seconds_bucket",
+                           (("prefix", label), ("le", le)), cumulative)
+                series("request_duration_seconds_sum", (("prefix", label),), f"{hist.total:.6f}")
+                series("request_duration_seconds_count", (("prefix", label),), hist.count)
+            metric("response_bytes_total", "counter", "Body bytes sent.",
+                   [((("prefix", k),), v) for k, v in sorted(self.bytes_sent.items())])
+            metric("responses_total", "counter", "Responses by status code.",
+                   [((("code", str(k)),), v) for k, v in sorted(self.statuses.items())])
+            metric("not_found_total", "counter", "404 responses.",
+                   [((("prefix", k),), v) for k, v in sorted(self.not_found.items())])
+            metric("rewrites_total", "counter", "Requests rewritten to /05_support/.",
+                   [((("prefix", k),), v) for k, v in sorted(self.rewrites.items())])
+        for group, values in extra.items():
+            for key, value in values.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    metric(f"{group}_{key}", "gauge", f"{group} {key}.", [((), value)])
+        return "\n".join(out) + "\n"
+
+
+@dataclass
+class AnswerIndex:
+    """One answer file parsed and sorted by ``answeredAt`` for slicing."""
+
+    mtime_ns: int
+    size: int
+    records: list[dict]
+    answered_at: list[str]
+
+    @classmethod
+    def load(cls, path: str) -> "AnswerIndex":
+        with open(path, "rb") as f:
+            st = os.fstat(f.fileno())
+            data = json.load(f)
+        if isinstance(data, dict):
+            data = data.get("answers", [])
+        records = sorted((r for r in data if isinstance(r, dict)),
+                         key=lambda r: str(r.get("answeredAt") or ""))
+        return cls(st.st_mtime_ns, st.st_size, records,
+                   [str(r.get("answeredAt") or "") for r in records])
+
+    def window(self, since: str, until: str) -> tuple[int, int]:
+        """Index range of records answered on/after ``since`` and on/before ``until``.
+
+        Bounds are prefixes, so ``until=2026-01-10`` includes the whole day.
+        """
+        lo = bisect.bisect_left(self.answered_at, since) if since else 0
+        hi = (bisect.bisect_right(self.answered_at, until + "\x7f") if until
+              else len(self.answered_at))
+        return lo, max(lo, hi)
 
 
-def parse_port(argv: list[str]) -> int:
-    """Return the port from argv[1] or :data:`DEFAULT_PORT` when absent."""
-    if len(argv) < 2:
+@dataclass
+class CardIndex:
+    """A business-card file keyed by ``answerId``."""
+
+    mtime_ns: int
+    size: int
+    by_answer: dict[str, dict]
+
+    @classmethod
+    def load(cls, path: str) -> "CardIndex":
+        with open(path, "rb") as f:
+            st = os.fstat(f.fileno())
+            data = json.load(f)
+        if isinstance(data, dict):
+            data = data.get("businessCards", data.get("cards", []))
+        return cls(st.st_mtime_ns, st.st_size,
+                   {r["answerId"]: r.get("businessCard") for r in data
+                    if isinstance(r, dict) and "answerId" in r})
+
+
+class AnswerAPI:
+    """``/api/answers``: paged, filtered reads over one survey's answer file.
+
+    Files are looked up in the order ``speed-review.js`` uses (``data/responses``
+    first, then ``data/demo``). Each file is parsed into an index on first use
+    and rebuilt only when its mtime or size changes, so a page of 50 rows
+    costs a bisect and a slice instead of shipping 2 MB of JSON.
+
+    Query parameters: ``survey`` (required), ``offset``, ``limit``,
+    ``from``/``to`` (prefixes of ``answeredAt``), ``types`` (comma-separated
+    ``details[].type`` values to keep), ``order=desc`` and ``cards=1`` to
+    attach the matching ``businessCard``.
+    """
+
+    ANSWER_DIRS = ("data/responses/answers", "data/demo/demo_answers")
+    CARD_DIRS = ("data/responses/business-cards", "data/demo/demo_business-cards")
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._indexes: dict[str, AnswerIndex | CardIndex] = {}
+        self._lock = threading.Lock()
+        self.builds = 0
+
+    def locate(self, dirs: tuple[str, ...], survey: str) -> str | None:
+        for rel in dirs:
+            path = os.path.join(self.directory, *rel.split("/"), survey + ".json")
+            if os.path.isfile(path):
+                return path
+        return None
+
+    def index(self, path: str, kind):
+        st = os.stat(path)
+        with self._lock:
+            known = self._indexes.get(path)
+            if known is not None and (known.mtime_ns, known.size) == (st.st_mtime_ns, st.st_size):
+                return known
+            built = kind.load(path)
+            self._indexes[path] = built
+            self.builds += 1
+            return built
+
+    def respond(self, query: str) -> Response:
+        params = {k: v[-1] for k, v in urllib.parse.parse_qs(query).items()}
+        survey = params.get("survey", "")
+        if not SURVEY_ID.fullmatch(survey):
+            return json_response({"error": "survey is required (e.g. survey=sv_0001_26007)"},
+                                 HTTPStatus.BAD_REQUEST)
+        try:
+            offset = max(0, int(params.get("offset", 0)))
+            limit = min(API_MAX_LIMIT, max(0, int(params.get("limit", API_DEFAULT_LIMIT))))
+        except ValueError:
+            return json_response({"error": "offset and limit must be integers"},
+                                 HTTPStatus.BAD_REQUEST)
+        path = self.locate(self.ANSWER_DIRS, survey)
+        if path is None:
+            return json_response({"error": f"no answers for {survey}"}, HTTPStatus.NOT_FOUND)
+        try:
+            answers = self.index(path, AnswerIndex)
+        except (OSError, ValueError) as exc:
+            return json_response({"error": f"cannot read {survey}: {exc}"},
+                                 HTTPStatus.INTERNAL_SERVER_ERROR)
+        lo, hi = answers.window(params.get("from", ""), params.get("to", ""))
+        if params.get("order") == "desc":
+            start, stop = max(lo, hi - offset - limit), hi - offset
+            rows = answers.records[start:max(start, stop)][::-1]
+        else:
+            rows = answers.records[lo + offset:min(hi, lo + offset + limit)]
+        types = {t for t in params.get("types", "").split(",") if t}
+        cards = None
+        if params.get("cards") in ("1", "true"):
+            card_path = self.locate(self.CARD_DIRS, survey)
+            try:
+                cards = self.index(card_path, CardIndex).by_answer if card_path else {}
+            except (OSError, ValueError):
+                cards = {}
+        items = []
+        for row in rows:
+            if types:
+                row = dict(row, details=[d for d in row.get("details", [])
+                                         if isinstance(d, dict) and d.get("type") in types])
+            if cards is not None:
+                row = dict(row, businessCard=cards.get(row.get("answerId")))
+            items.append(row)
+        return json_response({
+            "surveyId": survey,
+            "source": os.path.relpath(path, self.directory).replace(os.sep, "/"),
+            "total": hi - lo,
+            "offset": offset,
+            "limit": limit,
+            "items": items,
+        }, indent=None)
+
+
+def range_response(path: str, data: bytes | None, size: int, ctype: str,
+                   ranges: list[tuple[int, int]],
+                   headers_out: list[tuple[str, str]]) -> Response:
+    """Build a 206 (one range or ``multipart/byteranges``) or a 416 reply."""
+    if not ranges:
+        return Response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE, headers_out + [
+            ("Content-Range", f"bytes */{size}"), ("Content-Length", "0")])
+    if len(ranges) == 1:
+        start, end = ranges[0]
+        headers_out = headers_out + [("Content-Range", f"bytes {start}-{end}/{size}"),
+                                     ("Content-Length", str(end - start + 1))]
+        if data is not None:
+            return Response(HTTPStatus.PARTIAL_CONTENT, headers_out, data[start:end + 1])
+        return Response(HTTPStatus.PARTIAL_CONTENT, headers_out, file=path,
+                        offset=start, length=end - start + 1)
+    boundary = secrets.token_hex(12)
+    parts = [((f"\r\n--{boundary}\r\nContent-Type: {ctype}\r\n"
+               f"Content-Range: bytes {start}-{end}/{size}\r\n\r\n").encode("latin-1"),
+              start, end - start + 1) for start, end in ranges]
+    trailer = f"\r\n--{boundary}--\r\n".encode("latin-1")
+    headers_out = [(k, v) for k, v in headers_out if k != "Content-type"]
+    headers_out.append(("Content-Type", f"multipart/byteranges; boundary={boundary}"))
+    if data is not None:
+        body = b"".join(prefix + data[offset:offset + length]
+                        for prefix, offset, length in parts) + trailer
+        return Response(HTTPStatus.PARTIAL_CONTENT,
+                        headers_out + [("Content-Length", str(len(body)))], body)
+    response = Response(HTTPStatus.PARTIAL_CONTENT, headers_out, file=path,
+                        parts=parts, trailer=trailer)
+    response.headers.append(("Content-Length", str(response.content_length)))
+    return response
+
+
+class Site:
+    """Everything both engines need to answer a request for ``directory``."""
+
+    def __init__(self, directory: str, cache: FileCache | None = None,
+                 gzip_store: GzipStore | None = None, throttle: Throttle | None = None,
+                 preload: bool = True, early_hints: bool = False,
+                 images: ImageStore | None = None):
+        self.directory = directory
+        self.cache = cache
+        self.gzip = gzip_store
+        self.images = images
+        self.pool: WorkerPool | None = None
+        self.trace: TraceWriter | None = None
+        self.reload: ReloadHub | None = None
+        self.index: FileIndex | None = None
+        self.live_reload = False
+        self.throttle = throttle
+        self.assets = AssetLinks() if preload else None
+        self.early_hints = early_hints
+        self.hashes = ContentHashes()
+        self.metrics = Metrics(directory)
+        self.answers = AnswerAPI(directory)
+
+    def respond(self, target: str, headers) -> Response:
+        """Answer a GET/HEAD for ``target``."""
+        parts = urlsplit(target)
+        if parts.path == "/__cache":
+            return json_response(self.cache_stats())
+        if parts.path == "/__metrics":
+            return self.metrics_response(parts.query, headers)
+        if parts.path == "/api/answers":
+            return self.answers.respond(parts.query)
+        if parts.path == "/__events":
+            if self.reload is None:
+                return error_response(HTTPStatus.NOT_FOUND, "File watching is disabled")
+            return Response(HTTPStatus.OK, [("Content-Type", "text/event-stream"),
+                                            ("Cache-Control", "no-store"),
+                                            ("Connection", "close")], events=self.reload)
+        if parts.path == "/__livereload.js":
+            return Response(HTTPStatus.OK, [("Content-Type", "application/javascript"),
+                                            ("Cache-Control", "no-cache"),
+                                            ("Content-Length", str(len(LIVERELOAD_SCRIPT)))],
+                            LIVERELOAD_SCRIPT)
+        return self.respond_static(target, headers)
+
+    def early_link(self, target: str, headers) -> str | None:
+        """``Link`` value to send as ``103 Early Hints`` before :meth:`respond` runs.
+
+        Resolves ``target`` the way :meth:`respond_static` would, but only
+        stats the file and reads its preload list from :class:`AssetLinks`
+        (parsed once per mtime), so the hint leaves before the body is hashed,
+        compressed or read. ``None`` for anything that will not be a fresh
+        ``200`` HTML page: special paths, directories without a trailing
+        slash, non-HTML files and conditional requests that may turn into 304.
+        """
+        if self.assets is None or "If-None-Match" in headers or "If-Modified-Since" in headers:
+            return None
+        parts = urlsplit(target)
+        if parts.path in ("/__cache", "/__metrics", "/api/answers", "/__events",
+                          "/__livereload.js"):
+            return None
+        path = translate_path(target, self.directory)
+        if path.endswith("/"):
+            path = next((index for index in (path + "index.html", path + "index.htm")
+                         if self.is_file(index)), "")
+        if not path or not guess_type(path).startswith("text/html"):
+            return None
+        try:
+            st = os.stat(path)
+            if not stat.S_ISREG(st.st_mode):
+                return None
+            hints = self.assets.hints(path, st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+        return link_header(hints, parts.path) or None
+
+    def is_file(self, path: str) -> bool:
+        kind = self.index.lookup(path) if self.index is not None else None
+        return kind == FileIndex.FILE if kind is not None else os.path.isfile(path)
+
+    def invalidate(self, path: str) -> None:
+        """Forget everything derived from ``path`` (bytes, hash, preload list).
+
+        ``path`` may be a directory, including one that no longer exists;
+        every entry under it goes too.
+
+        Gzip and image artifacts need nothing: they are named by content
+        hash, so the next request simply finds a new name.
+        """
+        if self.cache is not None:
+            self.cache.invalidate(path)
+        self.hashes.invalidate(path)
+        if self.assets is not None:
+            self.assets.invalidate(path)
+
+    def invalidate_all(self) -> None:
+        if self.cache is not None:
+            self.cache.clear()
+        self.hashes.clear()
+        if self.assets is not None:
+            self.assets.clear()
+
+    def cache_stats(self) -> dict:
+        return {
+            "files": self.cache.stats() if self.cache else {"enabled": False},
+            "gzip": self.gzip.stats() if self.gzip else {"enabled": False},
+            "images": self.images.stats() if self.images else {"enabled": False},
+            "index": self.index.stats() if self.index else {"enabled": False},
+        }
+
+    def metrics_response(self, query: str, headers) -> Response:
+        """JSON by default; Prometheus text for ``?format=prometheus`` or scrapers."""
+        fmt = urllib.parse.parse_qs(query).get("format", [""])[0]
+        if not fmt:
+            accept = headers.get("Accept") or ""
+            scraper = "text/plain" in accept or "openmetrics" in accept
+            fmt = "prometheus" if scraper and "application/json" not in accept else "json"
+        if fmt == "prometheus":
+            stats = self.cache_stats()
+            extra = {"file_cache": stats["files"], "gzip": stats["gzip"],
+                     "images": stats["images"]}
+            if self.pool is not None:
+                extra["pool"] = self.pool.stats()
+            text = self.metrics.prometheus(extra).encode("utf-8")
+            return Response(HTTPStatus.OK, [
+                ("Content-Type", "text/plain; version=0.0.4; charset=utf-8"),
+                ("Cache-Control", "no-store"),
+                ("Content-Length", str(len(text))),
+            ], text)
+        snapshot = dict(self.metrics.snapshot(), **self.cache_stats())
+        if self.pool is not None:
+            snapshot["pool"] = self.pool.stats()
+        return json_response(snapshot)
+
+    def respond_static(self, target: str, headers) -> Response:
+        """Resolve ``target`` the way ``SimpleHTTPRequestHandler.send_head`` does."""
+        path = translate_path(target, self.directory)
+        kind = self.index.lookup(path) if self.index is not None else None
+        if kind == FileIndex.MISSING:
+            return error_response(HTTPStatus.NOT_FOUND, "File not found")
+        if kind == FileIndex.DIR or (kind is None and os.path.isdir(path)):
+            parts = urlsplit(target)
+            if not parts.path.endswith("/"):
+                location = urllib.parse.urlunsplit(
+                    (parts[0], parts[1], parts[2] + "/", parts[3], parts[4]))
+                return Response(HTTPStatus.MOVED_PERMANENTLY,
+                                [("Location", location), ("Content-Length", "0")])
+            for index in ("index.html", "index.htm"):
+                index = os.path.join(path, index)
+                if self.is_file(index):
+                    path = index
+                    break
+            else:
+                return directory_listing(path, target)
+        if path.endswith("/"):
+            return error_response(HTTPStatus.NOT_FOUND, "File not found")
+        try:
+            st = os.stat(path)
+        except OSError:
+            return error_response(HTTPStatus.NOT_FOUND, "File not found")
+        if not stat.S_ISREG(st.st_mode):
+            return error_response(HTTPStatus.NOT_FOUND, "File not found")
+        cached = None
+        if self.cache is not None:
+            try:
+                cached = self.cache.get(path, st)
+            except OSError:
+                return error_response(HTTPStatus.NOT_FOUND, "File not found")
+        mtime_ns = cached.mtime_ns if cached else st.st_mtime_ns
+        size = cached.size if cached else st.st_size
+        data = cached.data if cached else None
+        try:
+            digest = self.hashes.digest(path, mtime_ns, size, data)
+        except OSError:
+            return error_response(HTTPStatus.NOT_FOUND, "File not found")
+        ctype = guess_type(path)
+        if self.images is not None and ctype in RESIZABLE_TYPES:
+            try:
+                spec = parse_image_query(urlsplit(target).query)
+            except ValueError as exc:
+                return error_response(HTTPStatus.BAD_REQUEST, str(exc))
+            if spec is not None:
+                resized = self.image_response(path, digest, data, mtime_ns, ctype,
+                                              spec, headers)
+                if resized is not None:
+                    return resized
+        headers_out = [
+            ("Content-type", ctype),
+            ("Last-Modified", email.utils.formatdate(mtime_ns / 1e9, usegmt=True)),
+            # Always revalidate: the ETag turns an unchanged reload into a 304.
+            ("Cache-Control", "no-cache"),
+        ]
+        inject = self.live_reload and ctype.startswith("text/html")
+        use_gzip = False
+        if self.gzip is not None and is_compressible(ctype, size) and not inject:
+            headers_out.append(("Vary", "Accept-Encoding"))
+            use_gzip = accepts_gzip(headers.get("Accept-Encoding"))
+        etag = make_etag(digest, "gzip" if use_gzip else "livereload" if inject else "")
+        if "If-None-Match" in headers:
+            if etag_matches(headers["If-None-Match"], etag):
+                return Response(HTTPStatus.NOT_MODIFIED, headers_out + [("ETag", etag)])
+        elif not_modified_since(headers, mtime_ns / 1e9):
+            return Response(HTTPStatus.NOT_MODIFIED, headers_out + [("ETag", etag)])
+        if self.assets is not None and ctype.startswith("text/html"):
+            try:
+                hints = self.assets.hints(path, mtime_ns, size, data)
+            except OSError:
+                hints = []
+            link = link_header(hints, urlsplit(target).path)
+            if link:
+                headers_out.append(("Link", link))
+        if inject:
+            try:
+                body = inject_livereload(data if data is not None else read_file(path))
+            except OSError:
+                return error_response(HTTPStatus.NOT_FOUND, "File not found")
+            return Response(HTTPStatus.OK, headers_out + [
+                ("ETag", etag), ("Content-Length", str(len(body)))], body)
+        identity_etag = make_etag(digest)
+        headers_out.append(("Accept-Ranges", "bytes"))
+        if "Range" in headers and if_range_allows(headers.get("If-Range"), identity_etag,
+                                                   headers_out[1][1]):
+            ranges = parse_ranges(headers["Range"], size)
+            if ranges is not None:
+                return range_response(path, data, size, ctype, ranges,
+                                      headers_out + [("ETag", identity_etag)])
+        if use_gzip:
+            gz = self.gzip_response(path, digest, data, headers_out + [("ETag", etag)])
+            if gz is not None:
+                return gz
+        headers_out += [("ETag", identity_etag), ("Content-Length", str(size))]
+        if cached:
+            return Response(HTTPStatus.OK, headers_out, cached.data)
+        return Response(HTTPStatus.OK, headers_out, file=path, length=size)
+
+    def image_response(self, path: str, digest: str, data: bytes | None, mtime_ns: int,
+                       ctype: str, spec: ImageSpec, headers) -> Response | None:
+        """Serve the ``spec`` derivative of ``path``; ``None`` falls back to the original."""
+        fmt = spec.fmt or RESIZABLE_TYPES[ctype]
+        try:
+            artifact = self.images.derivative(digest, spec, fmt, lambda: data if data is not None
+                                              else read_file(path))
+            st = os.stat(artifact)
+            packed = self.cache.get(artifact, st) if self.cache is not None else None
+        except (OSError, ValueError, Image.DecompressionBombError) as exc:
+            sys.stderr.write(f"Could not resize {path}: {exc}\n")
+            return None
+        etag = make_etag(spec.key(digest, fmt))
+        headers_out = [
+            ("Content-type", IMAGE_FORMATS[fmt][1]),
+            ("Last-Modified", email.utils.formatdate(mtime_ns / 1e9, usegmt=True)),
+            ("Cache-Control", "no-cache"),
+            ("ETag", etag),
+        ]
+        if etag_matches(headers.get("If-None-Match") or "", etag):
+            return Response(HTTPStatus.NOT_MODIFIED, headers_out)
+        length = packed.size if packed else st.st_size
+        headers_out.append(("Content-Length", str(length)))
+        if packed:
+            return Response(HTTPStatus.OK, headers_out, packed.data)
+        return Response(HTTPStatus.OK, headers_out, file=artifact, length=length)
+
+    def gzip_response(self, path: str, digest: str, data: bytes | None,
+                      headers_out: list[tuple[str, str]]) -> Response | None:
+        """Serve the gzip artifact for ``path``; ``None`` falls back to identity."""
+        try:
+            artifact = self.gzip.variant(digest, lambda: data if data is not None
+                                         else read_file(path))
+            art_st = os.stat(artifact)
+            packed = self.cache.get(artifact, art_st) if self.cache is not None else None
+        except OSError:
+            return None
+        length = packed.size if packed else art_st.st_size
+        headers_out = headers_out + [("Content-Encoding", "gzip"),
+                                     ("Content-Length", str(length))]
+        if packed:
+            return Response(HTTPStatus.OK, headers_out, packed.data)
+        return Response(HTTPStatus.OK, headers_out, file=artifact, length=length)
+
+
+# ---------------------------------------------------------------------------
+# File watching and live reload
+# ---------------------------------------------------------------------------
+
+
+def inject_livereload(page: bytes) -> bytes:
+    """Add :data:`LIVERELOAD_TAG` before ``</body>`` (or at the end)."""
+    at = page.lower().rfind(b"</body>")
+    if at < 0:
+        return page + LIVERELOAD_TAG
+    return page[:at] + LIVERELOAD_TAG + page[at:]
+
+
+def watch_ignored(name: str) -> bool:
+    return name in WATCH_IGNORED_DIRS or name.endswith(WATCH_IGNORED_SUFFIXES)
+
+
+class FileIndex:
+    """Kind of every path under ``root``: file, directory or opaque.
+
+    Built once by :meth:`build` and then patched by :meth:`update` for each
+    path the watcher reports, immediately rather than debounced. Updates
+    that arrive while the build is running are replayed after it, so the
+    walk cannot resurrect a path deleted meanwhile. :meth:`lookup` answers
+    ``None`` whenever the filesystem must be asked instead.
+    """
+
+    FILE, DIR, OPAQUE, MISSING = "file", "dir", "opaque", "missing"
+
+    def __init__(self, root: str, ignore: set[str] = frozenset()):
+        self.root = root
+        self.ignore = ignore
+        self._entries: dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._backlog: list[str] | None = []
+        self.files = 0
+        self.dirs = 0
+        self.build_seconds = 0.0
+        self.updates = 0
+
+    @property
+    def ready(self) -> bool:
+        return self._backlog is None
+
+    def build(self) -> None:
+        started = time.perf_counter()
+        entries = self._walk(self.root)
+        with self._lock:
+            self._entries = entries
+            backlog, self._backlog = self._backlog or [], None
+        for path in backlog:
+            self.update(path)
+        self.build_seconds = time.perf_counter() - started
+        with self._lock:
+            self._count()
+
+    def lookup(self, path: str) -> str | None:
+        """``FILE``, ``DIR`` or ``MISSING`` for ``path``; ``None`` if unknown."""
+        if self._backlog is not None:
+            return None
+        path = path.rstrip("/") or "/"
+        kind = self._entries.get(path)
+        if kind == self.OPAQUE:
+            return None
+        if kind is not None:
+            return kind
+        # Only a directory the index has walked can vouch for a missing child.
+        return self.MISSING if self._entries.get(os.path.dirname(path)) == self.DIR else None
+
+    def update(self, path: str) -> None:
+        with self._lock:
+            if self._backlog is not None:
+                self._backlog.append(path)
+                return
+            self.updates += 1
+        if path == self.root:
+            entries = self._walk(self.root)
+            with self._lock:
+                self._entries = entries
+                self._count()
+            return
+        try:
+            st = os.lstat(path)
+        except OSError:
+            with self._lock:
+                if self._entries.pop(path, None) == self.DIR:
+                    prefix = path + os.sep
+                    for key in [k for k in self._entries if k.startswith(prefix)]:
+                        del self._entries[key]
+                self._count()
+            return
+        if stat.S_ISDIR(st.st_mode):
+            entries = self._walk(path)
+        else:
+            entries = {path: self.OPAQUE if stat.S_ISLNK(st.st_mode) else self.FILE}
+        with self._lock:
+            self._entries.update(entries)
+            self._count()
+
+    def stats(self) -> dict:
+        return {"ready": self.ready, "files": self.files, "dirs": self.dirs,
+                "build_ms": round(self.build_seconds * 1000, 1), "updates": self.updates}
+
+    def _count(self) -> None:
+        kinds = Counter(self._entries.values())
+        self.files, self.dirs = kinds[self.FILE], kinds[self.DIR]
+
+    def _walk(self, top: str) -> dict[str, str]:
+        entries = {top: self.DIR}
+        stack = [top]
+        while stack:
+            directory = stack.pop()
+            try:
+                with os.scandir(directory) as it:
+                    for entry in it:
+                        if entry.is_symlink() or entry.path in self.ignore or watch_ignored(entry.name):
+                            entries[entry.path] = self.OPAQUE
+                        elif entry.is_dir(follow_symlinks=False):
+                            entries[entry.path] = self.DIR
+                            stack.append(entry.path)
+                        else:
+                            entries[entry.path] = self.FILE
+            except OSError:
+                entries[directory] = self.OPAQUE
+        return entries
+
+
+class ReloadHub:
+    """Fans change batches out to ``/__events`` subscribers on either engine."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._queues: set[queue.SimpleQueue] = set()
+        self._loops: dict[asyncio.Queue, asyncio.AbstractEventLoop] = {}
+        self.batches = 0
+
+    def subscribe(self) -> queue.SimpleQueue:
+        q: queue.SimpleQueue = queue.SimpleQueue()
+        with self._lock:
+            self._queues.add(q)
+        return q
+
+    def subscribe_async(self) -> asyncio.Queue:
+        q: asyncio.Queue = asyncio.Queue()
+        with self._lock:
+            self._loops[q] = asyncio.get_running_loop()
+        return q
+
+    def unsubscribe(self, q) -> None:
+        with self._lock:
+            self._queues.discard(q)
+            self._loops.pop(q, None)
+
+    def publish(self, paths: list[str]) -> None:
+        message = sse_message("change", {"paths": paths})
+        with self._lock:
+            self.batches += 1
+            queues = list(self._queues)
+            loops = list(self._loops.items())
+        for q in queues:
+            q.put(message)
+        for q, loop in loops:
+            try:
+                loop.call_soon_threadsafe(q.put_nowait, message)
+            except RuntimeError:  # loop already closed
+                self.unsubscribe(q)
+
+    def subscribers(self) -> int:
+        with self._lock:
+            return len(self._queues) + len(self._loops)
+
+
+def sse_message(event: str, payload) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n".encode()
+
+
+class Watcher:
+    """Background thread that reports changed files under ``root`` in batches.
+
+    ``on_change`` receives absolute paths. :meth:`create` picks inotify where
+    the C library provides it and the mtime scan otherwise.
+    """
+
+    kind = "none"
+
+    def __init__(self, root: str, on_change, ignore: set[str] = frozenset()):
+        self.root = root
+        self.on_change = on_change
+        self.ignore = ignore
+        # Called at once for every raw event path, files and directories alike.
+        self.on_path = None
+        self.thread = threading.Thread(target=self.run, name=f"watch-{self.kind}", daemon=True)
+
+    @staticmethod
+    def create(root: str, on_change, ignore: set[str] = frozenset()) -> "Watcher":
+        try:
+            return InotifyWatcher(root, on_change, ignore)
+        except OSError:
+            return ScanWatcher(root, on_change, ignore)
+
+    def start(self) -> "Watcher":
+        self.thread.start()
+        return self
+
+    def skip(self, path: str) -> bool:
+        return path in self.ignore or watch_ignored(os.path.basename(path))
+
+    def directories(self, top: str):
+        for dirpath, dirnames, _ in os.walk(top):
+            dirnames[:] = [d for d in dirnames
+                           if not self.skip(os.path.join(dirpath, d))]
+            yield dirpath
+
+    def files(self, directory: str) -> list[str]:
+        """Non-directory entries directly inside ``directory``, minus ignored ones."""
+        try:
+            with os.scandir(directory) as entries:
+                return [entry.path for entry in entries
+                        if not entry.is_dir(follow_symlinks=False) and not self.skip(entry.path)]
+        except OSError:
+            return []
+
+    def run(self) -> None:
+        raise NotImplementedError
+
+
+class InotifyWatcher(Watcher):
+    """Linux inotify through ctypes: one watch per directory, no polling."""
+
+    kind = "inotify"
+    IN_MODIFY = 0x002
+    IN_ATTRIB = 0x004
+    IN_CLOSE_WRITE = 0x008
+    IN_MOVED_FROM = 0x040
+    IN_MOVED_TO = 0x080
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    IN_DELETE_SELF = 0x400
+    IN_Q_OVERFLOW = 0x4000
+    IN_IGNORED = 0x8000
+    IN_ISDIR = 0x40000000
+    IN_CLOEXEC = 0o2000000
+    MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+            | IN_CREATE | IN_DELETE | IN_DELETE_SELF)
+    EVENT = struct.Struct("iIII")
+
+    def __init__(self, root: str, on_change, ignore: set[str] = frozenset()):
+        super().__init__(root, on_change, ignore)
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError(errno.ENOSYS, "inotify is not available")
+        self.libc = libc
+        self.fd = libc.inotify_init1(self.IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.dirs: dict[int, str] = {}
+        try:
+            for directory in self.directories(root):
+                self.add(directory)
+        except OSError:
+            os.close(self.fd)
+            raise
+
+    def add(self, directory: str) -> None:
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), self.MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err in (errno.ENOENT, errno.ENOTDIR, errno.EACCES):
+                return
+            raise OSError(err, f"inotify_add_watch({directory}) failed")
+        self.dirs[wd] = directory
+
+    def run(self) -> None:
+        pending: set[str] = set()
+        while True:
+            ready, _, _ = select.select([self.fd], [], [], WATCH_DEBOUNCE if pending else None)
+            if not ready:
+                self.on_change(sorted(pending))
+                pending = set()
+                continue
+            data = os.read(self.fd, 64 * 1024)
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = self.EVENT.unpack_from(data, offset)
+                offset += self.EVENT.size
+                name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+                offset += length
+                if mask & self.IN_Q_OVERFLOW:
+                    # Events were dropped; report the whole tree once.
+                    pending.add(self.root)
+                    if self.on_path is not None:
+                        self.on_path(self.root)
+                    continue
+                if mask & self.IN_IGNORED:
+                    self.dirs.pop(wd, None)
+                    continue
+                directory = self.dirs.get(wd)
+                if directory is None or not name:
+                    continue
+                path = os.path.join(directory, name)
+                if self.skip(path):
+                    continue
+                if self.on_path is not None:
+                    self.on_path(path)
+                pending.add(path)
+                if mask & self.IN_ISDIR and mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                    # A directory moved in arrives with its files already
+                    # inside; no per-file events will follow for them.
+                    for sub in self.directories(path):
+                        try:
+                            self.add(sub)
+                        except OSError as exc:
+                            sys.stderr.write(f"watch: {exc}\n")
+                        pending.update(self.files(sub))
+
+
+class ScanWatcher(Watcher):
+    """Portable fallback: compare mtime/size of every file once per interval."""
+
+    kind = "scan"
+
+    def snapshot(self) -> dict[str, tuple[int, int]]:
+        seen = {}
+        for directory in self.directories(self.root):
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.is_file(follow_symlinks=False) and not self.skip(entry.path):
+                            try:
+                                st = entry.stat()
+                            except OSError:
+                                continue
+                            seen[entry.path] = (st.st_mtime_ns, st.st_size)
+            except OSError:
+                continue
+        return seen
+
+    def run(self) -> None:
+        before = self.snapshot()
+        while True:
+            time.sleep(WATCH_SCAN_INTERVAL)
+            after = self.snapshot()
+            changed = [path for path in before.keys() | after.keys()
+                       if before.get(path) != after.get(path)]
+            before = after
+            if changed:
+                self.on_change(sorted(changed))
+
+
+def start_watcher(site: Site, ignore: set[str]) -> Watcher:
+    """Watch ``site.directory``; invalidate and publish each batch of changes."""
+    site.reload = ReloadHub()
+    root = site.directory
+
+    def on_change(paths: list[str]) -> None:
+        if root in paths:
+            # inotify overflowed: everything may be stale.
+            site.invalidate_all()
+            site.reload.publish(["/"])
+            return
+        for path in paths:
+            site.invalidate(path)
+        site.reload.publish(["/" + os.path.relpath(path, root).replace(os.sep, "/")
+                             for path in paths])
+
+    watcher = Watcher.create(root, on_change, ignore)
+    if watcher.kind == "inotify":
+        # Only inotify reports changes promptly enough to trust the index
+        # for 404s; the scan fallback would leave a second-long stale window.
+        site.index = FileIndex(root, ignore)
+        watcher.on_path = site.index.update
+        threading.Thread(target=build_index, args=(site.index,), name="file-index",
+                         daemon=True).start()
+    return watcher.start()
+
+
+def build_index(index: FileIndex) -> None:
+    index.build()
+    print(f"File index ready: {index.files} files, {index.dirs} directories "
+          f"in {index.build_seconds * 1000:.0f} ms "
+          f"({time.perf_counter() - PROCESS_STARTED:.2f} s after start).")
+
+
+# ---------------------------------------------------------------------------
+# Network condition emulation
+# ---------------------------------------------------------------------------
+
+
+@dataclass(frozen=True)
+class Profile:
+    """An emulated link: latency per response, bandwidth per connection."""
+
+    name: str
+    latency: float
+    rate: int
+    stall_chance: float = 0.0
+    stall: tuple[float, float] = (0.0, 0.0)
+
+
+# 3g and fast3g use the numbers of Chrome DevTools' "Slow 3G" and "Fast 3G"
+# presets; lossy approximates a crowded exhibition-hall Wi-Fi, where one in
+# twenty chunks waits for a retransmit.
+PROFILES = {
+    "3g": Profile("3g", latency=2.0, rate=50_000),
+    "fast3g": Profile("fast3g", latency=0.5625, rate=180_000),
+    "lossy": Profile("lossy", latency=0.1, rate=250_000,
+                     stall_chance=0.05, stall=(0.2, 1.0)),
+}
+
+
+class TokenBucket:
+    """Byte budget refilled at ``rate`` per second, holding at most ``burst``."""
+
+    def __init__(self, rate: int, burst: int = THROTTLE_CHUNK):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.stamp = time.monotonic()
+
+    def take(self, n: int) -> float:
+        """Spend ``n`` bytes and return how long to wait before sending them."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+        self.tokens -= n
+        return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+
+class Throttle:
+    """Which profile applies to a request: the first matching rule, else ``default``."""
+
+    def __init__(self, default: Profile | None = None,
+                 rules: list[tuple[str, Profile]] | None = None):
+        self.default = default
+        self.rules = rules or []
+
+    def profile_for(self, target: str) -> Profile | None:
+        path = urlsplit(target).path
+        if path.startswith("/__"):
+            return None
+        for prefix, profile in self.rules:
+            if path.startswith(prefix):
+                return profile
+        return self.default
+
+    def describe(self) -> str:
+        parts = [f"{prefix} -> {profile.name}" for prefix, profile in self.rules]
+        if self.default:
+            parts.append(f"everything else -> {self.default.name}")
+        return ", ".join(parts)
+
+
+class ThrottledLink:
+    """Throttling state of one connection: a token bucket per profile in use."""
+
+    def __init__(self, throttle: Throttle):
+        self.throttle = throttle
+        self.buckets: dict[str, TokenBucket] = {}
+        # Fixed seed: every connection sees the same stall pattern, so a
+        # lossy run is reproducible in CI.
+        self.random = random.Random(0)
+
+    def profile_for(self, target: str) -> Profile | None:
+        return self.throttle.profile_for(target)
+
+    def pace(self, profile: Profile, response: Response):
+        """Yield ``(chunk, delay)``: wait ``delay`` seconds, then send ``chunk``."""
+        bucket = self.buckets.get(profile.name)
+        if bucket is None:
+            bucket = self.buckets[profile.name] = TokenBucket(profile.rate)
+        for chunk in iter_body(response):
+            delay = bucket.take(len(chunk))
+            if profile.stall_chance and self.random.random() < profile.stall_chance:
+                delay += self.random.uniform(*profile.stall)
+            yield chunk, delay
+
+
+def iter_body(response: Response, size: int = THROTTLE_CHUNK):
+    """Yield the body of ``response`` in pieces of at most ``size`` bytes."""
+    def pieces(data: bytes):
+        view = memoryview(data)
+        for start in range(0, len(view), size):
+            yield view[start:start + size]
+
+    yield from pieces(response.body)
+    if not response.file:
+        return
+    with open(response.file, "rb") as f:
+        for prefix, offset, length in response.spans():
+            yield from pieces(prefix)
+            f.seek(offset)
+            while length > 0:
+                data = f.read(min(size, length))
+                if not data:
+                    break
+                length -= len(data)
+                yield data
+    yield from pieces(response.trailer)
+
+
+def parse_throttle_rule(value: str) -> tuple[str, Profile]:
+    """``--throttle PREFIX=PROFILE`` -> ``(prefix, profile)``."""
+    prefix, sep, name = value.rpartition("=")
+    if not sep or not prefix.startswith("/") or name not in PROFILES:
+        raise argparse.ArgumentTypeError(
+            f"expected /PATH/PREFIX=PROFILE with PROFILE one of {', '.join(PROFILES)}")
+    return prefix, PROFILES[name]
+
+
+def build_throttle(args: argparse.Namespace) -> Throttle | None:
+    if not args.profile and not args.throttle:
+        return None
+    return Throttle(PROFILES.get(args.profile), args.throttle)
+
+
+# ---------------------------------------------------------------------------
+# asyncio engine
+# ---------------------------------------------------------------------------
+
+
+class TraceWriter:
+    """Append-only request trace, one tab-separated line per request.
+
+    Each line goes out in a single ``write`` on an ``O_APPEND`` descriptor,
+    so ``--workers`` processes can share one file without interleaving and
+    nothing is lost if the server is killed mid-run.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        if os.fstat(self.fd).st_size == 0:
+            os.write(self.fd, TRACE_HEADER.encode())
+
+    def record(self, client: str, method: str, target: str, status: int, sent: int,
+               started: float, referer: str | None) -> None:
+        elapsed = time.perf_counter() - started
+        path = urlsplit(target).path
+        rewritten = rewrite_path(path)
+        fields = (f"{time.time() - elapsed:.4f}", client, method, target,
+                  rewritten if rewritten != path else "-", str(int(status)), str(sent),
+                  f"{elapsed * 1000:.3f}", referer or "-")
+        line = "\t".join(f.replace("\t", " ").replace("\n", " ") for f in fields) + "\n"
+        os.write(self.fd, line.encode("utf-8", "replace"))
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class BadRequest(Exception):
+    """A request the asyncio engine cannot parse; answered with ``status``."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def log_access(client: str, requestline: str, status: int, size: int | str) -> None:
+    """Write an access line in ``BaseHTTPRequestHandler.log_request`` format."""
+    stamp = time.strftime("%d/%b/%Y %H:%M:%S")
+    sys.stderr.write(f'{client} - - [{stamp}] "{requestline}" {int(status)} {size}\n')
+
+
+async def read_request(reader: asyncio.StreamReader):
+    """Return ``(method, target, version, headers)`` or ``None`` on clean EOF."""
+    line = await reader.readline()
+    if not line:
+        return None
+    if len(line) > MAX_LINE:
+        raise BadRequest(HTTPStatus.REQUEST_URI_TOO_LONG, "Request-URI Too Long")
+    requestline = line.decode("iso-8859-1").rstrip("\r\n")
+    words = requestline.split()
+    if len(words) != 3 or not words[2].startswith("HTTP/"):
+        raise BadRequest(HTTPStatus.BAD_REQUEST, f"Bad request syntax ({requestline!r})")
+    raw = []
+    while True:
+        line = await reader.readline()
+        if len(line) > MAX_LINE:
+            raise BadRequest(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "Line too long")
+        if line in (b"\r\n", b"\n", b""):
+            break
+        raw.append(line)
+        if len(raw) > MAX_HEADERS:
+            raise BadRequest(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "Too many headers")
+    headers = email.parser.BytesParser(_class=http.client.HTTPMessage).parsebytes(b"".join(raw))
+    length = str(headers.get("Content-Length") or "0").strip()
+    if not (length.isascii() and length.isdigit()):
+        raise BadRequest(HTTPStatus.BAD_REQUEST, f"Bad Content-Length ({length!r})")
+    if int(length) > MAX_BODY:
+        raise BadRequest(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Request body too large")
+    return words[0], words[1], words[2], headers
+
+
+def wants_keepalive(version: str, headers) -> bool:
+    """HTTP/1.1 defaults to persistent; HTTP/1.0 must ask for it."""
+    connection = (headers.get("Connection") or "").lower()
+    if version == "HTTP/1.1":
+        return connection != "close"
+    return connection == "keep-alive"
+
+
+async def write_response(writer: asyncio.StreamWriter, response: Response,
+                         send_body: bool, keepalive: bool, paced=None) -> int:
+    """Serialize ``response`` onto ``writer`` and return the body bytes sent.
+
+    ``paced`` (from :meth:`ThrottledLink.pace`) replaces the direct body
+    write with delayed chunks.
+    """
+    reason = BaseHTTPRequestHandler.responses.get(response.status, ("",))[0]
+    head = [f"HTTP/1.1 {int(response.status)} {reason}",
+            f"Server: {SupportRewriteHandler.server_version} {SupportRewriteHandler.sys_version}",
+            f"Date: {email.utils.formatdate(usegmt=True)}"]
+    head += [f"{name}: {value}" for name, value in response.headers
+             if name.lower() != "connection"]
+    head.append("Connection: " + ("keep-alive" if keepalive else "close"))
+    writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1", "strict"))
+    if not send_body:
+        await writer.drain()
+        return 0
+    if paced is not None:
+        await writer.drain()
+        for chunk, delay in paced:
+            if delay:
+                await asyncio.sleep(delay)
+            writer.write(chunk)
+            await writer.drain()
+        return response.content_length
+    if response.body:
+        writer.write(response.body)
+    await writer.drain()
+    if response.file:
+        # loop.sendfile is os.sendfile driven by the event loop: no userspace
+        # copy, and a slow reader only parks this coroutine, not a thread.
+        loop = asyncio.get_running_loop()
+        with open(response.file, "rb") as f:
+            for prefix, offset, length in response.spans():
+                if prefix:
+                    writer.write(prefix)
+                    await writer.drain()
+                if length:
+                    await loop.sendfile(writer.transport, f, offset, length)
+        if response.trailer:
+            writer.write(response.trailer)
+            await writer.drain()
+    return response.content_length
+
+
+async def write_early_hints(writer: asyncio.StreamWriter, link: str) -> None:
+    """Send ``103 Early Hints`` carrying the page's preload ``Link`` value."""
+    writer.write(f"HTTP/1.1 103 Early Hints\r\nLink: {link}\r\n\r\n".encode("latin-1"))
+    await writer.drain()
+
+
+async def stream_events(writer: asyncio.StreamWriter, hub: ReloadHub) -> None:
+    """Relay ``hub`` batches to one ``/__events`` client until it disconnects."""
+    events = hub.subscribe_async()
+    try:
+        writer.write(b": connected\n\n")
+        await writer.drain()
+        while True:
+            try:
+                message = await asyncio.wait_for(events.get(), SSE_HEARTBEAT)
+            except asyncio.TimeoutError:
+                message = b": ping\n\n"
+            writer.write(message)
+            await writer.drain()
+    finally:
+        hub.unsubscribe(events)
+
+
+async def serve_connection(reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                           site: Site) -> None:
+    """Answer requests on one connection until the client or timeout closes it."""
+    peer = writer.get_extra_info("peername") or ("-",)
+    link = ThrottledLink(site.throttle) if site.throttle else None
+    try:
+        while True:
+            try:
+                request = await asyncio.wait_for(read_request(reader), KEEPALIVE_TIMEOUT)
+            except BadRequest as exc:
+                log_access(peer[0], "-", exc.status, "-")
+                await write_response(writer, error_response(exc.status, exc.message), True, False)
+                break
+            if request is None:
+                break
+            method, target, version, headers = request
+            length = int(headers.get("Content-Length") or 0)
+            if length:
+                await reader.readexactly(length)
+            keepalive = wants_keepalive(version, headers)
+            started = site.metrics.begin()
+            status, sent = HTTPStatus.INTERNAL_SERVER_ERROR, 0
+            try:
+                if site.early_hints and method == "GET" and version == "HTTP/1.1":
+                    # Before respond(): the point is to let the browser start on
+                    # the preloads while the page itself is still being built.
+                    preload = await asyncio.to_thread(site.early_link, target, headers)
+                    if preload:
+                        await write_early_hints(writer, preload)
+                if method in ("GET", "HEAD"):
+                    # Hashing, gzip and image resizing block; keep them off the loop
+                    # so one cold asset does not stall every other connection.
+                    response = await asyncio.to_thread(site.respond, target, headers)
+                else:
+                    response = error_response(HTTPStatus.NOT_IMPLEMENTED,
+                                              f"Unsupported method ({method!r})")
+                status = response.status
+                if response.status >= 400 and ("Connection", "close") in response.headers:
+                    keepalive = False
+                profile = link.profile_for(target) if link else None
+                paced = None
+                if profile:
+                    await asyncio.sleep(profile.latency)
+                    paced = link.pace(profile, response)
+                if response.events is not None:
+                    keepalive = False
+                    await write_response(writer, response, False, False)
+                    if method != "HEAD":
+                        await stream_events(writer, response.events)
+                    break
+                sent = await write_response(writer, response, method != "HEAD", keepalive,
+                                            paced)
+            finally:
+                site.metrics.finish(target, status, sent, started)
+                if site.trace is not None:
+                    site.trace.record(peer[0], method, target, status, sent, started,
+                                      headers.get("Referer"))
+            log_access(peer[0], f"{method} {target} {version}", response.status, sent or "-")
+            if not keepalive:
+                break
+    except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
+
+
+async def serve_asyncio(host: str, port: int, site: Site, reuse_port: bool = False) -> None:
+    """Run the asyncio engine until cancelled."""
+    server = await asyncio.start_server(
+        lambda r, w: serve_connection(r, w, site), host, port, limit=MAX_LINE + 1,
+        reuse_port=reuse_port or None)
+    async with server:
+        await server.serve_forever()
+
+
+# ---------------------------------------------------------------------------
+# Entry point
+# ---------------------------------------------------------------------------
+
+
+def parse_port(value: str | None) -> int:
+    """Return ``value`` as a port, or :data:`DEFAULT_PORT` when absent/invalid."""
+    if value is None:
         return DEFAULT_PORT
     try:
-        return int(argv[1])
+        return int(value)
     except ValueError:
-        print(f"Invalid port '{argv[1]}', falling back to {DEFAULT_PORT}.")
+        print(f"Invalid port '{value}', falling back to {DEFAULT_PORT}.")
         return DEFAULT_PORT
 
 
-def main(argv: list[str]) -> None:
-    """Start the development server bound to :data:`BIND_HOST`."""
-    port = parse_port(argv)
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    """Parse ``argv`` (including the program name) into server options."""
+    parser = argparse.ArgumentParser(
+        prog=os.path.basename(argv[0]) if argv else "dev-server.py",
+        description="Local development server for the SPEED AD static mock.")
+    parser.add_argument("port", nargs="?", help=f"listen port (default {DEFAULT_PORT})")
+    parser.add_argument("--engine", choices=ENGINES, default="threading",
+                        help="threading: stdlib ThreadingHTTPServer (default); "
+                             "asyncio: single event loop with HTTP/1.1 keep-alive")
+    parser.add_argument("--cache-mb", type=float, default=DEFAULT_CACHE_BYTES / 2**20,
+                        help="in-memory file cache size in MiB; 0 disables it "
+                             f"(default {DEFAULT_CACHE_BYTES // 2**20})")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR,
+                        help="where compressed artifacts are kept between runs "
+                             f"(default ./{DEFAULT_CACHE_DIR})")
+    parser.add_argument("--no-gzip", action="store_true",
+                        help="never answer with Content-Encoding: gzip")
+    parser.add_argument("--image-cache-mb", type=float,
+                        default=DEFAULT_IMAGE_CACHE_BYTES / 2**20,
+                        help="disk budget for resized images in MiB; 0 disables "
+                             f"?w=/?h=/?fmt= (default {DEFAULT_IMAGE_CACHE_BYTES // 2**20})")
+    parser.add_argument("--no-preload", action="store_true",
+                        help="do not add Link: rel=preload headers to HTML pages")
+    parser.add_argument("--early-hints", action="store_true",
+                        help="also send the preload links as 103 Early Hints "
+                             "(asyncio engine only)")
+    parser.add_argument("--profile", choices=PROFILES,
+                        help="emulate a slow network on every path")
+    parser.add_argument("--throttle", action="append", default=[], metavar="PREFIX=PROFILE",
+                        type=parse_throttle_rule,
+                        help="emulate PROFILE only under PREFIX, e.g. /data/=3g "
+                             "(repeatable; first match wins over --profile)")
+    parser.add_argument("--pool", type=int, default=0, metavar="N",
+                        help="threading engine: serve with N pooled threads instead of "
+                             "one thread per connection")
+    parser.add_argument("--max-connections", type=int, default=0, metavar="M",
+                        help=f"with --pool, admit at most M connections (queued + active; "
+                             f"default {POOL_BACKLOG_FACTOR}N) and answer 503 beyond that")
+    parser.add_argument("--no-watch", action="store_true",
+                        help="do not watch files for changes (no /__events, no live reload)")
+    parser.add_argument("--live-reload", action="store_true",
+                        help="inject /__livereload.js into every HTML page")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="append every request to FILE for scripts/dev-server-trace.py")
+    parser.add_argument("--workers", type=int, default=1, metavar="N",
+                        help="pre-fork N processes sharing the port via SO_REUSEPORT")
+    args = parser.parse_args(argv[1:])
+    args.port = parse_port(args.port)
+    return args
+
+
+def print_banner(port: int, engine: str, throttle: Throttle | None = None) -> None:
+    print(f"Dev server listening on http://{BIND_HOST}:{port}/ ({engine})")
+    print("Rewriting prefixes -> /05_support/: " + ", ".join(REWRITE_PREFIXES))
+    if throttle:
+        print("Throttling: " + throttle.describe())
+    if Image is None:
+        print("Image resizing (?w=/?h=/?fmt=) is off: install Pillow to enable it.")
+    print("LOCAL DEVELOPMENT ONLY. Do not use in production.")
+    print("Cache statistics: /__cache   Request metrics: /__metrics (?format=prometheus)")
+
+
+def print_cache_stats(site: Site) -> None:
+    if site.cache is not None:
+        stats = site.cache.stats()
+        print("File cache: {hits} hits / {misses} misses / {stale} stale / "
+              "{evictions} evictions, {entries} entries, {bytes} bytes".format(**stats))
+
+
+def build_site(args: argparse.Namespace) -> Site:
+    cache_bytes = int(args.cache_mb * 2**20)
+    image_bytes = int(args.image_cache_mb * 2**20)
+    images = None
+    if Image is not None and image_bytes > 0:
+        images = ImageStore(os.path.abspath(args.cache_dir), image_bytes)
+    site = Site(os.getcwd(), FileCache(cache_bytes) if cache_bytes > 0 else None,
+                None if args.no_gzip else GzipStore(os.path.abspath(args.cache_dir)),
+                build_throttle(args), preload=not args.no_preload,
+                early_hints=args.early_hints and not args.no_preload, images=images)
+    if args.trace:
+        site.trace = TraceWriter(os.path.abspath(args.trace))
+    if not args.no_watch:
+        ignore = {os.path.abspath(args.cache_dir)}
+        if args.trace:
+            ignore.add(os.path.abspath(args.trace))
+        watcher = start_watcher(site, ignore)
+        site.live_reload = args.live_reload
+        if args.live_reload and watcher.kind == "scan":
+            print(f"Live reload polls every {WATCH_SCAN_INTERVAL:g}s (inotify unavailable).")
+    return site
+
+
+def serve(args: argparse.Namespace, reuse_port: bool = False, banner: bool = True) -> None:
+    """Run the selected engine in this process until interrupted."""
+    port = args.port
+    site = build_site(args)
+    if args.early_hints and args.engine != "asyncio" and banner:
+        # 1xx responses need HTTP/1.1; ThreadingHTTPServer answers as HTTP/1.0.
+        print("--early-hints is ignored by the threading engine (HTTP/1.0).")
+    if args.pool and args.engine != "threading" and banner:
+        print("--pool only applies to the threading engine; asyncio needs no threads.")
+    if args.engine == "asyncio":
+        if banner:
+            print_banner(port, args.engine, site.throttle)
+        try:
+            asyncio.run(serve_asyncio(BIND_HOST, port, site, reuse_port))
+        except KeyboardInterrupt:
+            if banner:
+                print("\nShutting down dev server.")
+            print_cache_stats(site)
+        return
     # Threading matters for the Playwright suite: parallel workers each request
     # several files per page, and a single-threaded server serialises them until
     # the tests time out waiting for the shared header/sidebar fragments.
-    server = ThreadingHTTPServer((BIND_HOST, port), SupportRewriteHandler)
-    print(f"Dev server listening on http://{BIND_HOST}:{port}/")
-    print("Rewriting prefixes -> /05_support/: " + ", ".join(REWRITE_PREFIXES))
-    print("LOCAL DEVELOPMENT ONLY. Do not use in production.")
+    server = DevServer((BIND_HOST, port), SupportRewriteHandler, site, reuse_port,
+                       args.pool, args.max_connections)
+    if banner:
+        engine = f"{args.engine}, {args.pool}-thread pool" if args.pool else args.engine
+        print_banner(port, engine, site.throttle)
     try:
         server.serve_forever()
     except KeyboardInterrupt:
-        print("\nShutting down dev server.")
+        if banner:
+            print("\nShutting down dev server.")
+        print_cache_stats(site)
         server.server_close()
 
 
+# ---------------------------------------------------------------------------
+# Pre-fork workers
+# ---------------------------------------------------------------------------
+
+
+class QueueLogWriter(io.TextIOBase):
+    """Text stream that forwards whole lines, tagged with ``prefix``, to a queue."""
+
+    def __init__(self, log_queue, prefix: str):
+        self.queue = log_queue
+        self.prefix = prefix
+        self._pending = ""
+        self._lock = threading.Lock()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        with self._lock:
+            self._pending += text
+            *lines, self._pending = self._pending.split("\n")
+        for line in lines:
+            self.queue.put(f"{self.prefix}{line}\n")
+        return len(text)
+
+    def flush(self) -> None:
+        with self._lock:
+            pending, self._pending = self._pending, ""
+        if pending:
+            self.queue.put(f"{self.prefix}{pending}\n")
+
+
+def stop_worker(signum, frame) -> None:
+    """SIGTERM from the parent: leave ``serve_forever`` once, then ignore repeats."""
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    raise KeyboardInterrupt
+
+
+def run_worker(number: int, args: argparse.Namespace, log_queue) -> None:
+    """Entry point of one pre-forked worker process."""
+    # Ctrl+C reaches the whole process group; only the parent reacts to it and
+    # then stops each worker with SIGTERM, so shutdown happens exactly once.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, stop_worker)
+    sys.stdout = sys.stderr = QueueLogWriter(log_queue, f"[w{number}] ")
+    try:
+        serve(args, reuse_port=True, banner=False)
+    finally:
+        sys.stdout.flush()
+
+
+def serve_workers(args: argparse.Namespace) -> int:
+    """Run ``args.workers`` processes on one port and merge their logs.
+
+    Each worker binds its own socket with ``SO_REUSEPORT``, so the kernel
+    spreads incoming connections across processes and response assembly
+    is no longer confined to one GIL. Caches and ``/__metrics`` are per
+    worker. Returns the exit status for the parent process.
+    """
+    if not hasattr(socket, "SO_REUSEPORT"):
+        print("--workers needs SO_REUSEPORT, which this platform does not provide.")
+        return 2
+    ctx = multiprocessing.get_context(
+        "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn")
+    log_queue = ctx.Queue()
+    workers = [ctx.Process(target=run_worker, args=(n, args, log_queue),
+                           name=f"dev-server-w{n}", daemon=True)
+               for n in range(1, args.workers + 1)]
+    signal.signal(signal.SIGTERM, stop_worker)
+    for worker in workers:
+        worker.start()
+    print_banner(args.port, f"{args.engine}, {args.workers} workers", build_throttle(args))
+    status = 0
+    try:
+        while True:
+            try:
+                sys.stderr.write(log_queue.get(timeout=0.5))
+            except queue.Empty:
+                pass
+            dead = [w for w in workers if not w.is_alive()]
+            if dead:
+                print(f"Worker {dead[0].name} exited with {dead[0].exitcode}; stopping.")
+                status = 1
+                break
+    except KeyboardInterrupt:
+        print("\nShutting down dev server.")
+    for worker in workers:
+        if worker.is_alive():
+            worker.terminate()
+    deadline = time.monotonic() + WORKER_STOP_TIMEOUT
+    for worker in workers:
+        worker.join(max(0.0, deadline - time.monotonic()))
+        if worker.is_alive():
+            worker.kill()
+            worker.join()
+    while True:
+        try:
+            sys.stderr.write(log_queue.get_nowait())
+        except queue.Empty:
+            break
+    return status
+
+
+def main(argv: list[str]) -> None:
+    """Start the development server bound to :data:`BIND_HOST`."""
+    args = parse_args(argv)
+    if args.workers > 1:
+        sys.exit(serve_workers(args))
+    serve(args)
+
+
 if __name__ == "__main__":
     main(sys.argv)
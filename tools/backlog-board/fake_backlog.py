@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+"""
+Backlog API の偽サーバ（オフライン計測・動作確認用）。本物のキーもネットも不要。
+
+  python fake_backlog.py serve [--port=8901] [--issues=300] [--latency=0.05] [--limit=600] [--fail=0]
+  python fake_backlog.py bench [--issues=300] [--latency=0.05] [--limit=600] [--fail=0] [--jobs=1,8] [--touch=10]
+  python fake_backlog.py render [--sizes=5000,50000]
+
+serve: generate.py が使う3つだけを返す（決定的な合成データ。--seed で変わる）
+  GET /api/v2/issues/count            {"count": N}（updatedSince=yyyy-MM-dd で絞り込み可）
+  GET /api/v2/issues?offset=&count=   作成日昇順（同上）
+  GET /api/v2/issues/<KEY>/comments   新しい順
+  各応答に --latency 秒の遅延と X-RateLimit-Limit/Remaining/Reset（1分窓、--limit 回/分）を付け、超過は 429。
+  --fail=0.05 なら 5% の確率で 503（Retry-After: 1）を返す（再試行の確認用）。
+bench: 偽サーバを立てて generate.py --refresh を --jobs ごとに実行し、所要時間とキャッシュの中身が一致するかを出す。
+  続けて --touch 件の課題を更新（ステータス変更・コメント追加）＋1件起票し、差分取得の結果が
+  --full の全件取り直しと一致するか、リクエスト数がどれだけ減るかを出す（--touch=0 で省略）。
+  出力は一時ディレクトリ（本物の cache.db / 公開HTML は触らない）。
+render: 合成データ（件数は --sizes）を直接 cache.db に入れて generate.py（取得なし）を走らせ、
+  HTML生成の所要時間・ピークメモリ(RSS)・出力サイズを件数ごとに出す。1件あたりが件数によらずほぼ一定なら良い。
+"""
+import sys, os, json, random, re, shutil, subprocess, tempfile, threading, time, datetime, hashlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+from issue_store import IssueStore
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PROJECT = "SPDAD2026"
+STATUSES = ["未対応", "仕様確認中", "処理中", "処理済み", "DEV：反映済／REP確認中",
+            "STG：AB確認済／本番反映待ち", "完了", "完了", "完了"]
+TYPES = ["新機能開発", "仕様メモ", "仕様整理", "運用バグ修正", "既存品質改善"]
+CATS = ["Dashboard", "回答画面", "管理画面", "LP", "決済"]
+USERS = ["田中", "佐藤", "鈴木", "高橋"]
+WORDS = ["一覧", "保存", "表示", "ボタン", "モーダル", "検索", "CSV", "stg", "本番環境", "dev環境",
+         "名刺", "QR", "通知", "ログイン", "集計", "グラフ", "エラー", "遅い", "文言", "レイアウト"]
+
+def opt(argv, name, default):
+    for a in argv:
+        if a.startswith(name + "="):
+            return a.split("=", 1)[1]
+    return default
+
+def stamp(t):
+    return t.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+class Data:
+    """合成の課題とコメント（新しい順）。同じ seed なら毎回同じ。touch() で「その後の更新」を起こす。"""
+    def __init__(self, n, seed):
+        self.rnd = random.Random(seed)
+        self.start = datetime.datetime(2026, 1, 5, 9, 0)
+        self.issues, self.comments = [], {}
+        self.lock = threading.Lock()
+        for i in range(1, n + 1):
+            self.add(i)
+    def words(self, m):
+        return "".join(self.rnd.choice(WORDS) for _ in range(m))
+    def add(self, i, created=None):
+        rnd = self.rnd
+        k = "%s-%d" % (PROJECT, i)
+        created = created or self.start + datetime.timedelta(hours=7 * i + rnd.randint(0, 6))
+        updated = max(created, min(created + datetime.timedelta(days=rnd.randint(0, 40)),
+                                   datetime.datetime(2026, 6, 1)))
+        desc = "## 概要\n%s\n\n## 現状\n%s\n\n## 期待\n%s\n" % (self.words(12), self.words(20), self.words(8))
+        self.issues.append({"id": i, "issueKey": k, "summary": "%sの%s" % (self.words(2), self.words(2)),
+                            "status": {"name": rnd.choice(STATUSES)},
+                            "issueType": {"name": rnd.choice(TYPES)},
+                            "category": [{"name": c} for c in rnd.sample(CATS, rnd.randint(0, 2))],
+                            "description": desc, "created": stamp(created), "updated": stamp(updated)})
+        cs = []
+        for j in range(rnd.randint(0, 5)):
+            cs.append({"id": i * 100 + j, "content": "" if rnd.random() < 0.2 else self.words(rnd.randint(3, 30)),
+                       "createdUser": {"name": rnd.choice(USERS)},
+                       "created": stamp(created + datetime.timedelta(hours=3 * (j + 1)))})
+        self.comments[k] = cs[::-1]
+    def touch(self, n):
+        """n件を今日付けで更新（ステータス変更＋コメント追加）し、1件新規起票する。"""
+        now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None, microsecond=0)
+        with self.lock:
+            step = max(1, len(self.issues) // max(n, 1))
+            for it in self.issues[::step][:n]:
+                it["status"] = {"name": self.rnd.choice(STATUSES)}
+                it["updated"] = stamp(now)
+                self.comments[it["issueKey"]].insert(0, {"id": 0, "content": "更新: " + self.words(6),
+                                                         "createdUser": {"name": "bench"}, "created": stamp(now)})
+            self.add(len(self.issues) + 1, now)
+    def select(self, since):
+        with self.lock:
+            return [it for it in self.issues if not since or it["updated"][:10] >= since]
+
+class Window:
+    """Backlog と同じ1分窓のレート制限を数える。"""
+    def __init__(self, limit):
+        self.limit = limit; self.lock = threading.Lock()
+        self.start = 0.0; self.used = 0; self.requests = 0; self.rejected = 0; self.failed = 0
+    def hit(self):
+        with self.lock:
+            now = time.time()
+            if now - self.start >= 60:
+                self.start = now; self.used = 0
+            self.requests += 1
+            ok = self.used < self.limit
+            if ok:
+                self.used += 1
+            else:
+                self.rejected += 1
+            return ok, self.limit - self.used, int(self.start + 60)
+
+def make_server(port, n, latency, limit, seed=1, fail=0.0):
+    data = Data(n, seed)
+    window = Window(limit)
+    chaos = random.Random(seed)
+    comment_path = re.compile(r"^/api/v2/issues/([^/]+)/comments$")
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        def log_message(self, *a):
+            pass
+        def send_json(self, code, body, remaining, reset, extra=()):
+            body = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("X-RateLimit-Limit", str(limit))
+            self.send_header("X-RateLimit-Remaining", str(max(remaining, 0)))
+            self.send_header("X-RateLimit-Reset", str(reset))
+            for h in extra:
+                self.send_header(*h)
+            self.end_headers()
+            self.wfile.write(body)
+        def do_GET(self):
+            u = urlsplit(self.path)
+            q = parse_qs(u.query)
+            ok, remaining, reset = window.hit()
+            if latency:
+                time.sleep(latency)
+            if not ok:
+                return self.send_json(429, {"errors": [{"message": "rate limit", "code": 0}]}, 0, reset)
+            if fail and chaos.random() < fail:
+                window.failed += 1
+                return self.send_json(503, {"errors": [{"message": "unavailable", "code": 0}]},
+                                      remaining, reset, [("Retry-After", "1")])
+            since = q.get("updatedSince", [""])[0]
+            if u.path == "/api/v2/issues/count":
+                return self.send_json(200, {"count": len(data.select(since))}, remaining, reset)
+            if u.path == "/api/v2/issues":
+                off = int(q.get("offset", ["0"])[0]); cnt = min(int(q.get("count", ["20"])[0]), 100)
+                return self.send_json(200, data.select(since)[off:off + cnt], remaining, reset)
+            m = comment_path.match(u.path)
+            if m and m.group(1) in data.comments:
+                cnt = min(int(q.get("count", ["20"])[0]), 100)
+                return self.send_json(200, data.comments[m.group(1)][:cnt], remaining, reset)
+            self.send_json(404, {"errors": [{"message": "No issue.", "code": 6}]}, remaining, reset)
+
+    srv = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    srv.daemon_threads = True
+    srv.window = window
+    srv.data = data
+    return srv
+
+def digest(path):
+    """キャッシュの中身（取得順の全項目）のハッシュ。sqlite ファイル自体のバイト列は比べない。"""
+    store = IssueStore(path)
+    h = hashlib.sha256(json.dumps(list(store.rows()), ensure_ascii=False).encode("utf-8")).hexdigest()[:12]
+    store.close()
+    return h
+
+def bench(argv):
+    n = int(opt(argv, "--issues", "300")); latency = float(opt(argv, "--latency", "0.05"))
+    limit = int(opt(argv, "--limit", "600")); fail = float(opt(argv, "--fail", "0")); touch = int(opt(argv, "--touch", "10"))
+    jobs = [int(j) for j in opt(argv, "--jobs", "1,8").split(",")]
+    srv = make_server(0, n, latency, limit, int(opt(argv, "--seed", "1")), fail)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    api = "http://127.0.0.1:%d/api/v2/" % srv.server_address[1]
+    tmp = tempfile.mkdtemp(prefix="backlog-bench-")
+
+    def run(label, cache, *extra):
+        before = srv.window.requests
+        t0 = time.time()
+        subprocess.run([sys.executable, os.path.join(HERE, "generate.py"), "fake-key", "--refresh",
+                        "--api=" + api, "--cache=" + cache,
+                        "--out=" + os.path.join(tmp, "out.html")] + list(extra),
+                       check=True, stdout=subprocess.DEVNULL)
+        print("%-12s %7.2fs  requests=%-5d cache=%s" % (label, time.time() - t0,
+                                                     srv.window.requests - before, digest(cache)))
+        return digest(cache)
+
+    print("issues=%d latency=%.3fs limit=%d/min api=%s" % (n, latency, limit, api))
+    digests = set()
+    for j in jobs:
+        digests.add(run("jobs=%d" % j, os.path.join(tmp, "cache_%d.db" % j), "--full", "--jobs=%d" % j))
+    ok = len(digests) == 1
+    print("キャッシュ一致: %s" % ("yes" if ok else "NO"))
+    if touch:
+        srv.data.touch(touch)
+        inc = os.path.join(tmp, "cache_inc.db")
+        shutil.copy(os.path.join(tmp, "cache_%d.db" % jobs[-1]), inc)
+        print("--- %d件更新 + 1件起票後" % touch)
+        a = run("incremental", inc, "--jobs=%d" % jobs[-1])
+        b = run("full", os.path.join(tmp, "cache_full.db"), "--full", "--jobs=%d" % jobs[-1])
+        print("差分マージ == 全件取得: %s" % ("yes" if a == b else "NO"))
+        ok = ok and a == b
+    print("429: %d  503: %d" % (srv.window.rejected, srv.window.failed))
+    srv.shutdown()
+    shutil.rmtree(tmp, ignore_errors=True)
+    return 0 if ok else 1
+
+def cache_rows(data):
+    """Data を generate.py が cache.db に入れる形（コメントは空でない最新2件・600字）に変換する。"""
+    for it in data.issues:
+        cm = [{"n": c["createdUser"]["name"], "d": c["created"][:10], "t": c["content"][:600]}
+              for c in data.comments[it["issueKey"]] if c["content"].strip()][:2]
+        yield {"key": it["issueKey"], "summary": it["summary"], "status": it["status"]["name"],
+               "type": it["issueType"]["name"], "cats": [c["name"] for c in it["category"]],
+               "created": it["created"][:10], "updated": it["updated"][:10],
+               "description": it["description"], "comments": cm}
+
+def render_bench(argv):
+    sizes = [int(n) for n in opt(argv, "--sizes", "5000,50000").split(",")]
+    tmp = tempfile.mkdtemp(prefix="backlog-render-")
+    print("%8s %8s %10s %10s %10s %12s" % ("issues", "秒", "RSS MB", "HTML KB", "side KB", "µs/件"))
+    for n in sizes:
+        db = os.path.join(tmp, "cache_%d.db" % n)
+        store = IssueStore(db)
+        store.replace(cache_rows(Data(n, 1)))
+        store.close()
+        out = os.path.join(tmp, "out_%d.html" % n)
+        t0 = time.time()
+        proc = subprocess.Popen([sys.executable, os.path.join(HERE, "generate.py"), "--cache=" + db, "--out=" + out],
+                                stdout=subprocess.DEVNULL)
+        _, status, usage = os.wait4(proc.pid, 0)
+        sec = time.time() - t0
+        if status:
+            print("generate.py failed for %d issues" % n)
+            return 1
+        rss = usage.ru_maxrss / 1024.0  # Linux は KB 単位
+        side = os.path.splitext(out)[0] + "_modal"
+        side_kb = sum(os.path.getsize(os.path.join(side, f)) for f in os.listdir(side)) / 1024.0
+        print("%8d %8.2f %10.1f %10.1f %10.1f %12.1f" % (n, sec, rss, os.path.getsize(out) / 1024.0, side_kb, sec / n * 1e6))
+    shutil.rmtree(tmp, ignore_errors=True)
+    return 0
+
+if __name__ == "__main__":
+    argv = sys.argv[1:]
+    mode = argv[0] if argv else ""
+    if mode == "serve":
+        port = int(opt(argv, "--port", "8901"))
+        srv = make_server(port, int(opt(argv, "--issues", "300")), float(opt(argv, "--latency", "0.05")),
+                          int(opt(argv, "--limit", "600")), int(opt(argv, "--seed", "1")),
+                          float(opt(argv, "--fail", "0")))
+        print("fake backlog: http://127.0.0.1:%d/api/v2/  （generate.py --api= に渡す）" % port)
+        try:
+            srv.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    elif mode == "bench":
+        sys.exit(bench(argv))
+    elif mode == "render":
+        sys.exit(render_bench(argv))
+    else:
+        sys.exit(__doc__)
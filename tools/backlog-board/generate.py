@@ -3,43 +3,208 @@
 SPDAD2026 課題ボード ジェネレータ。
 使い方は同ディレクトリの README.md を参照（ルールブック）。
 
-  python generate.py <BACKLOG_API_KEY> --refresh   # Backlogから再取得してHTML生成（完了の再読込もこれ）
-  python generate.py                                # cache.json から即時再生成（オフライン・色/分類だけ直した時）
+  python generate.py <BACKLOG_API_KEY> --refresh   # Backlogから再取得してHTML生成（完了の再読込もこれ）。cache.db があれば差分のみ
+  python generate.py <BACKLOG_API_KEY> --refresh --full   # 差分でなく全件取り直し（削除された課題を落とす）
+  python generate.py                                # cache.db から即時再生成（オフライン・色/分類だけ直した時）
+
+取得オプション（--refresh 時。値は --name=値 でも --name 値 でもよい）:
+  --jobs=N     同時リクエスト数（既定 8）。ページ取得・コメント取得をスレッドプールで並列化
+  --api=URL    APIのベースURL（既定 https://repinc.backlog.com/api/v2/）。fake_backlog.py 相手の計測用
+  --cache=PATH / --out=PATH   cache.db / 出力HTML の置き場所を変える（計測で本物を上書きしないため）
+
+分類ルール:
+  --rules=PATH      rules.json 以外のルールファイルで分類する（試し用）
+  --explain KEY     その課題の分類過程（どのルールに当たったか）を表示して終了。HTMLは書かない
 
 出力: リポジトリ直下の backlog_unresolved_SPDAD2026_20260616.html（公開URLを固定するためファイル名は変えない）
+      と同名 _modal/ ディレクトリ（モーダルの本文・コメント。行クリック時に読む）
 """
-import sys, os, json, html, re, urllib.request, urllib.parse, time, datetime
+import sys, os, json, html, re, hashlib, unicodedata, tempfile, urllib.parse, http.client, random, time, datetime, threading
+from concurrent.futures import ThreadPoolExecutor
+from issue_store import IssueStore
+from rules import Rules
 
 HERE = os.path.dirname(os.path.abspath(__file__))
 REPO = os.path.dirname(os.path.dirname(HERE))
-CACHE = os.path.join(HERE, "cache.json")
+CACHE = os.path.join(HERE, "cache.db")
+LEGACY_CACHE = os.path.join(HERE, "cache.json")  # 旧形式。cache.db が無ければ初回に取り込む
 SUMS = os.path.join(HERE, "summaries.json")
+SUM_HASHES = os.path.join(HERE, "summary_hashes.json")  # 要約を作った時の内容ハッシュ（prep_summaries.py が書く）
+RULES = os.path.join(HERE, "rules.json")
 OUTFILE = os.path.join(REPO, "backlog_unresolved_SPDAD2026_20260616.html")  # 公開URL固定のため不変
 
 base = "https://repinc.backlog.com/api/v2/"
 BASE = "https://repinc.backlog.com/view/"
 pid = 162886  # SPDAD2026
 UPDATED = datetime.date.today().isoformat()
+PAGE = 100  # issues API の count 上限
 
 argv = sys.argv[1:]
 REFRESH = "--refresh" in argv
-key = next((a for a in argv if not a.startswith("-")), "")
+# 値を取るオプション。--name=値 でも --name 値 でもよい（後者の値はAPIキーと見なさない）
+VALUED = ("--jobs", "--api", "--cache", "--out", "--rules", "--explain")
+key = next((a for i, a in enumerate(argv) if not a.startswith("-") and not (i and argv[i - 1] in VALUED)), "")
+
+def opt(name, default):
+    for i, a in enumerate(argv):
+        if a.startswith(name + "="):
+            return a.split("=", 1)[1]
+        if a == name:
+            if i + 1 == len(argv) or argv[i + 1].startswith("-"):
+                sys.exit("ERROR: %s には値が必要です（%s=値 または %s 値）。" % (name, name, name))
+            return argv[i + 1]
+    return default
+
+JOBS = max(1, int(opt("--jobs", "8")))
+base = opt("--api", base)
+CACHE = opt("--cache", CACHE)
+OUTFILE = opt("--out", OUTFILE)
+RULES = opt("--rules", RULES)
+EXPLAIN = opt("--explain", "")
+
+class RateLimit:
+    """トークンバケット。Backlog の X-RateLimit-Limit/Remaining/Reset（1分窓・Resetはepoch秒）を見て速度を合わせる。
+    残数が尽きたら Reset まで全スレッドを止める（429 を浴び続けないため）。"""
+    def __init__(self, rate=10.0, burst=JOBS):
+        self.rate = rate; self.burst = burst; self.tokens = float(burst)
+        self.stamp = time.monotonic(); self.until = 0.0; self.lock = threading.Lock()
+    def acquire(self):
+        while True:
+            with self.lock:
+                wait = self.until - time.time()
+                if wait <= 0:
+                    now = time.monotonic()
+                    self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+                    self.stamp = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(min(wait, 5))
+    def observe(self, headers):
+        try:
+            limit = int(headers.get("X-RateLimit-Limit") or 0)
+            remaining = headers.get("X-RateLimit-Remaining")
+            remaining = None if remaining is None else int(remaining)
+            reset = float(headers.get("X-RateLimit-Reset") or 0)
+        except ValueError:
+            return
+        with self.lock:
+            if limit:
+                self.rate = limit / 60.0
+            if remaining is None or not reset:
+                return
+            left = reset - time.time()
+            if remaining <= 0:
+                self.until = max(self.until, reset)
+            elif left > 0:
+                # 窓の残り時間で残数を使い切るペースに落とす
+                self.rate = max(min(self.rate, remaining / left), 0.05)
+
+limiter = RateLimit()
+
+class ApiError(Exception):
+    def __init__(self, status, body):
+        Exception.__init__(self, "HTTP %d: %s" % (status, body[:200].decode("utf-8", "replace")))
+        self.status = status
+
+class Client:
+    """http.client の接続プール。ホストごとに keep-alive 接続を使い回すので TLS ハンドシェイクは同時接続数ぶんだけ。
+    失敗は指数バックオフ＋ジッタで再試行（Retry-After があればそれ、残数切れなら limiter の Reset 待ちを優先）。
+    429・5xx・通信エラーだけ再試行し、それ以外の 4xx（キー違い等）は即エラー。呼び出しごとの所要時間を stats に残す。"""
+    TRIES = 4
+    BACKOFF = 1.0      # 1回目の待ち（秒）。以降 2倍ずつ、上限 BACKOFF_MAX
+    BACKOFF_MAX = 30.0
+    def __init__(self, timeout=40):
+        self.timeout = timeout; self.idle = []; self.lock = threading.Lock()
+        self.opened = 0; self.stats = []  # (種別, 秒, status, 試行回数)
+    def connect(self, u):
+        with self.lock:
+            for i, (host, c) in enumerate(self.idle):
+                if host == u.netloc:
+                    del self.idle[i]
+                    return c, True
+            self.opened += 1
+        cls = http.client.HTTPSConnection if u.scheme == "https" else http.client.HTTPConnection
+        return cls(u.netloc, timeout=self.timeout), False
+    def release(self, u, c):
+        with self.lock:
+            self.idle.append((u.netloc, c))
+    def backoff(self, a, headers):
+        retry_after = (headers or {}).get("Retry-After")
+        if retry_after and retry_after.isdigit():
+            return float(retry_after)
+        remaining = (headers or {}).get("X-RateLimit-Remaining")
+        if remaining is not None and remaining.lstrip("-").isdigit() and int(remaining) <= 0 \
+                and headers.get("X-RateLimit-Reset"):
+            return 0.0  # 残数切れ。limiter が Reset まで止める
+        # Reset ヘッダは毎回付くので、残数がある 429 や Retry-After 無しの 5xx はここで待つ
+        return min(self.BACKOFF_MAX, self.BACKOFF * 2 ** a) * random.uniform(0.5, 1.0)
+    def get(self, url, kind):
+        u = urllib.parse.urlsplit(url)
+        target = u.path + "?" + u.query
+        t0 = time.time()
+        a = 0
+        while True:
+            limiter.acquire()
+            c, reused = self.connect(u)
+            headers = None
+            try:
+                c.request("GET", target, headers={"Accept": "application/json"})
+                res = c.getresponse()
+                body = res.read()
+                headers = res.headers
+                limiter.observe(headers)
+                if res.will_close:
+                    c.close()
+                else:
+                    self.release(u, c)
+                if res.status < 300:
+                    self.stats.append((kind, time.time() - t0, res.status, a + 1))
+                    return json.loads(body)
+                err = ApiError(res.status, body)
+                if res.status != 429 and res.status < 500:
+                    raise err
+            except (OSError, http.client.HTTPException) as e:
+                c.close()
+                if reused:
+                    continue  # 相手が切った keep-alive 接続。試行回数に数えず張り直す
+                err = e
+            a += 1
+            if a == self.TRIES:
+                self.stats.append((kind, time.time() - t0, getattr(err, "status", 0), a))
+                raise err
+            time.sleep(self.backoff(a - 1, headers))
+    def report(self):
+        if not self.stats:
+            return ""
+        lines = ["http: %d calls, %d connections, %d retries" % (
+            len(self.stats), self.opened, sum(s[3] - 1 for s in self.stats))]
+        kinds = {}
+        for kind, sec, status, tries in self.stats:
+            kinds.setdefault(kind, []).append(sec)
+        for kind, secs in sorted(kinds.items()):
+            secs.sort()
+            lines.append("  %-22s n=%-5d mean %6.0fms  p50 %6.0fms  p95 %6.0fms  max %6.0fms" % (
+                kind, len(secs), 1000 * sum(secs) / len(secs), 1000 * secs[len(secs) // 2],
+                1000 * secs[min(len(secs) - 1, len(secs) * 95 // 100)], 1000 * secs[-1]))
+        return "\n".join(lines)
+
+client = Client()
 
 def get(path, params):
     params = list(params) + [("apiKey", key)]
-    url = base + path + "?" + urllib.parse.urlencode(params)
-    for a in range(4):
-        try:
-            return json.load(urllib.request.urlopen(url, timeout=40))
-        except Exception:
-            if a == 3:
-                raise
-            time.sleep(1.5)
+    return client.get(base + path + "?" + urllib.parse.urlencode(params),
+                      re.sub(r"issues/[^/]+/comments", "issues/*/comments", path))
 
 def fetch_comments(k):
+    # 失敗は握りつぶさない（[] で上書きすると差分取得では次に課題が更新されるまで直らない）。
+    # 再試行しても駄目なら取得全体を止め、cache.db には何も書かない。一覧取得後に消された課題（404）だけはコメント無し扱い。
     try:
         cs = get("issues/%s/comments" % k, [("count", 20), ("order", "desc")])
-    except Exception:
+    except ApiError as e:
+        if e.status != 404:
+            raise
         return []
     out = []
     for c in cs:
@@ -52,39 +217,76 @@ def fetch_comments(k):
             break
     return out
 
+def fetch_issues(pool, filters=()):
+    # 件数を先に取り、全ページを並列取得。作成日昇順なので取得中に増えた分は末尾に付く → 最終ページが満杯なら続きを追う。
+    filters = [("projectId[]", pid)] + list(filters)
+    params = filters + [("count", PAGE), ("sort", "created"), ("order", "asc")]
+    total = get("issues/count", filters)["count"]
+    offsets = list(range(0, total, PAGE)) or [0]
+    chunks = list(pool.map(lambda o: get("issues", params + [("offset", o)]), offsets))
+    offset = offsets[-1]
+    while len(chunks[-1]) == PAGE:
+        offset += PAGE
+        chunks.append(get("issues", params + [("offset", offset)]))
+    seen = set()
+    out = []
+    for it in (it for ch in chunks for it in ch):
+        if it["issueKey"] not in seen:
+            seen.add(it["issueKey"])
+            out.append(it)
+    return out
+
 # ---- load from cache or fetch (全ステータス＝完了含む) ----
-if REFRESH or not os.path.exists(CACHE):
+# --refresh はキャッシュがあれば差分取得: cache.db の最新 updated 以降に更新された課題だけ取り直し、
+# そのコメントだけ再取得して課題キーで上書きマージする（コメント追加でも課題の updated は進む）。
+# updatedSince は日付単位なので同日分は毎回取り直しになるが、キーで上書きするので重複しない。
+# Backlog で削除された課題は差分では消えない → 定期的に --full で全件取り直す。
+FULL = "--full" in argv
+if not key and (REFRESH or not (os.path.exists(CACHE) or os.path.exists(LEGACY_CACHE))):
+    sys.exit("ERROR: 初回または --refresh 時は Backlog APIキーを引数で渡してください。")
+store = IssueStore(CACHE, LEGACY_CACHE)
+if REFRESH or not len(store):
     if not key:
         sys.exit("ERROR: 初回または --refresh 時は Backlog APIキーを引数で渡してください。")
-    params = [("projectId[]", pid), ("count", 100)]
-    allissues = []
-    offset = 0
-    while True:
-        chunk = get("issues", params + [("offset", offset)])
-        allissues += chunk
-        if len(chunk) < 100:
-            break
-        offset += 100
-    raw = []
-    for it in allissues:
-        k = it["issueKey"]
-        raw.append({"key": k, "summary": it["summary"], "status": it["status"]["name"],
-                    "type": (it.get("issueType") or {}).get("name", ""),
-                    "cats": [c["name"] for c in it.get("category", [])],
-                    "created": (it.get("created") or "")[:10],
-                    "updated": (it.get("updated") or "")[:10],
-                    "description": it.get("description") or "",
-                    "comments": fetch_comments(k)})
-    json.dump(raw, open(CACHE, "w", encoding="utf-8"), ensure_ascii=False)
-    print("fetched & cached:", len(raw))
+    since = "" if FULL else store.since()
+    t0 = time.time()
+    try:
+        with ThreadPoolExecutor(JOBS) as pool:
+            allissues = fetch_issues(pool, [("updatedSince", since)] if since else [])
+            # map は入力順で返すので並列でも cache.db の並びは毎回同じ
+            comments = list(pool.map(fetch_comments, [it["issueKey"] for it in allissues]))
+    except (ApiError, OSError, http.client.HTTPException) as e:
+        print(client.report())
+        sys.exit("ERROR: Backlog取得に失敗: %s（cache.db は変更していません。時間をおいて再実行してください）" % e)
+    fresh = []
+    for it, cm in zip(allissues, comments):
+        fresh.append({"key": it["issueKey"], "summary": it["summary"], "status": it["status"]["name"],
+                      "type": (it.get("issueType") or {}).get("name", ""),
+                      "cats": [c["name"] for c in it.get("category", [])],
+                      "created": (it.get("created") or "")[:10],
+                      "updated": (it.get("updated") or "")[:10],
+                      "description": it.get("description") or "",
+                      "comments": cm})
+    if since:
+        # 既存は元の位置で差し替え、新規は末尾へ（作成日昇順なので全件取得と同じ並びになる）
+        store.upsert(fresh)
+        print("fetched & merged: %d changed since %s / %d total (%.1fs, jobs=%d)"
+              % (len(fresh), since, len(store), time.time() - t0, JOBS))
+    else:
+        store.replace(fresh)
+        print("fetched & cached: %d (%.1fs, jobs=%d)" % (len(fresh), time.time() - t0, JOBS))
+    print(client.report())
 else:
-    raw = json.load(open(CACHE, encoding="utf-8"))
-    print("loaded from cache:", len(raw))
+    print("loaded from cache:", len(store))
 
 # ---- abstract extraction（要約フォールバック用。正規の要約は summaries.json）----
 PRIO = ["概要", "発生", "現状", "目的", "対応", "依頼", "確認", "期待", "実際", "影響", "再現", "完了", "スコープ", "背景", "内容"]
 hdr = re.compile(r'^\s*(?:#{1,4}\s+|h[1-4]\.\s*|■\s*)(.+?)\s*$')
 
+# extract() の結果は cache.db にメモし、本文＋コメントの内容ハッシュが変わった課題だけ作り直す。
+# extract() の中身を変えたら ABSTRACT_VER を上げる（メモが全部作り直しになる）。
+ABSTRACT_VER = 1
+
 def extract(desc):
     if not desc:
         return ""
@@ -123,22 +325,8 @@ def extract(desc):
         return flat[:320]
     return "\n".join(out)
 
-issues = []
-for r in raw:
-    desc = r["description"]
-    issues.append({"key": r["key"], "summary": r["summary"], "status": r["status"],
-                   "type": r["type"], "cats": r["cats"], "created": r["created"], "updated": r["updated"],
-                   "abstract": extract(desc), "body": desc[:2000], "body_trunc": len(desc) > 2000,
-                   "comments": r["comments"]})
-
-feature_types = {"新機能開発", "仕様メモ", "仕様整理"}
-mikaitou = {"未対応", "仕様確認中"}
-status_order = ["未対応", "仕様確認中", "処理中", "処理済み",
-    "DEV：反映済／REP確認中", "DEV：REP確認済／AB確認待ち", "DEV：AB確認済／STG反映待ち",
-    "STG：REP確認済／AB確認待ち", "STG：AB確認済／本番反映待ち", "完了"]
-
-def sidx(s):
-    return status_order.index(s) if s in status_order else 99
+# 分類・一覧は本文抜きの meta だけで組む。本文/コメントはモーダルデータを作る時に1件ずつ読む。
+issues = store.meta()
 
 def keynum(k):
     try:
@@ -146,62 +334,35 @@ def keynum(k):
     except Exception:
         return 0
 
-# 中身確認で「実態はバグ/不具合」と判定した課題（種別は仕様メモ/仕様整理だが不具合系へ補正）。
-# 追加・削除は README の手順どおりキーを足し引きする。
-BUG_OVERRIDE = {
-    "SPDAD2026-115", "SPDAD2026-116", "SPDAD2026-117", "SPDAD2026-118", "SPDAD2026-120",
-    "SPDAD2026-121", "SPDAD2026-122", "SPDAD2026-123", "SPDAD2026-124", "SPDAD2026-125",
-    "SPDAD2026-126", "SPDAD2026-127", "SPDAD2026-128", "SPDAD2026-129", "SPDAD2026-132",
-    "SPDAD2026-133", "SPDAD2026-151", "SPDAD2026-152", "SPDAD2026-153", "SPDAD2026-154",
-    "SPDAD2026-158",
-}
-# 環境を手動で確定したい課題（自動判定を上書き）。例: "SPDAD2026-99": "DEV"
-ENV_OVERRIDE = {}
-
-def detect_env(d):
-    if d["key"] in ENV_OVERRIDE:
-        return ENV_OVERRIDE[d["key"]]
-    s = d["summary"]; body = d.get("body", ""); st = d["status"]; slow = s.lower()
-    # 1. 件名の明示タグを最優先
-    if re.search(r'[\[【]\s*production\s*[\]】]', slow):
-        return "本番"
-    if re.search(r'[\[【]\s*stg\s*[\]】]', slow):
-        return "STG"
-    if re.search(r'[\[【]\s*dev', slow) or "dev不具合" in slow or "ＤＥＶ" in s:
-        return "DEV"
-    # 2. ステータスの接頭辞
-    if st.startswith("DEV"):
-        return "DEV"
-    if st.startswith("STG"):
-        return "STG"
-    # 3. 本文キーワード
-    text = s + " " + body; low = text.lower()
-    if "production" in low or "本番環境" in text:
-        return "本番"
-    if "stg" in low:
-        return "STG"
-    if "dev環境" in low or "【dev" in low:
-        return "DEV"
-    return "その他"
+# 分類ルール（種別・実態判定・ステータス順・環境判定）は rules.json。読み込み時に1回だけコンパイルする。
+rules = Rules(RULES)
+
+if EXPLAIN:
+    d = next((d for d in issues if d["key"] == EXPLAIN), None)
+    if d is None:
+        sys.exit("ERROR: %s はキャッシュにありません。" % EXPLAIN)
+    rules.classify(d, store.description)
+    print("\n".join(rules.explain(d, store.description)))
+    sys.exit(0)
 
 for d in issues:
-    if d["key"] in BUG_OVERRIDE:
-        d["cat"] = "不具合系"
-        d["override"] = True
-    elif d["type"] in feature_types:
-        d["cat"] = "新機能系"
-        d["override"] = False
+    rules.classify(d, store.description)
+    if d["done"]:
+        d["tid"] = "done-dfeat" if d["cat"] == "新機能系" else "done-dbug"
     else:
-        d["cat"] = "不具合系"
-        d["override"] = False
-    d["done"] = (d["status"] == "完了")
-    d["bucket"] = "未対応" if d["status"] in mikaitou else "対応中"
-    d["env"] = detect_env(d) if d["cat"] == "不具合系" else ""
-
-active = [d for d in issues if not d["done"]]
-done = [d for d in issues if d["done"]]
-feat = [d for d in active if d["cat"] == "新機能系"]
-bug = [d for d in active if d["cat"] == "不具合系"]
+        d["tid"] = ("feat-" if d["cat"] == "新機能系" else "bug-") + ("mk" if d["bucket"] == "未対応" else "tc")
+print(rules.report())
+
+# 表（タブ×サブタブ）ごとの行。並べ替えは全体で1回（ステータス順→キー番号の降順）、振り分けも1パス。
+TABLE_IDS = ["feat-mk", "feat-tc", "bug-mk", "bug-tc", "done-dfeat", "done-dbug"]
+TABLES = {tid: [] for tid in TABLE_IDS}
+for d in sorted(issues, key=lambda d: (rules.sidx(d["status"]), -keynum(d["key"]))):
+    TABLES[d["tid"]].append(d)
+N = {tid: len(v) for tid, v in TABLES.items()}
+n_feat = N["feat-mk"] + N["feat-tc"]
+n_bug = N["bug-mk"] + N["bug-tc"]
+n_done = N["done-dfeat"] + N["done-dbug"]
+n_active = n_feat + n_bug
 
 # ---------- rewritten summaries ----------
 sums = {}
@@ -210,14 +371,11 @@ if os.path.exists(SUMS):
 missing_sum = [d["key"] for d in issues if d["key"] not in sums]
 if missing_sum:
     print("WARN: 要約未生成 %d件（abstractで代替）: %s" % (len(missing_sum), ", ".join(missing_sum[:10]) + (" …" if len(missing_sum) > 10 else "")))
-
-# ---------- modal data ----------
-modal = {}
-for d in issues:
-    modal[d["key"]] = {"k": d["key"], "sm": d["summary"], "st": d["status"], "ty": d["type"],
-                        "c": d["created"], "u": d["updated"], "cat": d["cats"],
-                        "ab": sums.get(d["key"]) or d["abstract"], "bd": d["body"] + ("\n…（以下省略）" if d["body_trunc"] else ""),
-                        "cm": d["comments"], "url": BASE + d["key"]}
+# 要約を作った後で本文/コメントが変わった課題（要約はそのまま出す。prep_summaries.py split で作り直し対象になる）
+sum_hashes = json.load(open(SUM_HASHES, encoding="utf-8")) if os.path.exists(SUM_HASHES) else {}
+stale_sum = [d["key"] for d in issues if d["key"] in sums and sum_hashes.get(d["key"], d["hash"]) != d["hash"]]
+if stale_sum:
+    print("WARN: 要約が古い %d件（要約後に本文/コメント更新）: %s" % (len(stale_sum), ", ".join(stale_sum[:10]) + (" …" if len(stale_sum) > 10 else "")))
 
 unfiled = [
     {"id": "UNF-1", "label": "スピードレビューが無課金アカウントだと押下できない（プレミアム限定機能のチップ表示あり）", "place": "Dashboard", "cat": "不具合系",
@@ -229,91 +387,61 @@ unfiled = [
     {"id": "UNF-4", "label": "名刺データ保存が名刺データ「アップロード」表記になっている", "place": "回答画面", "cat": "不具合系",
      "note": "<b>コメント照合済</b>: 名刺撮影モーダルの保存/アップロード仕様は <a href='%sSPDAD2026-29' target='_blank'>-29</a> のコメントで議論あり（保存後ボタン非活性化など）。ただし『アップロード表記を保存に直す』という是正指摘は未記載。<a href='%sSPDAD2026-121' target='_blank'>-121</a> は保存失敗バグで別件。" % (BASE, BASE)},
 ]
-for u in unfiled:
-    modal[u["id"]] = {"unf": True, "sm": u["label"], "place": u["place"], "note": u["note"]}
+UNF = {u["id"]: {"unf": True, "sm": u["label"], "place": u["place"], "note": u["note"]} for u in unfiled}
 
 # ---------- HTML rendering ----------
 def esc(s):
     return html.escape(s, quote=True)
 
-def datatext(d):
-    return esc(" ".join([d["key"], d["summary"], d["status"], d["type"]] + d["cats"]).lower())
-
-def rows(items):
-    items = sorted(items, key=lambda d: (sidx(d["status"]), -keynum(d["key"])))
-    out = []
-    envcls = {"本番": " r-prod", "STG": " r-stg", "DEV": " r-dev", "その他": " r-other"}
-    envbadge = {"本番": '<span class="env env-prod">本番</span> ',
-                "STG": '<span class="env env-stg">STG</span> ',
-                "DEV": '<span class="env env-dev">DEV</span> ',
-                "その他": '<span class="env env-other">環境不明</span> '}
-    for d in items:
-        env = d.get("env", "")
-        rowcls = envcls.get(env, "")
-        prod = envbadge.get(env, "")
-        ovr = '<span class="ovr">実態判定</span>' if d.get("override") else ""
-        cats = " ".join('<span class="cat-tag">%s</span>' % esc(c) for c in d["cats"])
-        out.append(
-            '<tr class="issue%s" data-key="%s" data-created="%s" data-updated="%s" data-text="%s">'
-            '<td class="k"><span class="keylink">%s</span></td>'
-            '<td class="dt">%s</td><td class="dt">%s</td>'
-            '<td class="s"><span class="badge">%s</span></td>'
-            '<td class="t"><span class="ty">%s</span>%s</td>'
-            '<td class="sm">%s%s</td></tr>' % (
-                rowcls,
-                d["key"], d["created"], d["updated"], datatext(d),
-                d["key"], d["created"], d["updated"],
-                esc(d["status"]), esc(d["type"]), ovr,
-                prod, esc(d["summary"]) + ((" " + cats) if cats else "")))
-    return "\n".join(out)
-
-def table(items):
-    if not items:
-        return '<p class="none">該当なし</p>'
-    return ('<table><thead><tr><th>キー</th><th>登録日</th><th>更新日</th><th>ステータス</th><th>種別</th><th>件名</th></tr></thead><tbody>'
-            + rows(items) + '</tbody></table>')
-
-def subpanel(spkey, items, active_cls):
-    return '<div class="subpanel%s" data-subpanel="%s">%s</div>' % (active_cls, spkey, table(items))
-
-def panel_with_buckets(pkey, items, active_panel, color):
-    mk = [d for d in items if d["bucket"] == "未対応"]
-    tc = [d for d in items if d["bucket"] == "対応中"]
-    h = ['<div class="panel%s" data-panel="%s" style="border-top:3px solid %s">' % (" active" if active_panel else "", pkey, color)]
-    h.append('<div class="subbar">')
-    h.append('<button class="subtab active" data-sub="mk">未対応 <span class="cnt">%d</span></button>' % len(mk))
-    h.append('<button class="subtab" data-sub="tc">対応中 <span class="cnt">%d</span></button>' % len(tc))
-    h.append('</div>')
-    h.append(subpanel("mk", mk, " active"))
-    h.append(subpanel("tc", tc, ""))
-    h.append('</div>')
-    return "\n".join(h)
-
-def panel_done(items, color):
-    df_ = [d for d in items if d["cat"] == "新機能系"]
-    db = [d for d in items if d["cat"] == "不具合系"]
-    h = ['<div class="panel" data-panel="done" style="border-top:3px solid %s">' % color]
-    h.append('<div class="subbar">')
-    h.append('<button class="subtab active" data-sub="dfeat">新機能系 <span class="cnt">%d</span></button>' % len(df_))
-    h.append('<button class="subtab" data-sub="dbug">不具合系 <span class="cnt">%d</span></button>' % len(db))
-    h.append('</div>')
-    h.append(subpanel("dfeat", df_, " active"))
-    h.append(subpanel("dbug", db, ""))
-    h.append('</div>')
-    return "\n".join(h)
-
-def panel_unfiled(color):
-    h = ['<div class="panel" data-panel="unfiled" style="border-top:3px solid %s">' % color]
-    h.append('<p class="legend2">先のチェック依頼6項目のうち、既存課題に見当たらなかったもの（本文＋全コメント照合）。①規約リンクが古い・⑤プレミアム登録の利用規約がsupport配下でない、は起票済み（165/130/131）で「不具合系」タブに含まれる。<br>※未起票項目は日付を持たないため日付フィルタ対象外（キーワード検索は対象）。クリックで詳細表示。</p>')
-    h.append('<table><thead><tr><th>箇所</th><th>内容</th></tr></thead><tbody>')
+# 行はHTMLに書かず、表ごとの配列（ROWS）で埋め込んで JS が見えている範囲だけ描画する（仮想化）。
+# 1行 = [キー, 登録日, 更新日, ステータス, 種別, 件名, カテゴリ, 環境, 実態判定(0/1), 文書番号]
+# 文書番号 = issues 内の位置。検索索引（search.json）と日付索引（DATEIDX）はこの番号で引く。
+# 出力は w()（一時ファイルへの書き込み）に直接流し、文書全体の文字列は作らない。
+DOCID = {d["key"]: i for i, d in enumerate(issues)}
+
+def row(d):
+    return [d["key"], d["created"], d["updated"], d["status"], d["type"], d["summary"], d["cats"],
+            d["env"], 1 if d["override"] else 0, DOCID[d["key"]]]
+
+def table(w, tid):
+    if not N[tid]:
+        w('<p class="none">該当なし</p>')
+        return
+    w('<table data-rows="%s"><thead><tr><th>キー</th><th>登録日</th><th>更新日</th><th>ステータス</th><th>種別</th><th>件名</th></tr></thead></table>' % tid)
+
+def subpanel(w, tid, active_cls):
+    w('<div class="subpanel%s" data-subpanel="%s">' % (active_cls, tid.split("-")[1]))
+    table(w, tid)
+    w('</div>')
+
+def panel_with_buckets(w, pkey, active_panel, color):
+    w('<div class="panel%s" data-panel="%s" style="border-top:3px solid %s">' % (" active" if active_panel else "", pkey, color))
+    w('<div class="subbar">')
+    w('<button class="subtab active" data-sub="mk">未対応 <span class="cnt">%d</span></button>' % N[pkey + "-mk"])
+    w('<button class="subtab" data-sub="tc">対応中 <span class="cnt">%d</span></button>' % N[pkey + "-tc"])
+    w('</div>')
+    subpanel(w, pkey + "-mk", " active")
+    subpanel(w, pkey + "-tc", "")
+    w('</div>')
+
+def panel_done(w, color):
+    w('<div class="panel" data-panel="done" style="border-top:3px solid %s">' % color)
+    w('<div class="subbar">')
+    w('<button class="subtab active" data-sub="dfeat">新機能系 <span class="cnt">%d</span></button>' % N["done-dfeat"])
+    w('<button class="subtab" data-sub="dbug">不具合系 <span class="cnt">%d</span></button>' % N["done-dbug"])
+    w('</div>')
+    subpanel(w, "done-dfeat", " active")
+    subpanel(w, "done-dbug", "")
+    w('</div>')
+
+def panel_unfiled(w, color):
+    w('<div class="panel" data-panel="unfiled" style="border-top:3px solid %s">' % color)
+    w('<p class="legend2">先のチェック依頼6項目のうち、既存課題に見当たらなかったもの（本文＋全コメント照合）。①規約リンクが古い・⑤プレミアム登録の利用規約がsupport配下でない、は起票済み（165/130/131）で「不具合系」タブに含まれる。<br>※未起票項目は日付を持たないため日付フィルタ対象外（キーワード検索は対象）。クリックで詳細表示。</p>')
+    w('<table><thead><tr><th>箇所</th><th>内容</th></tr></thead><tbody>')
     for u in unfiled:
         dtext = esc((u["place"] + " " + u["label"]).lower())
-        h.append('<tr class="issue" data-key="%s" data-nodate="1" data-text="%s"><td class="s"><span class="badge place">%s</span></td><td class="sm"><b>%s</b></td></tr>' % (u["id"], dtext, esc(u["place"]), esc(u["label"])))
-    h.append('</tbody></table></div>')
-    return "\n".join(h)
-
-def cnt(items, b):
-    return len([d for d in items if d["bucket"] == b])
+        w('<tr class="issue" data-key="%s" data-nodate="1" data-text="%s"><td class="s"><span class="badge place">%s</span></td><td class="sm"><b>%s</b></td></tr>' % (u["id"], dtext, esc(u["place"]), esc(u["label"])))
+    w('</tbody></table></div>')
 
 cards = ('<div class="cards">'
     '<div class="card feat"><div class="n">%d</div><div class="l">新機能系</div><div class="sub">未対応 %d / 対応中 %d</div></div>'
@@ -321,9 +449,9 @@ cards = ('<div class="cards">'
     '<div class="card un"><div class="n">%d</div><div class="l">未起票</div><div class="sub">今回チェック分</div></div>'
     '<div class="card done"><div class="n">%d</div><div class="l">完了</div><div class="sub">クローズ済</div></div>'
     '<div class="card tot"><div class="n">%d</div><div class="l">全課題</div><div class="sub">完了含む</div></div>'
-    '</div>') % (len(feat), cnt(feat, "未対応"), cnt(feat, "対応中"),
-                 len(bug), cnt(bug, "未対応"), cnt(bug, "対応中"),
-                 len(unfiled), len(done), len(issues))
+    '</div>') % (n_feat, N["feat-mk"], N["feat-tc"],
+                 n_bug, N["bug-mk"], N["bug-tc"],
+                 len(unfiled), n_done, len(issues))
 
 toolbar = ('<div class="toolbar">'
     '<div class="tb-row"><input type="search" id="q" placeholder="🔍 キーワード検索（キー / 件名 / 種別 / ステータス / カテゴリ）"></div>'
@@ -333,19 +461,14 @@ toolbar = ('<div class="toolbar">'
     '<label>To <input type="date" id="to"></label>'
     '<button id="clear" type="button">クリア</button>'
     '<span class="viscount">表示中 <b id="viscount">%d</b> / %d 件（完了除く）</span>'
-    '</div></div>') % (len(active), len(active))
+    '</div></div>') % (n_active, n_active)
 
 tabbar = ('<div class="tabbar">'
     '<button class="tab active" data-tab="feat" style="--c:#2563eb">新機能系 <span class="cnt">%d</span></button>'
     '<button class="tab" data-tab="bug" style="--c:#dc2626">不具合系 <span class="cnt">%d</span></button>'
     '<button class="tab" data-tab="unfiled" style="--c:#7c3aed">未起票 <span class="cnt">%d</span></button>'
     '<button class="tab" data-tab="done" style="--c:#0f766e">完了 <span class="cnt">%d</span></button>'
-    '</div>') % (len(feat), len(bug), len(unfiled), len(done))
-
-panels = (panel_with_buckets("feat", feat, True, "#2563eb")
-          + panel_with_buckets("bug", bug, False, "#dc2626")
-          + panel_unfiled("#7c3aed")
-          + panel_done(done, "#0f766e"))
+    '</div>') % (n_feat, n_bug, len(unfiled), n_done)
 
 legend = ('<div class="legend">'
     '<b>仕分けルール</b><br>'
@@ -407,6 +530,7 @@ td{padding:8px 10px;border-bottom:1px solid #eef2f7;vertical-align:top}
 tr.issue{cursor:pointer}
 tr.issue:hover{background:#eff6ff}
 tr.fhide{display:none}
+tr.spacer td{padding:0;border:0}
 td.k{white-space:nowrap;font-weight:600}
 .keylink{color:#0e7490}
 tr.issue:hover .keylink{text-decoration:underline}
@@ -450,6 +574,7 @@ td.s{white-space:nowrap}
 .m-body{font-size:12.5px;white-space:pre-wrap;color:#334155;max-height:320px;overflow:auto;background:#fff;border:1px solid #eef2f7;border-radius:8px;padding:12px 14px;margin-top:6px}
 .m-cmt{font-size:12.5px;background:#fffbeb;border:1px solid #fde68a;border-radius:8px;padding:10px 12px;margin-top:8px;white-space:pre-wrap}
 .m-cmt .h{font-size:11px;color:#92400e;font-weight:700;margin-bottom:4px}
+.m-loading{color:#94a3b8;font-size:13px;padding:8px 0}
 .m-open{display:inline-block;margin-top:16px;background:#0e7490;color:#fff;text-decoration:none;padding:9px 18px;border-radius:8px;font-size:13px;font-weight:600}
 .m-open:hover{background:#0f766e}
 details{margin-top:6px}
@@ -461,12 +586,47 @@ JS = r'''
 const q=document.getElementById('q'),df=document.getElementById('datefield'),
 fromEl=document.getElementById('from'),toEl=document.getElementById('to'),
 viscount=document.getElementById('viscount');
+function el(t){const d=document.createElement('div');d.textContent=t;return d.innerHTML;}
+// ---- 仮想化テーブル: 行を BLOCK 件ずつの tbody に分け、画面近くに来た tbody だけ描画する ----
+const BLOCK=100,ROW_H=38;
+const ENVCLS={'本番':' r-prod','STG':' r-stg','DEV':' r-dev','その他':' r-other'};
+const ENVBADGE={'本番':'<span class="env env-prod">本番</span> ','STG':'<span class="env env-stg">STG</span> ',
+  'DEV':'<span class="env env-dev">DEV</span> ','その他':'<span class="env env-other">環境不明</span> '};
+function rowHTML(r){
+  const [k,c,u,st,ty,sm,cats,env,ovr]=r;
+  const ct=cats.map(x=>'<span class="cat-tag">'+el(x)+'</span>').join(' ');
+  return '<tr class="issue'+(ENVCLS[env]||'')+'" data-key="'+k+'">'
+    +'<td class="k"><span class="keylink">'+k+'</span></td>'
+    +'<td class="dt">'+c+'</td><td class="dt">'+u+'</td>'
+    +'<td class="s"><span class="badge">'+el(st)+'</span></td>'
+    +'<td class="t"><span class="ty">'+el(ty)+'</span>'+(ovr?'<span class="ovr">実態判定</span>':'')+'</td>'
+    +'<td class="sm">'+(ENVBADGE[env]||'')+el(sm)+(ct?' '+ct:'')+'</td></tr>';
+}
+function spacer(tb){tb.innerHTML='<tr class="spacer"><td colspan="6" style="height:'+tb._h+'px"></td></tr>';tb._live=false;}
+const io=new IntersectionObserver(es=>es.forEach(e=>{
+  const tb=e.target;
+  if(e.isIntersecting){if(!tb._live){tb.innerHTML=tb._rows.map(rowHTML).join('');tb._live=true;}}
+  else if(tb._live){if(tb.offsetHeight)tb._h=tb.offsetHeight;spacer(tb);}
+}),{rootMargin:'1500px 0px'});
+const tables=[...document.querySelectorAll('table[data-rows]')].map(t=>{
+  const rows=ROWS[t.dataset.rows];
+  return {el:t,rows:rows,vis:rows,blocks:[]};
+});
+function build(t){
+  t.blocks.forEach(tb=>{io.unobserve(tb);tb.remove();});
+  t.blocks=[];
+  for(let i=0;i<t.vis.length;i+=BLOCK){
+    const tb=document.createElement('tbody');
+    tb._rows=t.vis.slice(i,i+BLOCK);tb._h=tb._rows.length*ROW_H;spacer(tb);
+    t.el.appendChild(tb);t.blocks.push(tb);io.observe(tb);
+  }
+}
 function recount(){
   document.querySelectorAll('.panel').forEach(panel=>{
     let ptotal=0;const sps=panel.querySelectorAll('.subpanel');
     if(sps.length){
       sps.forEach(sp=>{
-        const v=sp.querySelectorAll('tr.issue:not(.fhide)').length;ptotal+=v;
+        const t=tables.find(x=>sp.contains(x.el)),v=t?t.vis.length:0;ptotal+=v;
         const b=panel.querySelector('.subtab[data-sub="'+sp.dataset.subpanel+'"] .cnt');
         if(b)b.textContent=v;
       });
@@ -477,22 +637,82 @@ function recount(){
     if(tb)tb.textContent=ptotal;
   });
 }
+// ---- 絞り込み: キーワードは bigram 転置索引（search.json）、日付は DATEIDX の二分探索。結果は文書番号のマスク ----
+const NDOC=DATEIDX.updated.length,DOC=[];
+tables.forEach(t=>t.rows.forEach(r=>{DOC[r[9]]=r;}));
+let SEARCH=null,searchP=null,searchFailed=false;
+const dec={r:{},s:{}},RT=[];
+function loadSearch(){
+  return searchP||(searchP=fetch(MODAL_DIR+'/search.json?v='+SEARCH_VER).then(r=>{
+    if(!r.ok)throw new Error(r.status);return r.json();
+  }).then(j=>{SEARCH=j;}).catch(()=>{searchFailed=true;}));
+}
+function plist(part,bg){
+  if(!(bg in dec[part])){let x=0;dec[part][bg]=(SEARCH[part][bg]||[]).map(d=>x+=d);}
+  return dec[part][bg];
+}
+function rowText(i){
+  const r=DOC[i];
+  return RT[i]||(RT[i]=[r[0],r[5],r[3],r[4]].concat(r[6]).join(' ').normalize('NFKC').toLowerCase());
+}
+function intersect(a,b){
+  const out=[];let i=0,j=0;
+  while(i<a.length&&j<b.length){if(a[i]<b[j])i++;else if(a[i]>b[j])j++;else{out.push(a[i]);i++;j++;}}
+  return out;
+}
+function candidates(part,tok){
+  const lists=[];
+  for(let i=0;i<tok.length-1;i++)lists.push(plist(part,tok.slice(i,i+2)));
+  lists.sort((a,b)=>a.length-b.length);
+  return lists.reduce(intersect);
+}
+function tokenDocs(tok){
+  const m=new Uint8Array(NDOC);
+  if(tok.length===1){
+    ['r','s'].forEach(part=>{for(const bg in SEARCH[part])if(bg.includes(tok))plist(part,bg).forEach(i=>{m[i]=1;});});
+    return m;
+  }
+  candidates('r',tok).forEach(i=>{if(rowText(i).includes(tok))m[i]=1;});
+  candidates('s',tok).forEach(i=>{m[i]=1;});
+  return m;
+}
+function lowerBound(ids,field,d){
+  let lo=0,hi=ids.length;
+  while(lo<hi){const mid=(lo+hi)>>1;if(DOC[ids[mid]][field]<d)lo=mid+1;else hi=mid;}
+  return lo;
+}
 function applyFilter(){
-  const term=q.value.trim().toLowerCase(),field=df.value,f=fromEl.value,t=toEl.value;
-  document.querySelectorAll('tr.issue').forEach(tr=>{
-    let ok=true;
-    if(term && !(tr.dataset.text||'').includes(term)) ok=false;
-    if(ok && (f||t) && tr.dataset.nodate!=='1'){
-      const d=field==='created'?tr.dataset.created:tr.dataset.updated;
-      if(!d) ok=false; else { if(f&&d<f)ok=false; if(t&&d>t)ok=false; }
+  const raw=q.value.trim().toLowerCase(),term=q.value.trim().normalize('NFKC').toLowerCase(),f=fromEl.value,t=toEl.value;
+  if(term&&!SEARCH&&!searchFailed){loadSearch().then(applyFilter);return;}
+  const mask=new Uint8Array(NDOC).fill(1);
+  if(term){
+    const toks=term.split(/\s+/);
+    if(SEARCH){
+      toks.forEach(tok=>{const m=tokenDocs(tok);for(let i=0;i<NDOC;i++)mask[i]&=m[i];});
+    } else {
+      // search.json が読めない時（file:// 直開き等）は一覧の文字列を総なめ（要約は対象外）
+      DOC.forEach((r,i)=>{if(!toks.every(x=>rowText(i).includes(x)))mask[i]=0;});
     }
-    tr.classList.toggle('fhide',!ok);
+  }
+  if(f||t){
+    const field=df.value==='created'?1:2,ids=DATEIDX[df.value==='created'?'created':'updated'];
+    const lo=lowerBound(ids,field,f||'0'),hi=t?lowerBound(ids,field,t+'\uffff'):ids.length;
+    const m=new Uint8Array(NDOC);
+    for(let i=lo;i<hi;i++)m[ids[i]]=1;
+    for(let i=0;i<NDOC;i++)mask[i]&=m[i];
+  }
+  tables.forEach(tb=>{
+    const vis=tb.rows.filter(r=>mask[r[9]]);
+    if(vis.length!==tb.vis.length||vis.some((r,i)=>r!==tb.vis[i])){tb.vis=vis;build(tb);}
+  });
+  // 未起票はHTMLに直接書いた数行だけ（日付なし）
+  document.querySelectorAll('tr.issue[data-text]').forEach(tr=>{
+    tr.classList.toggle('fhide',!!raw&&!tr.dataset.text.includes(raw));
   });
   recount();
-  let act=0;
-  document.querySelectorAll('.panel[data-panel="feat"] tr.issue:not(.fhide),.panel[data-panel="bug"] tr.issue:not(.fhide)').forEach(()=>act++);
-  viscount.textContent=act;
+  viscount.textContent=tables.filter(x=>/^(feat|bug)-/.test(x.el.dataset.rows)).reduce((n,x)=>n+x.vis.length,0);
 }
+q.addEventListener('focus',()=>{loadSearch();},{once:true});
 q.addEventListener('input',applyFilter);
 df.addEventListener('change',applyFilter);
 fromEl.addEventListener('change',applyFilter);
@@ -513,10 +733,17 @@ document.querySelectorAll('.subbar').forEach(bar=>{
     panel.querySelector('.subpanel[data-subpanel="'+b.dataset.sub+'"]').classList.add('active');
   }));
 });
+// ---- モーダル: 本文・コメントは MODAL_DIR/m_N.json（課題番号 MODAL_BUCKET 件ごと）を行クリック時に読む ----
 const overlay=document.getElementById('overlay'),mbody=document.getElementById('mbody');
-function el(t){const d=document.createElement('div');d.textContent=t;return d.innerHTML;}
-function openModal(key){
-  const d=DATA[key];if(!d)return;
+const loaded={};
+let current='';
+function bucket(key){return Math.floor((parseInt(key.split('-')[1],10)||0)/MODAL_BUCKET);}
+function loadBucket(b){
+  return loaded[b]||(loaded[b]=fetch(MODAL_DIR+'/m_'+b+'.json?v='+(MODAL_VER[b]||'')).then(r=>{
+    if(!r.ok)throw new Error(r.status);return r.json();
+  }).catch(e=>{delete loaded[b];throw e;}));
+}
+function render(d){
   let h='';
   if(d.unf){
     h+='<div class="m-key">未起票（今回チェック分）</div>';
@@ -536,40 +763,170 @@ function openModal(key){
     h+='<a class="m-open" href="'+d.url+'" target="_blank">Backlogで開く ↗</a>';
   }
   mbody.innerHTML=h;
+}
+function openModal(key){
+  current=key;
   overlay.classList.add('show');
+  if(DATA[key]){render(DATA[key]);return;}
+  mbody.innerHTML='<div class="m-key">'+el(key)+'</div><div class="m-loading">読み込み中…</div>';
+  loadBucket(bucket(key)).then(m=>{if(current===key&&m[key])render(m[key]);}).catch(()=>{
+    if(current!==key)return;
+    mbody.innerHTML='<div class="m-key">'+el(key)+'</div><div class="m-loading">詳細を読み込めませんでした。</div>'
+      +'<a class="m-open" href="'+BACKLOG_VIEW+key+'" target="_blank">Backlogで開く ↗</a>';
+  });
 }
-document.querySelectorAll('tr.issue[data-key]').forEach(tr=>{
-  tr.addEventListener('click',()=>openModal(tr.dataset.key));
+document.addEventListener('click',e=>{
+  const tr=e.target.closest('tr.issue[data-key]');if(tr)openModal(tr.dataset.key);
+});
+// カーソルが乗った時点で先読み（クリックまでの間に読み終わることが多い）
+document.addEventListener('mouseover',e=>{
+  const tr=e.target.closest('tr.issue[data-key]');
+  if(tr&&!DATA[tr.dataset.key])loadBucket(bucket(tr.dataset.key)).catch(()=>{});
 });
-document.getElementById('mclose').addEventListener('click',()=>overlay.classList.remove('show'));
-overlay.addEventListener('click',e=>{if(e.target===overlay)overlay.classList.remove('show');});
-document.addEventListener('keydown',e=>{if(e.key==='Escape')overlay.classList.remove('show');});
+document.getElementById('mclose').addEventListener('click',()=>{current='';overlay.classList.remove('show');});
+overlay.addEventListener('click',e=>{if(e.target===overlay){current='';overlay.classList.remove('show');}});
+document.addEventListener('keydown',e=>{if(e.key==='Escape'){current='';overlay.classList.remove('show');}});
 function setToolbarH(){
   const tb=document.querySelector('.toolbar');
   if(tb)document.documentElement.style.setProperty('--toolbarH',(tb.offsetHeight-1)+'px');
 }
 setToolbarH();
 window.addEventListener('resize',setToolbarH);
+tables.forEach(build);
 recount();
 '''
 
-DATA_JSON = json.dumps(modal, ensure_ascii=False).replace("</", "<\\/")
-
-HTML = (
-'<!DOCTYPE html><html lang="ja"><head><meta charset="utf-8">'
-'<meta name="viewport" content="width=device-width,initial-scale=1">'
-'<title>SPDAD2026 課題ボード</title><style>' + CSS + '</style></head><body>'
-'<header><h1>SPEEDAD 2026 — 課題ボード</h1>'
-'<div class="meta">対象: SPDAD2026 ｜ 全' + str(len(issues)) + '課題（完了含む） ｜ 最終更新: ' + UPDATED + ' ｜ 出典: Backlog (repinc.backlog.com) ｜ 未起票判定は本文＋全コメント照合</div></header>'
-'<div class="wrap">'
-+ toolbar + cards + legend + tabbar + panels +
-'</div>'
-'<footer>行クリックで要約モーダル。モーダル内「Backlogで開く」で原課題へ。仕分けは Backlog の種別/ステータス＋中身判定です（tools/backlog-board/README.md）。</footer>'
-+ modal_html +
-'<script>const DATA=' + DATA_JSON + ';</script>'
-'<script>' + JS + '</script>'
-'</body></html>')
-
-open(OUTFILE, "w", encoding="utf-8").write(HTML)
+# ---------- 書き出し ----------
+# HTML もサイドファイルも同じディレクトリの一時ファイルに書いてから os.replace で差し替える
+# （生成途中で落ちても、公開中のファイルが半端な中身になることはない）。
+def atomic_write(path, fill):
+    d = os.path.dirname(os.path.abspath(path))
+    os.makedirs(d, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=d, prefix=".tmp-", suffix=os.path.splitext(path)[1])
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+            fill(f.write)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+# ---------- モーダル用サイドファイル ----------
+# 本文・コメント入りのモーダルデータは HTML に埋め込まず、出力HTMLの横の <名前>_modal/m_N.json に
+# 課題番号 MODAL_BUCKET 件ごとにまとめて書く（N = 番号 // MODAL_BUCKET）。行クリック時にその1ファイルだけ読む。
+# HTML には各ファイルの内容ハッシュを持たせ ?v= で参照する（Pages のキャッシュで古い本文が出ないように）。
+# 本文は課題番号順に1件ずつ読み、1ファイル分たまったら書く（全課題の本文を同時にメモリに持たない）。
+# 未起票は件数が少なく本文も無いので HTML に直接埋め込む。
+MODAL_BUCKET = 50
+MODAL_DIR = os.path.splitext(OUTFILE)[0] + "_modal"
+
+def write_side(name, data):
+    """MODAL_DIR に書く（中身が同じなら触らない）。?v= 用の内容ハッシュを返す。"""
+    path = os.path.join(MODAL_DIR, name)
+    if not os.path.exists(path) or open(path, encoding="utf-8").read() != data:
+        atomic_write(path, lambda w: w(data))
+    return hashlib.sha1(data.encode("utf-8")).hexdigest()[:10]
+
+byk = {d["key"]: d for d in issues}
+modal_ver = {}
+memo, new_memo, n_extracted = store.abstracts(), {}, 0
+cur, ms = None, {}
+for k, desc, cm in store.details(by_number=True):
+    b = keynum(k) // MODAL_BUCKET
+    if b != cur and ms:
+        modal_ver[cur] = write_side("m_%d.json" % cur, json.dumps(ms, ensure_ascii=False))
+        ms = {}
+    cur = b
+    d = byk[k]
+    ab = sums.get(k)
+    if not ab:
+        h = "%s/%d" % (d["hash"], ABSTRACT_VER)
+        hit = memo.get(k)
+        if hit and hit[0] == h:
+            ab = hit[1]
+        else:
+            ab = extract(desc)
+            n_extracted += 1
+        new_memo[k] = (h, ab)
+    ms[k] = {"k": k, "sm": d["summary"], "st": d["status"], "ty": d["type"],
+             "c": d["created"], "u": d["updated"], "cat": d["cats"],
+             "ab": ab, "bd": desc[:2000] + ("\n…（以下省略）" if len(desc) > 2000 else ""),
+             "cm": cm, "url": BASE + k}
+if ms:
+    modal_ver[cur] = write_side("m_%d.json" % cur, json.dumps(ms, ensure_ascii=False))
+del ms
+if new_memo != memo:
+    store.save_abstracts(new_memo)
+print("abstract: %d件（再抽出 %d / メモ %d）" % (len(new_memo), n_extracted, len(new_memo) - n_extracted))
+os.makedirs(MODAL_DIR, exist_ok=True)
+for f in os.listdir(MODAL_DIR):
+    if re.fullmatch(r"m_\d+\.json", f) and int(f[2:-5]) not in modal_ver:
+        os.remove(os.path.join(MODAL_DIR, f))
+
+# ---------- 検索索引 ----------
+# キーワード検索は2文字単位（bigram）の転置索引で引く。対象はキー・件名・ステータス・種別・カテゴリ・要約(summaries.json)。
+# NFKC＋小文字化して空白で語に分け、語の前後に空白を付けて bigram を取る（1文字の語や1文字検索も拾えるように）。
+# 投稿リストは文書番号の昇順を差分で持つ（小さい数が並ぶので軽い）。要約込みで大きくなるので HTML とは別の
+# MODAL_DIR/search.json に置き、検索欄に触れた時に読む。
+# 索引は "r"（一覧に出る項目）と "s"（要約）に分ける。bigram の積集合は「全 bigram を含むが連続していない」課題も
+# 拾うので、r の候補は一覧の文字列で照合して確定させる。要約の本文はページに無いので s の候補はそのまま採用。
+def bigrams(text):
+    out = set()
+    for tok in unicodedata.normalize("NFKC", text).lower().split():
+        tok = " " + tok + " "
+        out.update(tok[i:i + 2] for i in range(len(tok) - 1))
+    return out
+
+postings = {"r": {}, "s": {}}
+for i, d in enumerate(issues):
+    for part, text in (("r", " ".join([d["key"], d["summary"], d["status"], d["type"]] + d["cats"])),
+                       ("s", sums.get(d["key"], ""))):
+        for bg in bigrams(text):
+            postings[part].setdefault(bg, []).append(i)
+search_index = {}
+for part, pl in postings.items():
+    search_index[part] = {bg: [pl[bg][0]] + [b - a for a, b in zip(pl[bg], pl[bg][1:])] for bg in sorted(pl)}
+search_ver = write_side("search.json", json.dumps(search_index, ensure_ascii=False, separators=(",", ":")))
+del postings, search_index
+
+# 日付の範囲絞り込み用: 文書番号を登録日順/更新日順に並べたもの（空の日付は先頭に来る）。JS は二分探索で範囲を切り出す。
+DATEIDX = {f: sorted(range(len(issues)), key=lambda i: (issues[i][f], i)) for f in ("created", "updated")}
+
+def js(v):
+    return json.dumps(v, ensure_ascii=False, separators=(",", ":")).replace("</", "<\\/")
+
+def render(w):
+    w('<!DOCTYPE html><html lang="ja"><head><meta charset="utf-8">'
+      '<meta name="viewport" content="width=device-width,initial-scale=1">'
+      '<title>SPDAD2026 課題ボード</title><style>')
+    w(CSS)
+    w('</style></head><body>'
+      '<header><h1>SPEEDAD 2026 — 課題ボード</h1>'
+      '<div class="meta">対象: SPDAD2026 ｜ 全' + str(len(issues)) + '課題（完了含む） ｜ 最終更新: ' + UPDATED + ' ｜ 出典: Backlog (repinc.backlog.com) ｜ 未起票判定は本文＋全コメント照合</div></header>'
+      '<div class="wrap">')
+    w(toolbar); w(cards); w(legend); w(tabbar)
+    panel_with_buckets(w, "feat", True, "#2563eb")
+    panel_with_buckets(w, "bug", False, "#dc2626")
+    panel_unfiled(w, "#7c3aed")
+    panel_done(w, "#0f766e")
+    w('</div>'
+      '<footer>行クリックで要約モーダル。モーダル内「Backlogで開く」で原課題へ。仕分けは Backlog の種別/ステータス＋中身判定です（tools/backlog-board/README.md）。</footer>')
+    w(modal_html)
+    w('<script>const DATA=%s;const ROWS={' % js(UNF))
+    first = True
+    for tid in TABLE_IDS:
+        if not N[tid]:
+            continue
+        w('%s"%s":[' % ("" if first else ",", tid))
+        first = False
+        for i, d in enumerate(TABLES[tid]):
+            w(("," if i else "") + js(row(d)))
+        w(']')
+    w('};const DATEIDX=%s;const MODAL_DIR=%s;const MODAL_BUCKET=%d;const MODAL_VER=%s;const SEARCH_VER=%s;const BACKLOG_VIEW=%s;</script>'
+      % (js(DATEIDX), js(os.path.basename(MODAL_DIR)), MODAL_BUCKET, js(modal_ver), js(search_ver), js(BASE)))
+    w('<script>'); w(JS); w('</script></body></html>')
+
+atomic_write(OUTFILE, render)
 print("written:", OUTFILE)
-print("issues", len(issues), "active", len(active), "done", len(done), "feat", len(feat), "bug", len(bug), "unfiled", len(unfiled))
+print("issues", len(issues), "active", n_active, "done", n_done, "feat", n_feat, "bug", n_bug, "unfiled", len(unfiled))
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""
+課題キャッシュ（cache.db・sqlite3）。generate.py / prep_summaries.py / fake_backlog.py から使う。
+
+cache.json（全件を1つのJSONにして毎回まるごと書き直し・まるごと読込）の置き換え。
+  - 差分取得の結果は課題キー単位で upsert（変わった行だけ書く）
+  - 「キー＋更新日」だけの一覧や最新更新日は本文を読まずに取れる
+  - 本文・コメントは必要な時だけ読む（一覧・分類は meta() だけで済む）
+並び順は seq（取得順＝作成日昇順）。既存課題の seq は更新しても変わらないので、差分でも全件でも同じ並びになる。
+hash は本文＋最新コメントの内容ハッシュ（content_hash）。要約・abstract がどの内容から作られたかの照合に使う。
+abstracts は generate.py の abstract（要約が無い課題の代替表示）のメモ。hash が変わった課題だけ作り直す。
+旧 cache.json が残っていて cache.db が無ければ、初回に取り込む。
+"""
+import os, json, sqlite3, hashlib
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS issues (
+    key TEXT PRIMARY KEY,
+    seq INTEGER NOT NULL,
+    summary TEXT NOT NULL,
+    status TEXT NOT NULL,
+    type TEXT NOT NULL,
+    cats TEXT NOT NULL,          -- JSON配列
+    created TEXT NOT NULL,
+    updated TEXT NOT NULL,
+    description TEXT NOT NULL,
+    comments TEXT NOT NULL,      -- JSON配列 [{n, d, t}]
+    hash TEXT NOT NULL DEFAULT ''  -- content_hash(description, comments)
+);
+CREATE INDEX IF NOT EXISTS issues_seq ON issues(seq);
+CREATE INDEX IF NOT EXISTS issues_updated ON issues(updated);
+CREATE TABLE IF NOT EXISTS abstracts (
+    key TEXT PRIMARY KEY,
+    hash TEXT NOT NULL,
+    text TEXT NOT NULL
+);
+"""
+META = "key, summary, status, type, cats, created, updated"
+COLS = "key, seq, summary, status, type, cats, created, updated, description, comments, hash"
+
+def content_hash(description, comments):
+    """本文＋最新コメントの内容ハッシュ。どちらかが変われば変わる。"""
+    data = json.dumps([description, comments], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(data.encode("utf-8")).hexdigest()[:16]
+
+class IssueStore:
+    def __init__(self, path, legacy_json=None):
+        fresh = not os.path.exists(path)
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+        if "hash" not in [c[1] for c in self.db.execute("PRAGMA table_info(issues)")]:
+            # hash 列が無い頃の cache.db。列を足して今の内容で埋める（1回だけ）
+            with self.db:
+                self.db.execute("ALTER TABLE issues ADD COLUMN hash TEXT NOT NULL DEFAULT ''")
+                cur = self.db.execute("SELECT key, description, comments FROM issues").fetchall()
+                self.db.executemany("UPDATE issues SET hash = ? WHERE key = ?",
+                                    [(content_hash(desc, json.loads(cm)), k) for k, desc, cm in cur])
+        if fresh and legacy_json and os.path.exists(legacy_json):
+            rows = json.load(open(legacy_json, encoding="utf-8"))
+            self.replace(rows)
+            print("migrated %s → %s: %d件" % (os.path.basename(legacy_json), os.path.basename(path), len(rows)))
+
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM issues").fetchone()[0]
+
+    def updated(self):
+        """{課題キー: 更新日}。本文は読まない。"""
+        return dict(self.db.execute("SELECT key, updated FROM issues"))
+
+    def since(self):
+        """差分取得の起点（キャッシュ内の最新更新日）。空なら ""。"""
+        return self.db.execute("SELECT MAX(updated) FROM issues").fetchone()[0] or ""
+
+    def upsert(self, rows):
+        """取得した課題を書き込む。既存キーは位置(seq)を保って上書き、新規は末尾。"""
+        with self.db:
+            self._write(rows)
+
+    def replace(self, rows):
+        """全件取得の結果で置き換える（Backlogで削除された課題も消える）。
+        削除と書き込みは1トランザクション。途中で止まっても前の中身が残る。"""
+        with self.db:
+            self.db.execute("DELETE FROM issues")
+            self._write(rows)
+
+    def _write(self, rows):
+        """upsert / replace の本体。トランザクションは呼び出し側で張る。"""
+        seqs = dict(self.db.execute("SELECT key, seq FROM issues"))
+        nxt = max(seqs.values(), default=-1) + 1
+        for r in rows:
+            seq = seqs.get(r["key"])
+            if seq is None:
+                seq = nxt; nxt += 1
+            self.db.execute("INSERT OR REPLACE INTO issues (%s) VALUES (?,?,?,?,?,?,?,?,?,?,?)" % COLS, (
+                r["key"], seq, r["summary"], r["status"], r["type"],
+                json.dumps(r["cats"], ensure_ascii=False), r["created"], r["updated"],
+                r["description"], json.dumps(r["comments"], ensure_ascii=False),
+                content_hash(r["description"], r["comments"])))
+
+    def meta(self):
+        """本文・コメント抜きの全課題（取得順）。hash 付き。"""
+        out = []
+        for k, sm, st, ty, cats, c, u, h in self.db.execute("SELECT %s, hash FROM issues ORDER BY seq" % META):
+            out.append({"key": k, "summary": sm, "status": st, "type": ty, "cats": json.loads(cats),
+                        "created": c, "updated": u, "hash": h})
+        return out
+
+    def description(self, key):
+        row = self.db.execute("SELECT description FROM issues WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else ""
+
+    def details(self, by_number=False):
+        """(課題キー, 本文, コメント) を1件ずつ。既定は取得順、by_number なら課題番号（キーの - 以降）順。"""
+        order = "CAST(substr(key, instr(key, '-') + 1) AS INTEGER), key" if by_number else "seq"
+        for k, desc, cm in self.db.execute("SELECT key, description, comments FROM issues ORDER BY " + order):
+            yield k, desc, json.loads(cm)
+
+    def rows(self):
+        """cache.json と同じ形の全項目（取得順に1件ずつ）。"""
+        cur = self.db.execute("SELECT %s, description, comments FROM issues ORDER BY seq" % META)
+        for k, sm, st, ty, cats, c, u, desc, cm in cur:
+            yield {"key": k, "summary": sm, "status": st, "type": ty, "cats": json.loads(cats),
+                   "created": c, "updated": u, "description": desc, "comments": json.loads(cm)}
+
+    def abstracts(self):
+        """{課題キー: (作った時の hash, abstract)}"""
+        return {k: (h, t) for k, h, t in self.db.execute("SELECT key, hash, text FROM abstracts")}
+
+    def save_abstracts(self, memo):
+        """abstract のメモを memo（abstracts() と同じ形）で置き換える。消えた課題の分も落ちる。"""
+        with self.db:
+            self.db.execute("DELETE FROM abstracts")
+            self.db.executemany("INSERT INTO abstracts VALUES (?,?,?)", [(k, h, t) for k, (h, t) in memo.items()])
+
+    def close(self):
+        self.db.close()
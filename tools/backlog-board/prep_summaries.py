@@ -2,18 +2,25 @@
 """
 要約(summaries.json)の生成補助。詳細は README.md「3. 要約の更新」。
 
-  python prep_summaries.py split        # summaries.json に未収録の課題だけを chunk_*.json に分割
+  python prep_summaries.py split        # 未要約の課題と、要約後に本文/コメントが変わった課題だけを chunk_*.json に分割
   python prep_summaries.py split --all   # 全課題を分割（要約を作り直したい時）
   python prep_summaries.py merge        # sum_*.json を summaries.json にマージ
+  python prep_summaries.py stamp        # ハッシュ未記録の要約を「今の内容で作ったもの」として記録（旧データの初回だけ）
+
+要約ごとに、作った時の本文＋最新コメントの内容ハッシュを summary_hashes.json に記録する（split が chunk に入れ、merge が書く）。
+split はそのハッシュと cache.db の今のハッシュを比べて、変わった課題を作り直し対象にする。
 
 split 後、各 chunk_K.json を README のプロンプトでサブエージェントに要約させ sum_K.json を出力させる。
 最後に merge で summaries.json へ統合 → generate.py で再生成。
 """
 import sys, os, json, math, glob
+from issue_store import IssueStore, content_hash
 
 HERE = os.path.dirname(os.path.abspath(__file__))
-CACHE = os.path.join(HERE, "cache.json")
+CACHE = os.path.join(HERE, "cache.db")
+LEGACY_CACHE = os.path.join(HERE, "cache.json")
 SUMS = os.path.join(HERE, "summaries.json")
+SUM_HASHES = os.path.join(HERE, "summary_hashes.json")
 CHUNK_SIZE = 24
 
 def load(p, default):
@@ -21,19 +28,39 @@ def load(p, default):
 
 mode = sys.argv[1] if len(sys.argv) > 1 else ""
 
+def open_store():
+    if not (os.path.exists(CACHE) or os.path.exists(LEGACY_CACHE)):
+        sys.exit("cache.db がありません。先に generate.py <KEY> --refresh を実行してください。")
+    return IssueStore(CACHE, LEGACY_CACHE)
+
 if mode == "split":
     only_new = "--all" not in sys.argv
-    raw = load(CACHE, [])
     sums = load(SUMS, {})
-    targets = [r for r in raw if (not only_new) or (r["key"] not in sums)]
+    hashes = load(SUM_HASHES, {})
+    targets, n_new, n_stale, unknown = [], 0, 0, 0
+    for r in open_store().rows():
+        h = content_hash(r["description"], r["comments"])
+        if r["key"] not in sums:
+            n_new += 1
+        elif r["key"] not in hashes:
+            unknown += 1
+            if only_new:
+                continue
+        elif hashes[r["key"]] != h:
+            n_stale += 1
+        elif only_new:
+            continue
+        targets.append((r, h))
+    if unknown and only_new:
+        print("ハッシュ未記録の要約 %d件は古いか判断できないので対象外（今の内容で作ったとみなすなら stamp）。" % unknown)
     if not targets:
         print("対象なし（summaries.json は最新）。--all で全件作り直し可。")
         sys.exit(0)
     recs = []
-    for r in targets:
+    for r, h in targets:
         cm = "\n".join("[%s %s] %s" % (c.get("d", ""), c.get("n", ""), c.get("t", "")) for c in r.get("comments", []))
         recs.append({"key": r["key"], "summary": r["summary"], "status": r["status"], "type": r["type"],
-                     "description": r["description"][:2500], "latest_comments": cm[:1200]})
+                     "description": r["description"][:2500], "latest_comments": cm[:1200], "hash": h})
     # 既存 chunk_*/sum_* を掃除
     for f in glob.glob(os.path.join(HERE, "chunk_*.json")) + glob.glob(os.path.join(HERE, "sum_*.json")):
         os.remove(f)
@@ -44,24 +71,44 @@ if mode == "split":
         if ch:
             json.dump(ch, open(os.path.join(HERE, "chunk_%d.json" % i), "w", encoding="utf-8"), ensure_ascii=False, indent=0)
             print("chunk_%d.json: %d件" % (i, len(ch)))
-    print("対象 %d件 / %dチャンク。各 chunk を要約して sum_K.json を出力させ、merge してください。" % (len(recs), n))
+    print("対象 %d件（未要約 %d / 内容更新 %d）/ %dチャンク。各 chunk を要約して sum_K.json を出力させ、merge してください。"
+          % (len(recs), n_new, n_stale, n))
 
 elif mode == "merge":
     sums = load(SUMS, {})
+    hashes = load(SUM_HASHES, {})
     files = sorted(glob.glob(os.path.join(HERE, "sum_*.json")))
     if not files:
         print("sum_*.json が見つかりません。"); sys.exit(1)
+    chunks = glob.glob(os.path.join(HERE, "chunk_*.json"))
+    # 要約の元になった内容のハッシュは chunk 側にある（split 後に再取得していても、要約した時点の内容で記録する）
+    chunk_hash = {rec["key"]: rec.get("hash") for f in chunks for rec in json.load(open(f, encoding="utf-8"))}
     added = 0
     for f in files:
         d = json.load(open(f, encoding="utf-8"))
         for k, v in d.items():
             if str(v).strip():
                 sums[k] = v; added += 1
+                if chunk_hash.get(k):
+                    hashes[k] = chunk_hash[k]
+                else:
+                    hashes.pop(k, None)
     json.dump(sums, open(SUMS, "w", encoding="utf-8"), ensure_ascii=False, indent=0)
+    json.dump(hashes, open(SUM_HASHES, "w", encoding="utf-8"), ensure_ascii=False, indent=0, sort_keys=True)
     print("merged %d件 → summaries.json（総数 %d）" % (added, len(sums)))
-    for f in glob.glob(os.path.join(HERE, "chunk_*.json")) + files:
+    for f in chunks + files:
         os.remove(f)
     print("chunk_*/sum_* を掃除しました。")
 
+elif mode == "stamp":
+    sums = load(SUMS, {})
+    hashes = load(SUM_HASHES, {})
+    n = 0
+    for r in open_store().rows():
+        if r["key"] in sums and r["key"] not in hashes:
+            hashes[r["key"]] = content_hash(r["description"], r["comments"]); n += 1
+    json.dump(hashes, open(SUM_HASHES, "w", encoding="utf-8"), ensure_ascii=False, indent=0, sort_keys=True)
+    print("stamped %d件 → summary_hashes.json（総数 %d）" % (n, len(hashes)))
+
 else:
     print(__doc__)
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""
+仕分けルール（rules.json）の読み込みと判定。generate.py から使う。書き方は README「4. 仕分けルール」。
+
+env_rules は上から優先。各ルールは field（summary=件名 / status=ステータス / text=件名+本文先頭2000字）に対して
+text（文字列。配列ならどれか1つ）か regex（正規表現）で当て、ignore_case で大文字小文字を無視する。
+読み込み時に1回だけ、同じ field で続くルールを（text はエスケープして）1本の正規表現（名前付きグループの選択）に
+コンパイルしておき、判定は field ごとに1回の走査で最優先のルールを決める（lower() や個別の検索を繰り返さない）。
+本文（text）は件名・ステータスで決まらなかった課題だけ読む。
+"""
+import json, re
+from collections import Counter
+
+FIELDS = ("summary", "status", "text")
+
+class Matcher:
+    """同じ field で続くルール。pattern は優先順の選択 (?P<r0>..)|(?P<r1>..)|…
+    narrower[i] はルール 0..i-1 だけの選択（i 番目が当たった後に、より優先のルールを探す用）。"""
+    def __init__(self, rule):
+        self.field = rule["field"]
+        self.rules = [rule]
+
+    def compile(self):
+        alts = ["(?P<r%d>%s)" % (i, "(?i:%s)" % r["rx"].pattern if r["rx"].flags & re.I else r["rx"].pattern)
+                for i, r in enumerate(self.rules)]
+        self.narrower = [re.compile("|".join(alts[:i])) if i else None for i in range(len(alts) + 1)]
+        self.rx = self.narrower[-1]
+        # lastindex（外側の名前付きグループ番号）→ ルール番号。ルール内のグループがあってもずれない
+        self.slot = {self.rx.groupindex["r%d" % i]: i for i in range(len(self.rules))}
+        return self
+
+    def first(self, text):
+        """当たるルールのうち最優先のもの（無ければ None）。
+        選択は左端の一致位置で一番前のルールを返すので、それより優先のルールはその位置より後ろにしか無い。
+        そこから narrower で探し直す（優先度は毎回必ず上がるので、最悪でもルール数回）。"""
+        m = self.rx.search(text)
+        if not m:
+            return None
+        best = self.slot[m.lastindex]
+        while best:
+            m = self.narrower[best].search(text, m.start() + 1)
+            if not m:
+                break
+            best = self.slot[m.lastindex]
+        return self.rules[best]
+
+class Rules:
+    def __init__(self, path):
+        conf = json.load(open(path, encoding="utf-8"))
+        self.status_order = {s: i for i, s in enumerate(conf["status_order"])}
+        self.done = set(conf["done"])
+        self.pending = set(conf["pending"])
+        self.feature_types = set(conf["feature_types"])
+        self.bug_override = set(conf["bug_override"])
+        self.env_override = dict(conf["env_override"])
+        self.env_default = conf["env_default"]
+        self.env_rules = []
+        self.matchers = []
+        for r in conf["env_rules"]:
+            if r.get("field") not in FIELDS or ("regex" in r) == ("text" in r):
+                raise SystemExit("rules.json: ルール %r は field(%s) と text/regex のどちらか1つが必要"
+                                 % (r.get("id"), "/".join(FIELDS)))
+            r = dict(r)
+            if "text" in r:
+                needles = [r["text"]] if isinstance(r["text"], str) else list(r["text"])
+                pattern = "|".join(map(re.escape, needles))
+            else:
+                pattern = r["regex"]
+            try:
+                r["rx"] = re.compile(pattern, re.I if r.get("ignore_case") else 0)
+            except re.error as e:
+                raise SystemExit("rules.json: ルール %r の正規表現が不正: %s" % (r["id"], e))
+            if self.matchers and self.matchers[-1].field == r["field"]:
+                self.matchers[-1].rules.append(r)
+            else:
+                self.matchers.append(Matcher(r))
+            self.env_rules.append(r)
+        for m in self.matchers:
+            m.compile()
+        self.fi = [FIELDS.index(m.field) for m in self.matchers]
+        self.hits = Counter()
+
+    def sidx(self, status):
+        return self.status_order.get(status, 99)
+
+    def text(self, d, field, body):
+        return (d["summary"] if field == "summary" else d["status"] if field == "status"
+                else d["summary"] + " " + body(d["key"])[:2000])
+
+    def classify(self, d, body):
+        """d に cat / override / done / bucket / env を付ける。body(key) は本文を返す関数。"""
+        if d["key"] in self.bug_override:
+            d["cat"], d["override"] = "不具合系", True
+            self.hits["bug_override"] += 1
+        elif d["type"] in self.feature_types:
+            d["cat"], d["override"] = "新機能系", False
+            self.hits["feature_types"] += 1
+        else:
+            d["cat"], d["override"] = "不具合系", False
+            self.hits["種別その他→不具合系"] += 1
+        d["done"] = d["status"] in self.done
+        d["bucket"] = "未対応" if d["status"] in self.pending else "対応中"
+        d["env"] = self.detect_env(d, body) if d["cat"] == "不具合系" else ""
+
+    def detect_env(self, d, body):
+        if d["key"] in self.env_override:
+            self.hits["env_override"] += 1
+            return self.env_override[d["key"]]
+        # 本文は text のルールまで来た時に初めて読む
+        t = [d["summary"], d["status"], None]
+        for fi, m in zip(self.fi, self.matchers):
+            if t[fi] is None:
+                t[fi] = self.text(d, "text", body)
+            r = m.first(t[fi])
+            if r:
+                self.hits[r["id"]] += 1
+                return r["env"]
+        self.hits["env_default"] += 1
+        return self.env_default
+
+    def explain(self, d, body):
+        """1課題の判定過程（全ルールを個別に当てた結果）を行のリストで返す。"""
+        out = ["%s  %s" % (d["key"], d["summary"]),
+               "  ステータス: %s / 種別: %s" % (d["status"], d["type"])]
+        if d["key"] in self.bug_override:
+            why = "bug_override に含まれる（実態判定）"
+        elif d["type"] in self.feature_types:
+            why = "種別が feature_types に含まれる"
+        else:
+            why = "種別が feature_types 以外"
+        out.append("  大分類: %s ← %s" % (d["cat"], why))
+        out.append("  進捗: %s%s" % (d["bucket"], "（完了）" if d["done"] else ""))
+        if d["cat"] != "不具合系":
+            out.append("  環境: 判定しない（新機能系）。参考までにルールの当たり:")
+        elif d["key"] in self.env_override:
+            out.append("  環境: %s ← env_override。参考までにルールの当たり:" % d["env"])
+        else:
+            out.append("  環境: %s" % d["env"])
+        decided = False
+        for r in self.env_rules:
+            text = self.text(d, r["field"], body)
+            m = r["rx"].search(text)
+            if m:
+                ctx = text[max(0, m.start() - 15):m.end() + 15].replace("\n", " ")
+                out.append("    %s %s → %s  一致「…%s…」" % ("✓" if decided else "→", r["id"], r["env"], ctx))
+                decided = True
+            else:
+                out.append("      %s → %s  -" % (r["id"], r["env"]))
+        if not decided:
+            out.append("    → どれにも当たらない: %s" % self.env_default)
+        return out
+
+    def report(self):
+        return "rules: " + ", ".join("%s=%d" % kv for kv in sorted(self.hits.items(), key=lambda kv: -kv[1]))